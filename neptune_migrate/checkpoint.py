@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_CHECKPOINT_DIR = "~/.neptune-migrate/checkpoints"
+# seconds between the syncs of the journal to disk
+DEFAULT_SYNC_INTERVAL = 1
+
+
+def plan_hash(sparql_up):
+    """Hash of the statements of a migration, leaving out the history
+    record, which changes on every run"""
+    return hashlib.sha256("\n".join(sparql_up[:-1]).encode("utf-8")).hexdigest()
+
+
+class CheckpointJournal(object):
+    """Local journal of the statements of a migration plan that were already
+    applied, appended as batches are acknowledged. There is one journal per
+    endpoint, graph, source and destination versions and plan.
+
+    Entries are synced to disk at most once every sync_interval seconds, so
+    a crash may lose the last ones, which are then sent again on resume.
+    That is harmless for statements that can be sent twice, while the
+    others (inserts of blank nodes) must be recorded with sync=True."""
+
+    def __init__(
+        self,
+        directory,
+        endpoint,
+        graph,
+        versions,
+        sparql_up,
+        sync_interval=DEFAULT_SYNC_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self.header = {
+            "endpoint": endpoint,
+            "graph": graph,
+            "current_version": versions[0],
+            "destination_version": versions[1],
+            "plan": plan_hash(sparql_up),
+            "statements": len(sparql_up),
+        }
+        key = hashlib.sha256(
+            json.dumps(self.header, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        self.directory = os.path.expanduser(directory)
+        self.filename = os.path.join(self.directory, "%s.journal" % key)
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self._file = None
+        self._synced_at = None
+
+    def load(self):
+        """Indexes of the statements already applied"""
+        applied = set()
+        try:
+            with open(self.filename) as f:
+                lines = f.read().splitlines()
+        except IOError:
+            return applied
+        if not lines or json.loads(lines[0]) != self.header:
+            return applied
+        for line in lines[1:]:
+            try:
+                applied.update(json.loads(line)["applied"])
+            except (ValueError, KeyError):
+                # a line cut short by a crash
+                break
+        return applied
+
+    def start(self, resume=False):
+        """Open the journal, keeping what it has when resuming. Returns the
+        indexes of the statements that can be skipped."""
+        applied = self.load() if resume else set()
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(self.filename, "w")
+        self._write(self.header)
+        if applied:
+            self._write({"applied": sorted(applied)})
+        self.sync()
+        return applied
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced_at = self.clock()
+
+    def record(self, indexes, sync=False):
+        """Append the indexes of statements applied, syncing the journal
+        when asked to or when the last sync is sync_interval seconds old"""
+        self._write({"applied": sorted(indexes)})
+        if sync or self.clock() - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def close(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Forget the journal of a migration that was completely applied"""
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
@@ -108,6 +108,16 @@ class CLI(object):
                 help="Show all SQL statements that would be executed but\
                       DON'T execute them in the virtuoso.",
             ),
+            make_option(
+                "--dry-run",
+                action="store_true",
+                dest="dry_run",
+                default=None,
+                help="Report the statements, triples, payload and requests\
+                      of the migration under each execution mode, with the\
+                      duration projected from earlier runs, but DON'T\
+                      execute it.",
+            ),
             make_option(
                 "--env",
                 "--environment",
@@ -188,6 +198,104 @@ class CLI(object):
                 default=None,
                 help="Import python module and execute function with the name run_after after applying changes.",
             ),
+            make_option(
+                "--batch-size",
+                dest="execution_batch_size",
+                type="int",
+                default=None,
+                help="Maximum number of SPARQL statements sent in a single\
+                      update request (default: 1).",
+            ),
+            make_option(
+                "--batch-bytes",
+                dest="execution_batch_bytes",
+                type="int",
+                default=None,
+                help="Maximum size in bytes of a batched update request\
+                      (default: 1000000).",
+            ),
+            make_option(
+                "--concurrency",
+                dest="execution_concurrency",
+                type="int",
+                default=None,
+                help="Number of update requests kept in flight at the same\
+                      time (default: 1).",
+            ),
+            make_option(
+                "--execution-mode",
+                dest="execution_mode",
+                type="choice",
+                choices=["update", "graph_store", "atomic", "lanes"],
+                default=None,
+                help="How changes are sent: 'update' sends SPARQL updates,\
+                      'graph_store' sends added triples as N-Triples through\
+                      the Graph Store Protocol and removed ones as DELETE\
+                      DATA requests, 'atomic' sends every change and the\
+                      history record in a single update, 'lanes' runs the\
+                      changes of different subjects concurrently\
+                      (default: update).",
+            ),
+            make_option(
+                "--adaptive",
+                action="store_true",
+                dest="execution_adaptive",
+                default=None,
+                help="Tune the batch size and the concurrency while the\
+                      migration runs, starting from the values saved by the\
+                      last run against the same endpoint.",
+            ),
+            make_option(
+                "--resume",
+                action="store_true",
+                dest="execution_resume",
+                default=None,
+                help="Skip the statements that a previous failed run of the\
+                      same migration already applied.",
+            ),
+            make_option(
+                "--rollback",
+                action="store_true",
+                dest="execution_rollback",
+                default=None,
+                help="When the migration fails, roll back the statements it\
+                      already applied and exit with an error.",
+            ),
+            make_option(
+                "--coalesce",
+                action="store_true",
+                dest="execution_coalesce",
+                default=None,
+                help="Drop repeated and cancelled statements and merge the\
+                      triples of a subject in a graph in multi-triple\
+                      statements before executing the migration.",
+            ),
+            make_option(
+                "--stream",
+                action="store_true",
+                dest="execution_streaming",
+                default=None,
+                help="Send the statements of the migration while they are\
+                      generated from the diff of the ontologies.",
+            ),
+            make_option(
+                "--echo",
+                action="store_true",
+                dest="execution_echo",
+                default=None,
+                help="Show the response of every batch and the rollback\
+                      statements of its statements as it is applied.",
+            ),
+            make_option(
+                "--load-backend",
+                dest="load_backend",
+                type="choice",
+                choices=["isql", "neptune"],
+                default=None,
+                help="How TTL files given with -a are loaded: 'isql' uses\
+                      Virtuoso's TTLP_MT_LOCAL_FILE, 'neptune' the Neptune\
+                      bulk loader (default: isql).",
+            ),
         )
 
     @classmethod
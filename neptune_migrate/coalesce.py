@@ -0,0 +1,114 @@
+import re
+from collections import OrderedDict
+
+from .graph_store import TOKEN, parse_ground_statement
+
+DEFAULT_COALESCE_TRIPLES = 100
+
+# subject and predicate-object pairs of a single ground triple
+GROUND_TRIPLE = re.compile(r"^\s*(<[^>]*>)\s+(.*?)\s*$", re.S)
+# separators of several triples
+SEPARATORS = re.compile(r"[.;,]")
+
+STATEMENTS = {
+    "insert": "INSERT DATA { GRAPH <%s> { %s . } };",
+    "delete": "DELETE DATA { GRAPH <%s> { %s . } };",
+}
+
+
+def _split_triple(triples):
+    match = GROUND_TRIPLE.match(triples)
+    if not match or SEPARATORS.search(TOKEN.sub("", match.group(2))):
+        return None
+    return match.groups()
+
+
+def _ground_pair(up, down):
+    """(operation, graph, subject, up pair, down pair) of a statement adding
+    or removing a single ground triple and the statement undoing it, or
+    None for any other statement"""
+    ground_up = parse_ground_statement(up)
+    ground_down = parse_ground_statement(down)
+    if (
+        not ground_up
+        or not ground_down
+        or ground_up[0] == ground_down[0]
+        or ground_up[1] != ground_down[1]
+    ):
+        return None
+    up_triple = _split_triple(ground_up[2])
+    down_triple = _split_triple(ground_down[2])
+    if not up_triple or not down_triple or up_triple[0] != down_triple[0]:
+        return None
+    return ground_up[0], ground_up[1], up_triple[0], up_triple[1], down_triple[1]
+
+
+def _dedupe(pairs):
+    seen = set()
+    unique = []
+    for up, down in pairs:
+        if up not in seen:
+            seen.add(up)
+            unique.append((up, down))
+    return unique
+
+
+def _merge(pairs, max_triples):
+    """Merge the single ground triples of a subject in a graph in statements
+    of up to max_triples triples, each undone by a single statement"""
+    groups = OrderedDict()
+    planned = []
+    for up, down in pairs:
+        ground = _ground_pair(up, down)
+        if ground is None:
+            planned.append((None, [(up, down)]))
+            continue
+        key = ground[:3]
+        if key not in groups:
+            groups[key] = []
+            planned.append((key, groups[key]))
+        groups[key].append((up, down) + ground[3:])
+
+    merged = []
+    for key, members in planned:
+        if key is None:
+            merged.extend(members)
+            continue
+        operation, graph, subject = key
+        undo = "delete" if operation == "insert" else "insert"
+        for start in range(0, len(members), max_triples):
+            chunk = members[start : start + max_triples]
+            if len(chunk) == 1:
+                merged.append(chunk[0][:2])
+                continue
+            merged.append(
+                (
+                    STATEMENTS[operation]
+                    % (graph, "%s %s" % (subject, " ; ".join(m[2] for m in chunk))),
+                    STATEMENTS[undo]
+                    % (graph, "%s %s" % (subject, " ; ".join(m[3] for m in chunk))),
+                )
+            )
+    return merged
+
+
+def coalesce(deletes, inserts, max_triples=DEFAULT_COALESCE_TRIPLES):
+    """Cut the statements of a migration, given as (statement, rollback
+    statement) pairs of its deletes and of its inserts, without changing the
+    resulting graph: repeated statements are dropped, so are deletes of
+    triples inserted again afterwards, and the single ground triples of a
+    subject in a graph are merged in multi-triple statements"""
+    deletes = _dedupe(deletes)
+    inserts = _dedupe(inserts)
+    inserted = set()
+    for up, down in inserts:
+        ground = _ground_pair(up, down)
+        if ground:
+            inserted.add(ground[1:4])
+
+    def is_cancelled(up, down):
+        ground = _ground_pair(up, down)
+        return ground is not None and ground[1:4] in inserted
+
+    deletes = [(up, down) for up, down in deletes if not is_cancelled(up, down)]
+    return _merge(deletes, max_triples), _merge(inserts, max_triples)
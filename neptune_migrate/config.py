@@ -38,6 +38,13 @@ class Config(object):
         if config_value is not None:
             self.put(config_key, config_value)
 
+    def copy(self, overrides=None):
+        """Copy of the configuration with some keys replaced"""
+        config = dict(self._config)
+        for key, value in (overrides or {}).items():
+            config[key.lower()] = value
+        return Config(config)
+
     def remove(self, config_key):
         """Remove config_key from config file if it is there"""
         try:
@@ -0,0 +1,140 @@
+import datetime
+import re
+import threading
+
+from rdflib.graph import Graph
+from rdflib.plugins.parsers.notation3 import BadSyntax
+
+from .execution import is_delete, join_statements
+from .graph_store import NOT_GROUND, TOKEN
+from .tuning import TuningStore
+
+DEFAULT_THROUGHPUT_FILE = "~/.neptune-migrate-throughput.json"
+
+# triples written by the statements generated by
+# Virtuoso._generate_migration_sparql_commands
+DATA_TRIPLES = re.compile(
+    r"^\s*(?:INSERT|DELETE) DATA \{ GRAPH <[^>]*> \{(?P<triples>.*)\} \};?\s*$",
+    re.S,
+)
+DELETE_TRIPLES = re.compile(
+    r"^\s*WITH <[^>]*> DELETE \{(?P<triples>.*?)\} WHERE \{", re.S
+)
+VARIABLE = re.compile(r"\?(\w+)")
+# separators of several triples and blank node structures
+SEVERAL_TRIPLES = re.compile(r"[.;,\[]")
+
+
+def _get_triples(statement):
+    for pattern in (DATA_TRIPLES, DELETE_TRIPLES):
+        match = pattern.match(statement)
+        if match:
+            return match.group("triples")
+    return None
+
+
+def count_triples(statement):
+    """Number of triples a statement inserts or deletes. Statements that
+    can not be parsed count as a single triple."""
+    triples = _get_triples(statement)
+    if triples is None:
+        return 1
+    if not SEVERAL_TRIPLES.search(TOKEN.sub("", triples).strip().rstrip(".")):
+        # a single triple, as most statements are, needs no parsing
+        return 1
+    graph = Graph()
+    try:
+        graph.parse(
+            data=VARIABLE.sub(r"_:\1", triples).strip().rstrip(".") + " .",
+            format="turtle",
+        )
+    except BadSyntax:
+        return 1
+    return len(graph) or 1
+
+
+def is_blank_node_structure(statement):
+    triples = _get_triples(statement)
+    return triples is not None and bool(NOT_GROUND.search(TOKEN.sub("", triples)))
+
+
+def format_duration(seconds):
+    return str(datetime.timedelta(seconds=int(round(seconds))))
+
+
+class ThroughputStore(TuningStore):
+    """Statements per second sent by each execution mode to each endpoint,
+    summed over the runs that succeeded"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, filename=DEFAULT_THROUGHPUT_FILE):
+        super(ThroughputStore, self).__init__(filename)
+
+    def record(self, endpoint, mode, statements, seconds):
+        with self._lock:
+            throughput = self.load(endpoint) or {}
+            totals = throughput.setdefault(mode, {"statements": 0, "seconds": 0})
+            totals["statements"] += statements
+            totals["seconds"] += seconds
+            self.save(endpoint, throughput)
+
+    def get_rates(self, endpoint):
+        """Statements per second of each execution mode"""
+        return {
+            mode: totals["statements"] / totals["seconds"]
+            for mode, totals in (self.load(endpoint) or {}).items()
+            if totals["seconds"] > 0
+        }
+
+
+class MigrationEstimate(object):
+    """What sending a migration would cost: statements, triples, payload
+    and, for each execution mode, requests and projected duration"""
+
+    def __init__(self, sparql_up, requests, rates):
+        # the last statement is the migration_graph history record
+        changes = sparql_up[:-1]
+        self.statements = len(changes)
+        self.added_triples = sum(
+            count_triples(statement)
+            for statement in changes
+            if not is_delete(statement)
+        )
+        self.removed_triples = sum(
+            count_triples(statement) for statement in changes if is_delete(statement)
+        )
+        self.blank_node_structures = len(
+            [statement for statement in changes if is_blank_node_structure(statement)]
+        )
+        self.payload_bytes = len(join_statements(sparql_up).encode("utf-8"))
+        self.requests = requests
+        self.rates = rates
+
+    def get_duration(self, mode):
+        """Seconds the migration would take, from the throughput of earlier
+        runs with the same execution mode, or None"""
+        if mode not in self.rates:
+            return None
+        return (self.statements + 1) / self.rates[mode]
+
+    def report(self):
+        lines = [
+            "Dry run: %d statements (and the history record)" % self.statements,
+            "- triples added: %d, removed: %d, blank node structures: %d"
+            % (self.added_triples, self.removed_triples, self.blank_node_structures),
+            "- payload: %d bytes" % self.payload_bytes,
+        ]
+        for mode, requests in self.requests.items():
+            duration = self.get_duration(mode)
+            if duration is None:
+                projection = "no earlier run to project a duration from"
+            else:
+                projection = "about %s at %.1f statements/s" % (
+                    format_duration(duration),
+                    self.rates[mode],
+                )
+            lines.append(
+                "- execution mode %s: %d requests, %s" % (mode, requests, projection)
+            )
+        return "\n".join(lines)
@@ -0,0 +1,238 @@
+import itertools
+import queue
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_BATCH_SIZE = 1
+DEFAULT_BATCH_BYTES = 1000000
+DEFAULT_CONCURRENCY = 1
+DEFAULT_STREAM_BUFFER = 1000
+EXECUTION_MODES = ("update", "graph_store", "atomic", "lanes")
+
+# first term written by an INSERT DATA, DELETE DATA or WITH ... DELETE
+# statement, which is the subject of its triples or the parent of its blank
+# node structure
+SUBJECT = re.compile(
+    r"^\s*(?:(?:INSERT|DELETE) DATA \{ GRAPH <[^>]*> \{|WITH <[^>]*> DELETE \{)\s*"
+    r"(<[^>]*>|_:[^\s.;,\]]+)"
+)
+
+
+def iter_batches(statements, limits):
+    """Group consecutive statements in batches limited by statement count and
+    by payload size, yielding lists of indexes of the given statements. The
+    (max_statements, max_bytes) limits are read again from limits() before
+    each batch is built, so they can change while batches are consumed. A
+    statement bigger than max_bytes goes alone in its own batch."""
+    index = 0
+    while index < len(statements):
+        max_statements, max_bytes = limits()
+        batch = [index]
+        batch_bytes = len(statements[index].encode("utf-8"))
+        index += 1
+        while index < len(statements) and len(batch) < max_statements:
+            statement_bytes = len(statements[index].encode("utf-8"))
+            if batch_bytes + statement_bytes > max_bytes:
+                break
+            batch.append(index)
+            batch_bytes += statement_bytes
+            index += 1
+        yield batch
+
+
+def iter_stream_batches(statements, limits):
+    """Like iter_batches, for (index, statement) pairs that are still being
+    generated: each batch is yielded as soon as it is full or the statements
+    are over"""
+    batch, batch_bytes = [], 0
+    for index, statement in statements:
+        max_statements, max_bytes = limits()
+        statement_bytes = len(statement.encode("utf-8"))
+        if batch and (
+            len(batch) >= max_statements or batch_bytes + statement_bytes > max_bytes
+        ):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(index)
+        batch_bytes += statement_bytes
+    if batch:
+        yield batch
+
+
+def iter_in_background(items, buffer_size=DEFAULT_STREAM_BUFFER):
+    """Consume items in a thread while they are used, at most buffer_size
+    items ahead, so producing them overlaps with sending them. An error
+    raised by the producer is raised to the consumer; closing the generator
+    stops the producer."""
+    buffer = queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+    done = object()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except Exception as e:
+            put((done, e))
+        else:
+            put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+def split_in_batches(
+    statements, max_statements=DEFAULT_BATCH_SIZE, max_bytes=DEFAULT_BATCH_BYTES
+):
+    return list(iter_batches(statements, lambda: (max_statements, max_bytes)))
+
+
+def join_statements(statements):
+    """Join SPARQL update operations in one multi-statement request"""
+    if len(statements) == 1:
+        return statements[0]
+    return ";\n".join(statement.strip().rstrip(";") for statement in statements)
+
+
+def is_delete(statement):
+    return statement.lstrip().upper().startswith(("WITH", "DELETE"))
+
+
+def split_in_phases(statements):
+    """Split statements in phases that must run one after the other: runs of
+    consecutive deletes or inserts and, at last, the migration_graph history
+    record, so the version is only written after every change succeeded.
+    Statements inside a phase are independent from each other."""
+    phases = []
+    for index, statement in enumerate(statements[:-1]):
+        if not phases or is_delete(statement) != is_delete(statements[index - 1]):
+            phases.append([])
+        phases[-1].append(index)
+    if statements:
+        phases.append([len(statements) - 1])
+    return phases
+
+
+def align_rollback_statements(statements, rollback_statements):
+    """Reorder the rollback statements given by Virtuoso.get_sparql, which
+    undo the inserts before the deletes, so each one has the index of the
+    statement it undoes"""
+    deletes = len(list(itertools.takewhile(is_delete, statements[:-1])))
+    changes = rollback_statements[:-1]
+    if len(changes) != len(statements) - 1:
+        return rollback_statements
+    inserts = len(changes) - deletes
+    return changes[inserts:] + changes[:inserts] + rollback_statements[-1:]
+
+
+def split_rollback_in_phases(applied, rollback_statements):
+    """Split the rollback statements of the applied statements in phases
+    that undo them in reverse order: runs of consecutive deletes or inserts,
+    whose statements are independent from each other"""
+    phases = []
+    for index in sorted(applied, reverse=True):
+        delete = is_delete(rollback_statements[index])
+        if not phases or delete != is_delete(rollback_statements[phases[-1][-1]]):
+            phases.append([])
+        phases[-1].append(index)
+    return phases
+
+
+def get_subject(statement):
+    match = SUBJECT.match(statement)
+    return match.group(1) if match else None
+
+
+def split_in_lanes(statements):
+    """Split statements, but the last one (the migration_graph history
+    record), in lanes of statements about the same subject, deletes first.
+    Lanes touch different subjects, so they can run at the same time without
+    conflicting, while each lane keeps its own order. Statements whose
+    subject is not known go in lanes of their own."""
+    lanes = OrderedDict()
+    for index, statement in enumerate(statements[:-1]):
+        lanes.setdefault(get_subject(statement) or index, []).append(index)
+    return [
+        sorted(lane, key=lambda index: not is_delete(statements[index]))
+        for lane in lanes.values()
+    ]
+
+
+def pack_lanes(lanes, limit):
+    """Join consecutive small lanes while they have at most limit()
+    statements, so lanes of a single statement still share requests"""
+    packed = []
+    for lane in lanes:
+        if packed and len(packed) + len(lane) <= limit():
+            packed.extend(lane)
+            continue
+        if packed:
+            yield packed
+        packed = list(lane)
+    if packed:
+        yield packed
+
+
+def run_concurrently(
+    function, items, concurrency=DEFAULT_CONCURRENCY, max_concurrency=None
+):
+    """Call function for every item keeping at most `concurrency` calls in
+    flight. Yields (item, result, error) as calls complete. Once a call fails
+    no new call is started, but the ones already in flight are awaited.
+
+    concurrency may also be a callable, read again before each call is
+    started, that never returns more than max_concurrency."""
+    limit = concurrency if callable(concurrency) else lambda: concurrency
+    if not callable(concurrency) and concurrency <= 1:
+        for item in items:
+            try:
+                result = function(item)
+            except Exception as e:
+                yield item, None, e
+                return
+            yield item, result, None
+        return
+
+    items = iter(items)
+    pending = {}
+    failed = False
+    with ThreadPoolExecutor(max_workers=max_concurrency or limit()) as executor:
+        while True:
+            while not failed and len(pending) < limit():
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                pending[executor.submit(function, item)] = item
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    failed = True
+                    yield item, None, error
+                else:
+                    yield item, future.result(), None
@@ -0,0 +1,97 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .cli import CLI
+from .main import Main
+
+
+def get_targets(config):
+    """(name, config) of every cluster in NEPTUNE_TARGETS: a list (or comma
+    separated string) of AWS_NEPTUNE_URLs, or a dict of names to the
+    settings that change for each cluster"""
+    targets = config.get("neptune_targets")
+    if isinstance(targets, str):
+        targets = [url.strip() for url in targets.split(",") if url.strip()]
+    if not isinstance(targets, dict):
+        targets = {url: {"aws_neptune_url": url} for url in targets}
+    if not targets:
+        raise Exception("no neptune targets configured")
+    return [
+        (name, config.copy(_get_overrides(overrides)))
+        for name, overrides in targets.items()
+    ]
+
+
+def _get_overrides(overrides):
+    overrides = {key.lower(): value for key, value in overrides.items()}
+    if "aws_neptune_url" in overrides:
+        # requests are signed for AWS_NEPTUNE_HOST when it is set, which is
+        # the host of a single cluster: the others sign the host of their url
+        overrides.setdefault("aws_neptune_host", None)
+    overrides["neptune_targets"] = None
+    return overrides
+
+
+class SharedResults(object):
+    """Results computed once and shared by every target, such as the
+    ontology of a version and the diff between two ontologies"""
+
+    def __init__(self):
+        self._results = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        # only the targets after the same result wait for each other
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._results:
+                self._results[key] = compute()
+            return self._results[key]
+
+
+class MultiTarget(object):
+    """Run the migration on several Neptune clusters at once. Each cluster
+    keeps its own current version, history record, output and errors, while
+    ontologies and diffs are computed once for all of them."""
+
+    def __init__(self, config):
+        self.config = config
+        self.mains = [
+            Main(target_config, name) for name, target_config in get_targets(config)
+        ]
+        shared_results = SharedResults()
+        for main in self.mains:
+            main.virtuoso.shared_results = shared_results
+
+    @staticmethod
+    def _execute(main):
+        try:
+            main.execute()
+        except (Exception, SystemExit) as e:
+            # CLI.error_and_exit exits, which must only end this target
+            return e
+        return None
+
+    def execute(self):
+        concurrency = int(
+            self.config.get("neptune_targets_concurrency", len(self.mains))
+        )
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            errors = list(executor.map(self._execute, self.mains))
+
+        failed = []
+        for main, error in zip(self.mains, errors):
+            if error is None:
+                CLI.msg("[%s] migration succeeded" % main.name, "GREEN")
+            else:
+                failed.append(main.name)
+                if isinstance(error, SystemExit):
+                    error = "exited with status %s" % error.code
+                CLI.msg("[%s] migration failed: %s" % (main.name, error), "RED")
+        if failed:
+            raise Exception(
+                "migration failed on %d of %d targets (%s)"
+                % (len(failed), len(self.mains), ", ".join(failed))
+            )
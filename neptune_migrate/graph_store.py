@@ -0,0 +1,59 @@
+import re
+
+from rdflib.graph import Graph
+
+# single ground triple statements, as generated by
+# Virtuoso._generate_migration_sparql_commands
+GROUND_INSERT = re.compile(
+    r"^\s*INSERT DATA \{ GRAPH <(?P<graph>[^>]*)> \{ (?P<triples>.*) \. \} \};?\s*$",
+    re.S,
+)
+GROUND_DELETE = re.compile(
+    r"^\s*WITH <(?P<graph>[^>]*)> DELETE \{ (?P<triples>.*) \. \} "
+    r"WHERE \{ (?P=triples) \. \};?\s*$",
+    re.S,
+)
+GROUND_DELETE_DATA = re.compile(
+    r"^\s*DELETE DATA \{ GRAPH <(?P<graph>[^>]*)> \{ (?P<triples>.*) \. \} \};?\s*$",
+    re.S,
+)
+# IRIs and literals, whose content is not syntax
+TOKEN = re.compile(r'<[^>]*>|"""(?:[^"\\]|\\.|"(?!""))*"""|"(?:[^"\\]|\\.)*"', re.S)
+# variables and blank nodes
+NOT_GROUND = re.compile(r"[?$]\w|_:|\[")
+BLANK_NODE = re.compile(r"_:|\[")
+
+
+def parse_ground_statement(statement):
+    """(operation, graph, triples) of a statement that only inserts or
+    deletes ground triples of a graph, with operation being "insert" or
+    "delete", or None for any other statement"""
+    for operation, pattern in (
+        ("insert", GROUND_INSERT),
+        ("delete", GROUND_DELETE),
+        ("delete", GROUND_DELETE_DATA),
+    ):
+        match = pattern.match(statement)
+        if match and not NOT_GROUND.search(TOKEN.sub("", match.group("triples"))):
+            return operation, match.group("graph"), match.group("triples")
+    return None
+
+
+def is_idempotent(statement):
+    """Whether sending a statement (or a batch of them) again leaves the
+    graph as sending it once did: every statement but the inserts of blank
+    nodes, such as the history record, which add new nodes every time"""
+    return not BLANK_NODE.search(TOKEN.sub("", statement))
+
+
+def to_ntriples(triples):
+    """Serialize triples written in Turtle syntax (as given by rdflib's n3())
+    as N-Triples, parsing all of them at once"""
+    graph = Graph()
+    graph.parse(data=" .\n".join(triples) + " .", format="turtle")
+    return graph.serialize(format="nt11").strip() + "\n"
+
+
+def delete_data(graph, triples):
+    """A single DELETE DATA request removing all the triples from the graph"""
+    return "DELETE DATA { GRAPH <%s> { %s . } }" % (graph, " .\n".join(triples))
@@ -1,21 +1,35 @@
 import logging
 import os
+import re
 from datetime import datetime
 
 
 class LOG(object):
     logger = None
 
-    def __init__(self, log_dir):
+    def __init__(self, log_dir, name=None):
         if log_dir:
             if not os.path.exists(log_dir):
                 os.makedirs(log_dir)
-            self.logger = logging.getLogger("simple-db-migrate")
+            logger_name = "simple-db-migrate"
+            suffix = ""
+            if name:
+                # each target of a fan-out run logs to a file of its own
+                logger_name = "%s.%s" % (logger_name, name)
+                suffix = "-%s" % re.sub(r"[^\w.-]+", "_", name)
+            self.logger = logging.getLogger(logger_name)
+            if name:
+                self.logger.propagate = False
+            # a logger made again writes to its new file only
+            for handler in list(self.logger.handlers):
+                self.logger.removeHandler(handler)
+                handler.close()
 
             now = datetime.now()
-            filename = "%s/%s.log" % (
+            filename = "%s/%s%s.log" % (
                 os.path.abspath(log_dir),
                 now.strftime("%Y%m%d%H%M%S"),
+                suffix,
             )
             hdlr = logging.FileHandler(filename)
             formatter = logging.Formatter("%(message)s")
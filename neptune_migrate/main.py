@@ -11,7 +11,7 @@ from .virtuoso import Virtuoso
 class Main(object):
     """Call all execution modules"""
 
-    def __init__(self, config):
+    def __init__(self, config, name=None):
 
         if not Main._valid_version():
             print(
@@ -21,9 +21,10 @@ class Main(object):
 
         Main._check_configuration(config)
         self.config = config
+        self.name = name
         self.virtuoso = Virtuoso(config)
         self.virtuoso_migrate = SimpleVirtuosoMigrate(config)
-        self.log = LOG(self.config.get("log_dir", None))
+        self.log = LOG(self.config.get("log_dir", None), name)
 
     @staticmethod
     def _valid_version():
@@ -36,23 +37,32 @@ class Main(object):
             "\nStarting Virtuoso migration...", "PINK", log_level_limit=1
         )
 
-        if self.config.get("load_ttl", None) is not None:
-            operation_result = self._load_triples()
+        try:
+            if self.config.get("load_ttl", None) is not None:
+                operation_result = self._load_triples()
 
-        else:
-            operation_result = self._migrate()
+            else:
+                operation_result = self._migrate()
 
-        run_after_script = self.config.get("RUN_AFTER", None)
-        if run_after_script:
-            self._execution_log(
-                "\nExecuting run_after script %s.\n" % run_after_script,
-                "PINK",
-                log_level_limit=1,
-            )
-            self._run_after(run_after_script, operation_result)
+            run_after_script = self.config.get("RUN_AFTER", None)
+            if run_after_script:
+                self._execution_log(
+                    "\nExecuting run_after script %s.\n" % run_after_script,
+                    "PINK",
+                    log_level_limit=1,
+                )
+                self._run_after(run_after_script, operation_result)
+        finally:
+            self._log_request_metrics()
+            self.virtuoso.close()
 
         self._execution_log("\nDone.\n", "PINK", log_level_limit=1)
 
+    def _log_request_metrics(self):
+        metrics = self.virtuoso.get_request_metrics()
+        if metrics.count:
+            self._execution_log("\n%s" % metrics.summary(), log_level_limit=1)
+
     def _load_triples(self):
         """Called if the -a option is passed in the command line"""
 
@@ -83,7 +93,9 @@ class Main(object):
             "err_list": err_list,
         }
 
-        if not self.config.get("show_sparql_only", False):
+        if not self.config.get("show_sparql_only", False) and not self.config.get(
+            "dry_run", False
+        ):
             response_dict = self.virtuoso.upload_ttls_to_virtuoso(files)
             for filename, (out, err) in list(response_dict.items()):
                 if err:
@@ -175,17 +187,26 @@ class Main(object):
                 destination_version
             )
 
-        sparql_up, sparql_down = self.virtuoso.get_sparql(
-            current_ontology,
-            destination_ontology,
-            current_version,
-            destination_version,
-            source,
-        )
+        if self._is_streaming():
+            sparql_up, sparql_down = self._stream_migrations(
+                current_ontology,
+                destination_ontology,
+                current_version,
+                destination_version,
+                source,
+            )
+        else:
+            sparql_up, sparql_down = self.virtuoso.get_sparql(
+                current_ontology,
+                destination_ontology,
+                current_version,
+                destination_version,
+                source,
+            )
 
-        self._execute_migrations(
-            sparql_up, sparql_down, current_version, destination_version
-        )
+            self._execute_migrations(
+                sparql_up, sparql_down, current_version, destination_version
+            )
 
         return {
             "operation": "migration",
@@ -232,6 +253,12 @@ class Main(object):
                 "RED",
                 log_level_limit=1,
             )
+        elif self.config.get("dry_run", False):
+            self._execution_log(
+                "\nWARNING: commands are not being executed " "('--dry-run' activated)",
+                "RED",
+                log_level_limit=1,
+            )
         else:
             self._execution_log("\nStarting Migration!", log_level_limit=1)
 
@@ -239,6 +266,13 @@ class Main(object):
             self._execution_log("\nNothing to do.\n", "PINK", log_level_limit=1)
             return
 
+        if self.config.get("dry_run", False):
+            self._execution_log(
+                "\n%s" % self.virtuoso.estimate(sparql_up).report(),
+                log_level_limit=1,
+            )
+            return
+
         if not self.config.get("show_sparql_only", False):
             self._execution_log("===== executing =====", log_level_limit=1)
 
@@ -246,25 +280,77 @@ class Main(object):
                 self._execution_log("\n".join(out_list), log_level_limit=1)
 
             self.virtuoso.execute_change(
-                sparql_up, sparql_down, execution_log=self._execution_log
+                sparql_up,
+                sparql_down,
+                execution_log=self._execution_log,
+                versions=(current_version, destination_version),
             )
 
         if self.config.get("show_sparql", False) or self.config.get(
             "show_sparql_only", False
         ):
-            self._execution_log(
-                "__________ SPARQL statements executed __________",
-                "YELLOW",
-                log_level_limit=1,
-            )
-            self._execution_log(sparql_up, "YELLOW", log_level_limit=1)
-            self._execution_log(
-                "_____________________________________________",
-                "YELLOW",
-                log_level_limit=1,
-            )
+            self._show_sparql(sparql_up)
+
+    def _is_streaming(self):
+        return (
+            self.config.get("execution_streaming", False)
+            and not self.config.get("show_sparql_only", False)
+            and not self.config.get("dry_run", False)
+        )
+
+    def _stream_migrations(
+        self,
+        current_ontology,
+        destination_ontology,
+        current_version,
+        destination_version,
+        source,
+    ):
+        """Send the statements of the migration while they are generated"""
+        self._execution_log(
+            "- Current version is: %s" % current_version, "GREEN", log_level_limit=1
+        )
+        self._execution_log(
+            ("- Destination version is: %s" % destination_version),
+            "GREEN",
+            log_level_limit=1,
+        )
+        self._execution_log("\nStarting Migration!", log_level_limit=1)
+        self._execution_log("===== executing =====", log_level_limit=1)
+
+        sparql_up, sparql_down = self.virtuoso.stream_change(
+            current_ontology,
+            destination_ontology,
+            current_version,
+            destination_version,
+            source,
+            execution_log=self._execution_log,
+        )
+
+        if not sparql_up:
+            self._execution_log("\nNothing to do.\n", "PINK", log_level_limit=1)
+        elif self.config.get("show_sparql", False):
+            self._show_sparql(sparql_up)
+        return sparql_up, sparql_down
+
+    def _show_sparql(self, sparql_up):
+        self._execution_log(
+            "__________ SPARQL statements executed __________",
+            "YELLOW",
+            log_level_limit=1,
+        )
+        self._execution_log(sparql_up, "YELLOW", log_level_limit=1)
+        self._execution_log(
+            "_____________________________________________",
+            "YELLOW",
+            log_level_limit=1,
+        )
 
     def _execution_log(self, msg, color="CYAN", log_level_limit=2):
+        if self.name and isinstance(msg, str):
+            # keep the output of each target apart when running many at once
+            text = msg.lstrip("\n")
+            msg = "%s[%s] %s" % (msg[: len(msg) - len(text)], self.name, text)
         if self.config.get("log_level", 1) >= log_level_limit:
             CLI.msg(msg, color)
         self.log.debug(msg)
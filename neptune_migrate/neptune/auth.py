@@ -1,11 +1,282 @@
+import configparser
+import datetime
+import hashlib
+import hmac
+import os
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import requests
 from aws_requests_auth.aws_auth import AWSRequestsAuth
 
+ALGORITHM = "AWS4-HMAC-SHA256"
+SERVICE = "neptune-db"
+DEFAULT_CREDENTIALS_FILE = "~/.aws/credentials"
+DEFAULT_PROFILE = "default"
+DEFAULT_REFRESH_INTERVAL = 300
+# refresh temporary credentials this long before they expire
+EXPIRATION_MARGIN = datetime.timedelta(minutes=5)
+
+Credentials = namedtuple(
+    "Credentials", ["access_key", "secret_key", "token", "expiration"]
+)
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def parse_expiration(value):
+    """Expiration of temporary credentials, given as an ISO 8601 timestamp
+    (UTC unless it says otherwise), or None"""
+    if not value:
+        return None
+    try:
+        expiration = datetime.datetime.fromisoformat(
+            value.strip().replace("Z", "+00:00")
+        )
+    except ValueError:
+        raise Exception("invalid credentials expiration ('%s')" % value)
+    if expiration.tzinfo is None:
+        expiration = expiration.replace(tzinfo=datetime.timezone.utc)
+    return expiration
+
+
+def _sign(key, msg):
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=16)
+def get_signing_key(secret_key, datestamp, region, service):
+    """SigV4 signing key, derived once per secret, date, region and service"""
+    k_date = _sign(("AWS4" + secret_key).encode("utf-8"), datestamp)
+    k_region = _sign(k_date, region)
+    k_service = _sign(k_region, service)
+    return _sign(k_service, "aws4_request")
+
+
+class ConfigCredentialsProvider(object):
+    """Static credentials from AWS_ACCESS_KEY, AWS_SECRET_ACCESS_KEY and the
+    optional AWS_SESSION_TOKEN settings"""
+
+    def __init__(self, config):
+        self.config = config
+
+    def load(self):
+        return Credentials(
+            self.config.get("aws_access_key"),
+            self.config.get("aws_secret_access_key"),
+            self.config.get("aws_session_token", None),
+            None,
+        )
+
+
+class EnvironmentCredentialsProvider(object):
+    """Credentials from the standard AWS_* environment variables, with the
+    expiration of temporary ones in AWS_CREDENTIAL_EXPIRATION or
+    AWS_SESSION_EXPIRATION"""
+
+    def load(self):
+        try:
+            return Credentials(
+                os.environ["AWS_ACCESS_KEY_ID"],
+                os.environ["AWS_SECRET_ACCESS_KEY"],
+                os.environ.get("AWS_SESSION_TOKEN"),
+                parse_expiration(
+                    os.environ.get("AWS_CREDENTIAL_EXPIRATION")
+                    or os.environ.get("AWS_SESSION_EXPIRATION")
+                ),
+            )
+        except KeyError as e:
+            raise Exception("environment variable %s is not set" % e)
+
+
+class FileCredentialsProvider(object):
+    """Credentials from a profile of an AWS shared credentials file, with the
+    expiration of temporary ones in aws_session_expiration or
+    x_security_token_expires"""
+
+    def __init__(self, filename=DEFAULT_CREDENTIALS_FILE, profile=DEFAULT_PROFILE):
+        self.filename = os.path.expanduser(filename)
+        self.profile = profile
+
+    def load(self):
+        parser = configparser.ConfigParser()
+        if not parser.read(self.filename):
+            raise Exception("credentials file not found (%s)" % self.filename)
+        try:
+            section = parser[self.profile]
+            return Credentials(
+                section["aws_access_key_id"],
+                section["aws_secret_access_key"],
+                section.get("aws_session_token"),
+                parse_expiration(
+                    section.get("aws_session_expiration")
+                    or section.get("x_security_token_expires")
+                ),
+            )
+        except KeyError as e:
+            raise Exception(
+                "invalid credentials profile '%s' in %s (%s missing)"
+                % (self.profile, self.filename, e)
+            )
+
+
+class RefreshableCredentials(object):
+    """Cache the credentials of a provider, loading them again when they are
+    about to expire or every refresh_interval seconds, so temporary
+    credentials rotated during a long run are picked up"""
+
+    def __init__(self, provider, refresh_interval=None, clock=_utcnow):
+        self.provider = provider
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._credentials = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _needs_refresh(self, now):
+        if self._credentials is None:
+            return True
+        expiration = self._credentials.expiration
+        if expiration is not None and expiration - now <= EXPIRATION_MARGIN:
+            return True
+        return (
+            self.refresh_interval is not None
+            and (now - self._loaded_at).total_seconds() >= self.refresh_interval
+        )
+
+    def get(self):
+        with self._lock:
+            now = self.clock()
+            if self._needs_refresh(now):
+                self._credentials = self.provider.load()
+                self._loaded_at = now
+            return self._credentials
+
+
+class SigV4Auth(requests.auth.AuthBase):
+    """Sign requests with AWS Signature Version 4 using cached signing keys
+    and refreshable credentials. Requests are signed for their own host,
+    or for host when they go to writer_url (or writer_url is not given)."""
+
+    def __init__(
+        self,
+        credentials,
+        region,
+        service=SERVICE,
+        host=None,
+        clock=_utcnow,
+        writer_url=None,
+    ):
+        self.credentials = credentials
+        self.region = region
+        self.service = service
+        self.host = host
+        self.clock = clock
+        self.writer_netloc = urlparse(writer_url).netloc if writer_url else None
+
+    def __call__(self, r):
+        r.headers.update(self.get_headers(r))
+        return r
+
+    def get_headers(self, r):
+        credentials = self.credentials.get()
+        now = self.clock()
+        amzdate = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = now.strftime("%Y%m%d")
+        host = urlparse(r.url).netloc
+        if self.host and self.writer_netloc in (None, host):
+            # readers are signed for their own host, not AWS_NEPTUNE_HOST
+            host = self.host
+
+        canonical_headers = "host:%s\nx-amz-date:%s\n" % (host, amzdate)
+        signed_headers = "host;x-amz-date"
+        if credentials.token:
+            canonical_headers += "x-amz-security-token:%s\n" % credentials.token
+            signed_headers += ";x-amz-security-token"
+
+        body = r.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        payload_hash = hashlib.sha256(body).hexdigest()
+
+        canonical_request = "\n".join(
+            [
+                r.method,
+                AWSRequestsAuth.get_canonical_path(r),
+                AWSRequestsAuth.get_canonical_querystring(r),
+                canonical_headers,
+                signed_headers,
+                payload_hash,
+            ]
+        )
+        credential_scope = "%s/%s/%s/aws4_request" % (
+            datestamp,
+            self.region,
+            self.service,
+        )
+        string_to_sign = "\n".join(
+            [
+                ALGORITHM,
+                amzdate,
+                credential_scope,
+                hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+            ]
+        )
+        signing_key = get_signing_key(
+            credentials.secret_key, datestamp, self.region, self.service
+        )
+        signature = hmac.new(
+            signing_key, string_to_sign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+
+        headers = {
+            "Authorization": "%s Credential=%s/%s, SignedHeaders=%s, Signature=%s"
+            % (
+                ALGORITHM,
+                credentials.access_key,
+                credential_scope,
+                signed_headers,
+                signature,
+            ),
+            "x-amz-date": amzdate,
+            "x-amz-content-sha256": payload_hash,
+        }
+        if credentials.token:
+            headers["X-Amz-Security-Token"] = credentials.token
+        return headers
+
+
+def get_credentials_provider(config):
+    provider = config.get("aws_credentials_provider", "config")
+    if provider == "config":
+        return ConfigCredentialsProvider(config)
+    if provider == "env":
+        return EnvironmentCredentialsProvider()
+    if provider == "file":
+        return FileCredentialsProvider(
+            config.get("aws_credentials_file", DEFAULT_CREDENTIALS_FILE),
+            config.get("aws_profile", DEFAULT_PROFILE),
+        )
+    raise Exception("invalid aws credentials provider ('%s')" % provider)
+
 
 def get_aws_auth(config):
-    return AWSRequestsAuth(
-        aws_access_key=config.get("aws_access_key"),
-        aws_secret_access_key=config.get("aws_secret_access_key"),
-        aws_host=config.get("aws_neptune_host"),
-        aws_region=config.get("aws_region"),
-        aws_service="neptune-db",
+    provider = get_credentials_provider(config)
+    refresh_interval = None
+    if not isinstance(provider, ConfigCredentialsProvider):
+        refresh_interval = config.get(
+            "aws_credentials_refresh_interval", DEFAULT_REFRESH_INTERVAL
+        )
+    credentials = RefreshableCredentials(provider, refresh_interval)
+    # fail fast on missing credentials instead of on the first request
+    credentials.get()
+    return SigV4Auth(
+        credentials,
+        config.get("aws_region"),
+        host=config.get("aws_neptune_host", None),
+        writer_url=config.get("aws_neptune_url", None),
     )
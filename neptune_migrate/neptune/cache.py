@@ -0,0 +1,69 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from ..sparql import get_graphs, normalize
+
+DEFAULT_CACHE_SIZE = 128
+
+
+class QueryCache(object):
+    """LRU cache of read query results with a time to live. Entries are
+    invalidated by updates on the graphs they read."""
+
+    def __init__(self, ttl, max_size=DEFAULT_CACHE_SIZE, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint, query, result_format="json"):
+        return endpoint, result_format, normalize(query)
+
+    def get(self, key):
+        """Cached result for the key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result, graphs, expires_at = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(result)
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (
+                copy.deepcopy(result),
+                get_graphs(key[-1]),
+                self.clock() + self.ttl,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, update):
+        """Drop the entries an update may have changed: the ones reading a
+        graph it writes, the ones reading the default graph, or every entry
+        when the update does not name its graphs"""
+        self.invalidate_graphs(get_graphs(update))
+
+    def invalidate_graphs(self, graphs):
+        """Drop the entries reading any of the graphs, the default graph, or
+        every entry when no graph is given"""
+        with self._lock:
+            for key, (_, entry_graphs, _) in list(self._entries.items()):
+                if not graphs or not entry_graphs or graphs & entry_graphs:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,28 +1,420 @@
+import gzip
+import json
+import threading
+import time
 from urllib.parse import urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from ..graph_store import is_idempotent
+from ..sparql import get_query_form
+from .cache import DEFAULT_CACHE_SIZE, QueryCache
+from .endpoints import DEFAULT_HEALTH_CHECK_INTERVAL, ReaderPool, parse_urls
+from .formats import (
+    decode_csv,
+    decode_ntriples,
+    decode_tsv,
+    parse_ntriples_line,
+    parse_tsv_header,
+    parse_tsv_row,
+)
+from .metrics import RequestMetrics, RequestRecord
+from .retry import RetryPolicy
+
+DEFAULT_POOL_SIZE = 10
+TSV = "text/tab-separated-values"
+NTRIPLES = "application/n-triples"
+CSV = "text/csv"
+RESULT_FORMATS = {
+    "json": (None, None),
+    "tsv": (TSV, decode_tsv),
+    "csv": (CSV, decode_csv),
+    "ntriples": (NTRIPLES, decode_ntriples),
+}
+GZIP_LEVEL = 6
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_TIMEOUT = 60
 
 
 class NeptuneClient:
     def __init__(self, auth, config):
         self.auth = auth
         self.config = config
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.retry_policy = RetryPolicy.from_config(config)
+        self.gzip_threshold = config.get("aws_neptune_gzip_threshold", None)
+        self.metrics = RequestMetrics()
+        if config.get("aws_neptune_metrics_hook", None):
+            self.metrics.add_hook(config.get("aws_neptune_metrics_hook"))
+        self._local = threading.local()
+        self.result_format = config.get("aws_neptune_result_format", "json")
+        if self.result_format not in RESULT_FORMATS:
+            raise Exception("invalid result format ('%s')" % self.result_format)
+        self.cache = None
+        if config.get("aws_neptune_cache_ttl", None):
+            self.cache = QueryCache(
+                float(config.get("aws_neptune_cache_ttl")),
+                int(config.get("aws_neptune_cache_size", DEFAULT_CACHE_SIZE)),
+            )
+        self.readers = None
+        reader_urls = parse_urls(config.get("aws_neptune_reader_urls", None))
+        if reader_urls:
+            self.readers = ReaderPool(
+                reader_urls,
+                self._is_healthy,
+                float(
+                    config.get(
+                        "aws_neptune_health_check_interval",
+                        DEFAULT_HEALTH_CHECK_INTERVAL,
+                    )
+                ),
+            )
+        self.read_your_writes_wait = float(
+            config.get("aws_neptune_read_your_writes_wait", 0)
+        )
+        self._last_write = None
+        connect_timeout = float(
+            config.get("aws_neptune_connect_timeout", DEFAULT_CONNECT_TIMEOUT)
+        )
+        self.timeouts = {
+            "query": (
+                connect_timeout,
+                float(config.get("aws_neptune_query_timeout", DEFAULT_TIMEOUT)),
+            ),
+            "update": (
+                connect_timeout,
+                float(config.get("aws_neptune_update_timeout", DEFAULT_TIMEOUT)),
+            ),
+        }
+
+    @property
+    def session(self):
+        """Keep-alive session shared by every request sent by this client.
+
+        Connections (and so their TLS sessions) are reused across requests
+        instead of paying a new handshake for each statement."""
+        session = self._session
+        if session is None:
+            # concurrent batches ask for it at once on the first requests
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+                session = self._session
+        return session
+
+    def _build_session(self):
+        pool_size = int(self.config.get("aws_neptune_pool_size", DEFAULT_POOL_SIZE))
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, pool_block=True
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.auth = self._sign
+        return session
+
+    def _sign(self, request):
+        """Sign with the client auth, keeping how long it took"""
+        started = time.perf_counter()
+        try:
+            return self.auth(request) if self.auth else request
+        finally:
+            self._local.sign_time = time.perf_counter() - started
+
+    def _timed_request(self, operation, **request_params):
+        """Send a request through the session, recording its metrics"""
+        self._local.sign_time = 0
+        started = time.perf_counter()
+        response = None
+        error = None
+        try:
+            response = self.session.request(**request_params)
+            if not request_params.get("stream"):
+                # read the body now so it is part of the measured time
+                response.content
+            return response
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._record(operation, request_params, response, error, started)
+
+    @staticmethod
+    def _body_size(request_params):
+        data = request_params.get("data")
+        if data is None and request_params.get("json") is not None:
+            data = json.dumps(request_params["json"])
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return len(data or b"")
+
+    def _record(self, operation, request_params, response, error, started):
+        status = None
+        response_bytes = 0
+        wait_time = 0
+        if response is not None:
+            status = response.status_code
+            wait_time = response.elapsed.total_seconds()
+            if not request_params.get("stream"):
+                response_bytes = len(response.content)
+        self.metrics.record(
+            RequestRecord(
+                operation=operation,
+                status=status,
+                request_bytes=self._body_size(request_params),
+                response_bytes=response_bytes,
+                sign_time=self._local.sign_time,
+                wait_time=wait_time,
+                total_time=time.perf_counter() - started,
+                error=error,
+            )
+        )
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def update_query(self, query, on_retry=None):
+        return self.execute_query(query, body_payload="update", on_retry=on_retry)
+
+    def execute_query(
+        self, query, body_payload="query", on_retry=None, result_format=None
+    ):
+        """Send the query, retrying throttled and transient failures.
+        on_retry(attempt, error, delay) is called before each new attempt.
+        Read results are cached when AWS_NEPTUNE_CACHE_TTL is set.
+
+        Read results are asked in result_format (AWS_NEPTUNE_RESULT_FORMAT by
+        default): json, tsv, csv or ntriples, the last one for CONSTRUCT and
+        DESCRIBE queries, which get it whenever a non JSON format is asked.
+        Every format is returned in the structure of the SPARQL JSON results
+        format; CSV results do not keep datatypes nor languages."""
+        if body_payload == "update":
+            result_format = "json"
+        else:
+            result_format = self._get_result_format(query, result_format)
+        accept, decode = RESULT_FORMATS[result_format]
+
+        def send():
+            return self.retry_policy.call(
+                self._send_query,
+                query,
+                body_payload,
+                accept=accept,
+                decode=decode,
+                on_retry=self._counting_retries(on_retry),
+                # an insert of blank nodes sent twice would add them twice
+                idempotent=body_payload != "update" or is_idempotent(query),
+            )
+
+        if self.cache is None:
+            return send()
+
+        if body_payload == "update":
+            try:
+                return send()
+            finally:
+                self.cache.invalidate(query)
+
+        key = QueryCache.key(self.writer_url, query, result_format)
+        result = self.cache.get(key)
+        if result is None:
+            result = send()
+            self.cache.put(key, result)
+        return result
+
+    def _counting_retries(self, on_retry):
+        def on_retry_hook(attempt, error, delay):
+            self.metrics.record_retry()
+            if on_retry:
+                on_retry(attempt, error, delay)
+
+        return on_retry_hook
+
+    def post_ntriples(self, graph, ntriples, on_retry=None):
+        """Add N-Triples to a graph with a SPARQL Graph Store Protocol POST,
+        retrying like execute_query"""
+        try:
+            return self.retry_policy.call(
+                self._send_ntriples,
+                graph,
+                ntriples,
+                on_retry=self._counting_retries(on_retry),
+            )
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate_graphs({graph})
+
+    def _send_ntriples(self, graph, ntriples):
+        request_params = {
+            "url": f"{self.writer_url}/sparql/gsp/",
+            "method": "POST",
+            "params": {"graph": graph},
+            "headers": {
+                "Content-Type": NTRIPLES,
+                "Accept-Encoding": "gzip, deflate",
+            },
+            "data": ntriples,
+            "timeout": self.timeouts["update"],
+        }
+        self._compress_body(request_params)
+        response = self._timed_request("gsp", **request_params)
+        response.raise_for_status()
+        self._last_write = time.monotonic()
+
+        return response.text
+
+    def _get_result_format(self, query, result_format):
+        result_format = result_format or self.result_format
+        if result_format not in RESULT_FORMATS:
+            raise Exception("invalid result format ('%s')" % result_format)
+        form = get_query_form(query)
+        if form == "ASK":
+            # boolean results only have a JSON serialization
+            return "json"
+        if form in ("CONSTRUCT", "DESCRIBE") and result_format != "json":
+            return "ntriples"
+        if result_format == "ntriples":
+            return "tsv"
+        return result_format
+
+    def request(self, method, path, **kwargs):
+        """Send a request to another Neptune HTTP API (e.g. the bulk loader)
+        and return its decoded JSON response"""
+        return self.retry_policy.call(self._send_request, method, path, **kwargs)
+
+    def _send_request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeouts["query"])
+        response = self._timed_request(
+            path.split("/")[0],
+            method=method,
+            url=f"{self.writer_url}/{path}",
+            **kwargs,
+        )
+        response.raise_for_status()
+
+        return response.json()
+
+    def stream_query(self, query):
+        """Yield the bindings of a SELECT, or the (subject, predicate, object)
+        triples of a CONSTRUCT/DESCRIBE, as they come off the socket, so big
+        results are processed in constant memory. Results are asked as TSV or
+        N-Triples, which can be decoded line by line, and returned in the
+        structure of the SPARQL JSON results format."""
+        if get_query_form(query) in ("CONSTRUCT", "DESCRIBE"):
+            accept, parse = NTRIPLES, self._parse_ntriples_lines
+        else:
+            accept, parse = TSV, self._parse_tsv_lines
+
+        response = self.retry_policy.call(
+            self._send_query, query, "query", accept=accept, stream=True
+        )
+        with response:
+            lines = (
+                line.decode("utf-8")
+                for line in response.iter_lines()
+                if line is not None
+            )
+            yield from parse(lines)
+
+    @staticmethod
+    def _parse_tsv_lines(lines):
+        variables = parse_tsv_header(next(lines, ""))
+        for line in lines:
+            yield parse_tsv_row(line, variables)
+
+    @staticmethod
+    def _parse_ntriples_lines(lines):
+        for line in lines:
+            triple = parse_ntriples_line(line)
+            if triple:
+                yield triple
+
+    def _compress_body(self, request_params):
+        """Gzip request bodies bigger than AWS_NEPTUNE_GZIP_THRESHOLD bytes"""
+        if self.gzip_threshold is None:
+            return
+        data = request_params["data"].encode("utf-8")
+        if len(data) < int(self.gzip_threshold):
+            return
+        request_params["data"] = gzip.compress(data, GZIP_LEVEL, mtime=0)
+        request_params["headers"]["Content-Encoding"] = "gzip"
+
+    @property
+    def writer_url(self):
+        return self.config.get("aws_neptune_url")
+
+    def _is_healthy(self, url):
+        """Health check of a reader through the Neptune status API"""
+        try:
+            response = self._timed_request(
+                "status",
+                method="GET",
+                url=f"{url}/status",
+                timeout=self.timeouts["query"],
+            )
+            return (
+                response.status_code == 200
+                and response.json().get("status") == "healthy"
+            )
+        except (requests.RequestException, ValueError):
+            return False
 
-    def update_query(self, query):
-        return self.execute_query(query, body_payload="update")
+    def _get_endpoint(self, body_payload):
+        """Reads go to a healthy reader when there is one, after waiting for
+        recent writes to be replicated when AWS_NEPTUNE_READ_YOUR_WRITES_WAIT
+        is set. Everything else goes to the writer."""
+        if body_payload != "query" or self.readers is None:
+            return self.writer_url
+        reader = self.readers.get()
+        if reader is None:
+            return self.writer_url
+        if self._last_write is not None and self.read_your_writes_wait:
+            wait = self._last_write + self.read_your_writes_wait - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        return reader
 
-    def execute_query(self, query, body_payload="query"):
+    def _send_query(self, query, body_payload, accept=None, stream=False, decode=None):
+        endpoint = self._get_endpoint(body_payload)
         request_params = {
-            "url": f"{self.config.get('aws_neptune_url')}/sparql",
+            "url": f"{endpoint}/sparql",
             "method": "POST",
             "headers": {
                 "Content-Type": "application/x-www-form-urlencoded",
-                "Connection": "close",
+                "Accept-Encoding": "gzip, deflate",
             },
             "data": urlencode({body_payload: query}),
-            "timeout": 60,
+            "timeout": self.timeouts[body_payload],
         }
-        response = requests.request(**request_params, auth=self.auth)
+        self._compress_body(request_params)
+        if accept:
+            request_params["headers"]["Accept"] = accept
+        if stream:
+            request_params["stream"] = True
+        try:
+            response = self._timed_request(body_payload, **request_params)
+        except (requests.ConnectionError, requests.Timeout):
+            if endpoint != self.writer_url:
+                # retried on the next reader
+                self.readers.mark_down(endpoint)
+            raise
         response.raise_for_status()
+        if body_payload == "update":
+            self._last_write = time.monotonic()
 
+        if stream:
+            return response
+        if decode:
+            return decode(response.text)
         return response.json()
@@ -0,0 +1,67 @@
+import threading
+import time
+
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+
+
+def parse_urls(value):
+    """Endpoint urls given as a list or as a comma separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [url.strip().rstrip("/") for url in value if url.strip()]
+
+
+class ReaderPool(object):
+    """Round-robin over reader endpoints. A reader that fails is skipped
+    until health_check(url) passes again, which is tried at most once every
+    health_check_interval seconds."""
+
+    def __init__(
+        self,
+        urls,
+        health_check,
+        health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self.urls = list(urls)
+        self.health_check = health_check
+        self.health_check_interval = health_check_interval
+        self.clock = clock
+        self._down = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _candidates(self):
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.urls)
+        return self.urls[start:] + self.urls[:start]
+
+    def get(self):
+        """Next healthy reader, or None when every reader is down"""
+        for url in self._candidates():
+            with self._lock:
+                down_until = self._down.get(url)
+                if down_until is None:
+                    return url
+                if self.clock() < down_until:
+                    continue
+                # only one caller checks the reader until the next interval
+                self._down[url] = self.clock() + self.health_check_interval
+            if self.health_check(url):
+                self.mark_up(url)
+                return url
+        return None
+
+    def mark_down(self, url):
+        with self._lock:
+            self._down[url] = self.clock() + self.health_check_interval
+
+    def mark_up(self, url):
+        with self._lock:
+            self._down.pop(url, None)
+
+    def is_down(self, url):
+        return url in self._down
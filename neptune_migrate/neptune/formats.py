@@ -0,0 +1,139 @@
+import csv
+import io
+import re
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+TERM = re.compile(
+    r"<(?P<iri>[^>]*)>"
+    r"|_:(?P<bnode>\S+)"
+    r'|"(?P<literal>(?:[^"\\]|\\.)*)"(?:@(?P<lang>[A-Za-z0-9-]+)|\^\^<(?P<datatype>[^>]*)>)?'
+    r"|(?P<bare>[^\s<\"]+)"
+)
+ABSOLUTE_IRI = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*:[^\s]*$")
+TRIPLE_VARIABLES = ["subject", "predicate", "object"]
+ESCAPE = re.compile(r"\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))")
+ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f"}
+
+
+def _unescape(value):
+    def replace(match):
+        code = match.group(1) or match.group(2)
+        if code:
+            return chr(int(code, 16))
+        return ESCAPES.get(match.group(3), match.group(3))
+
+    return ESCAPE.sub(replace, value)
+
+
+def _bare_term(value):
+    """Abbreviated numbers and booleans allowed by the TSV results format"""
+    if value in ("true", "false"):
+        datatype = "boolean"
+    elif re.match(r"^[+-]?\d+$", value):
+        datatype = "integer"
+    elif re.match(r"^[+-]?\d*\.\d+$", value):
+        datatype = "decimal"
+    else:
+        datatype = "double"
+    return {"type": "literal", "value": value, "datatype": XSD + datatype}
+
+
+def _to_binding_value(match):
+    if match.group("iri") is not None:
+        return {"type": "uri", "value": _unescape(match.group("iri"))}
+    if match.group("bnode") is not None:
+        return {"type": "bnode", "value": match.group("bnode")}
+    if match.group("literal") is not None:
+        term = {"type": "literal", "value": _unescape(match.group("literal"))}
+        if match.group("lang"):
+            term["xml:lang"] = match.group("lang")
+        elif match.group("datatype"):
+            term["datatype"] = match.group("datatype")
+        return term
+    return _bare_term(match.group("bare"))
+
+
+def parse_term(text):
+    """Parse an RDF term written in N-Triples/Turtle syntax into the
+    structure used by the SPARQL JSON results format"""
+    match = TERM.match(text.strip())
+    if not match:
+        raise ValueError("invalid RDF term: %r" % text)
+    return _to_binding_value(match)
+
+
+def parse_tsv_header(line):
+    return [variable.strip().lstrip("?$") for variable in line.split("\t")]
+
+
+def parse_tsv_row(line, variables):
+    binding = {}
+    for variable, cell in zip(variables, line.split("\t")):
+        if cell.strip():
+            binding[variable] = parse_term(cell)
+    return binding
+
+
+def parse_ntriples_line(line):
+    """Triple (subject, predicate, object) of a N-Triples line, or None for
+    blank lines and comments"""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    terms = []
+    position = 0
+    while len(terms) < 3:
+        while position < len(line) and line[position].isspace():
+            position += 1
+        match = TERM.match(line, position)
+        if not match:
+            raise ValueError("invalid N-Triples line: %r" % line)
+        terms.append(_to_binding_value(match))
+        position = match.end()
+    return tuple(terms)
+
+
+def _results(variables, bindings):
+    return {"head": {"vars": variables}, "results": {"bindings": bindings}}
+
+
+def decode_tsv(text):
+    """SPARQL TSV results in the structure of the SPARQL JSON format"""
+    lines = text.splitlines()
+    if not lines:
+        return _results([], [])
+    variables = parse_tsv_header(lines[0])
+    return _results(variables, [parse_tsv_row(line, variables) for line in lines[1:]])
+
+
+def _csv_term(value):
+    # CSV results do not keep term types: IRIs and blank nodes are recognized
+    # by their syntax and datatypes and languages are lost
+    if value.startswith("_:"):
+        return {"type": "bnode", "value": value[2:]}
+    if ABSOLUTE_IRI.match(value):
+        return {"type": "uri", "value": value}
+    return {"type": "literal", "value": value}
+
+
+def decode_csv(text):
+    """SPARQL CSV results in the structure of the SPARQL JSON format"""
+    rows = csv.reader(io.StringIO(text))
+    variables = next(rows, [])
+    bindings = [
+        {variable: _csv_term(value) for variable, value in zip(variables, row) if value}
+        for row in rows
+    ]
+    return _results(variables, bindings)
+
+
+def decode_ntriples(text):
+    """N-Triples CONSTRUCT/DESCRIBE results as subject, predicate and object
+    bindings in the structure of the SPARQL JSON format"""
+    bindings = []
+    for line in text.splitlines():
+        triple = parse_ntriples_line(line)
+        if triple:
+            bindings.append(dict(zip(TRIPLE_VARIABLES, triple)))
+    return _results(list(TRIPLE_VARIABLES), bindings)
@@ -0,0 +1,172 @@
+import os
+import shutil
+import time
+from urllib.parse import urlparse
+
+from ..core.exceptions import MigrationException
+
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_LOAD_TIMEOUT = 3600
+
+LOAD_COMPLETED = "LOAD_COMPLETED"
+LOAD_RUNNING_STATUSES = {"LOAD_NOT_STARTED", "LOAD_IN_QUEUE", "LOAD_IN_PROGRESS"}
+
+
+class LocalDirectoryStaging(object):
+    """Stage files in a local directory. base_uri is the address the loader
+    uses to read that directory (a file:// uri by default), which makes it
+    possible to run against a local stand-in of the loader API."""
+
+    def __init__(self, directory, base_uri=None):
+        self.directory = os.path.realpath(directory)
+        self.base_uri = (base_uri or "file://%s" % self.directory).rstrip("/")
+        self._copies = set()
+
+    def stage(self, filename):
+        destination = os.path.join(self.directory, os.path.basename(filename))
+        if os.path.realpath(filename) != destination:
+            shutil.copyfile(filename, destination)
+            self._copies.add(destination)
+        return "%s/%s" % (self.base_uri, os.path.basename(filename))
+
+    def unstage(self, source):
+        """Remove the staged copy, never a file that was already there"""
+        staged = os.path.join(self.directory, os.path.basename(source))
+        if staged in self._copies:
+            self._copies.remove(staged)
+            os.remove(staged)
+
+
+class S3Staging(object):
+    """Stage files in an S3 bucket, as required by the Neptune loader"""
+
+    def __init__(self, uri):
+        try:
+            import boto3
+        except ImportError:
+            raise Exception("boto3 is required to stage files on S3 (%s)" % uri)
+        parsed = urlparse(uri)
+        self.bucket = parsed.netloc
+        self.prefix = parsed.path.strip("/")
+        self.s3 = boto3.client("s3")
+
+    def _key(self, filename):
+        return "/".join(filter(None, [self.prefix, os.path.basename(filename)]))
+
+    def stage(self, filename):
+        key = self._key(filename)
+        self.s3.upload_file(filename, self.bucket, key)
+        return "s3://%s/%s" % (self.bucket, key)
+
+    def unstage(self, source):
+        self.s3.delete_object(Bucket=self.bucket, Key=self._key(source))
+
+
+def get_staging(config):
+    location = config.get("aws_neptune_loader_staging")
+    if location.startswith("s3://"):
+        return S3Staging(location)
+    return LocalDirectoryStaging(
+        location, config.get("aws_neptune_loader_staging_uri", None)
+    )
+
+
+class NeptuneLoader(object):
+    """Load TTL files into a graph through the Neptune bulk loader API"""
+
+    def __init__(self, client, config, staging=None, sleep=time.sleep):
+        self.client = client
+        self.staging = staging or get_staging(config)
+        self.graph = config.get("database_graph")
+        self.region = config.get("aws_region")
+        self.iam_role_arn = config.get("aws_neptune_loader_iam_role_arn", None)
+        self.poll_interval = float(
+            config.get("aws_neptune_loader_poll_interval", DEFAULT_POLL_INTERVAL)
+        )
+        self.timeout = float(
+            config.get("aws_neptune_loader_timeout", DEFAULT_LOAD_TIMEOUT)
+        )
+        self.sleep = sleep
+
+    def _start_load(self, source):
+        body = {
+            "source": source,
+            "format": "turtle",
+            "region": self.region,
+            "failOnError": "TRUE",
+            "queueRequest": "TRUE",
+            "parserConfiguration": {"namedGraphUri": self.graph},
+        }
+        if self.iam_role_arn:
+            body["iamRoleArn"] = self.iam_role_arn
+        response = self.client.request("POST", "loader", json=body)
+        return response["payload"]["loadId"]
+
+    def _get_status(self, load_id):
+        response = self.client.request(
+            "GET", "loader/%s" % load_id, params={"details": "true", "errors": "true"}
+        )
+        return response["payload"]
+
+    @staticmethod
+    def _describe(payload):
+        overall = payload.get("overallStatus", {})
+        return "%s (%s records, %s parsing errors, %s insert errors)" % (
+            overall.get("status"),
+            overall.get("totalRecords", 0),
+            overall.get("parsingErrors", 0),
+            overall.get("insertErrors", 0),
+        )
+
+    @staticmethod
+    def _describe_errors(payload):
+        errors = payload.get("errors", {}).get("errorLogs", [])
+        return "; ".join(
+            "%s: %s" % (error.get("errorCode"), error.get("errorMessage"))
+            for error in errors
+        )
+
+    def load(self, filenames):
+        """Stage and load the given files, queueing every load job before
+        polling them. Returns {filename: (out, err)}, like
+        Virtuoso.upload_ttls_to_virtuoso."""
+        results = {}
+        jobs = {}
+        for filename in filenames:
+            source = None
+            try:
+                source = self.staging.stage(filename)
+                jobs[filename] = (source, self._start_load(source))
+            except Exception as e:
+                if source:
+                    self.staging.unstage(source)
+                results[filename] = ("", "could not start load: %s" % e)
+
+        deadline = time.time() + self.timeout
+        while jobs:
+            for filename, (source, load_id) in list(jobs.items()):
+                payload = self._get_status(load_id)
+                status = payload.get("overallStatus", {}).get("status")
+                if status in LOAD_RUNNING_STATUSES:
+                    continue
+                del jobs[filename]
+                self.staging.unstage(source)
+                if status == LOAD_COMPLETED:
+                    results[filename] = (
+                        "Load %s: %s" % (load_id, self._describe(payload)),
+                        "",
+                    )
+                else:
+                    error = "Load %s: %s %s" % (
+                        load_id,
+                        self._describe(payload),
+                        self._describe_errors(payload),
+                    )
+                    results[filename] = ("", error.strip())
+            if jobs:
+                if time.time() > deadline:
+                    raise MigrationException(
+                        "bulk load timed out waiting for %s" % ", ".join(sorted(jobs))
+                    )
+                self.sleep(self.poll_interval)
+        return results
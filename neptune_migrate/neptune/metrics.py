@@ -0,0 +1,153 @@
+import bisect
+import threading
+from collections import Counter, namedtuple
+
+# exponential bucket bounds: 1ms to ~65s and 64B to 64MB
+TIME_BUCKETS = [0.001 * 2**i for i in range(17)]
+SIZE_BUCKETS = [64 * 4**i for i in range(11)]
+
+RequestRecord = namedtuple(
+    "RequestRecord",
+    [
+        "operation",
+        "status",
+        "request_bytes",
+        "response_bytes",
+        "sign_time",
+        "wait_time",
+        "total_time",
+        "error",
+    ],
+)
+RequestRecord.__doc__ = """One HTTP request sent to Neptune. wait_time goes from
+sending the request to receiving the response headers (connection, upload
+and server processing) and total_time also includes signing and reading
+the response body."""
+
+
+class Histogram(object):
+    """Count of values per exponential bucket, with approximate percentiles"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the given percentile"""
+        if not self.count:
+            return 0
+        rank = self.count * percent / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+
+class RequestMetrics(object):
+    """Per-request timings, sizes, status codes and retries of a Neptune
+    client. Every record is also passed to the registered hooks."""
+
+    def __init__(self):
+        self.hooks = []
+        self.statuses = Counter()
+        self.retries = 0
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def _histogram(self, operation, name, bounds):
+        key = (operation, name)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(bounds)
+        return self.histograms[key]
+
+    def record(self, record):
+        with self._lock:
+            self.statuses[record.status or record.error] += 1
+            for name in ("sign_time", "wait_time", "total_time"):
+                self._histogram(record.operation, name, TIME_BUCKETS).add(
+                    getattr(record, name)
+                )
+            for name in ("request_bytes", "response_bytes"):
+                self._histogram(record.operation, name, SIZE_BUCKETS).add(
+                    getattr(record, name)
+                )
+        for hook in self.hooks:
+            hook(record)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def count(self):
+        return sum(self.statuses.values())
+
+    def get_counts(self):
+        """(requests, failed requests, retries) recorded so far"""
+        with self._lock:
+            errors = sum(
+                count
+                for status, count in self.statuses.items()
+                if not isinstance(status, int) or status >= 400
+            )
+            return self.count, errors, self.retries
+
+    def summary(self):
+        lines = [
+            "Neptune requests: %d (%s), %d retries"
+            % (
+                self.count,
+                ", ".join(
+                    "%s: %d" % (status, count)
+                    for status, count in sorted(
+                        self.statuses.items(), key=lambda item: str(item[0])
+                    )
+                ),
+                self.retries,
+            )
+        ]
+        for operation in sorted({operation for operation, _ in self.histograms}):
+            total = self.histograms[(operation, "total_time")]
+            wait = self.histograms[(operation, "wait_time")]
+            sign = self.histograms[(operation, "sign_time")]
+            sent = self.histograms[(operation, "request_bytes")]
+            received = self.histograms[(operation, "response_bytes")]
+            lines.append(
+                "- %s: %d requests in %.2fs; latency mean %.3fs p50 <%.3fs "
+                "p99 <%.3fs max %.3fs; waiting %.2fs, signing %.2fs; "
+                "%d bytes sent, %d bytes received"
+                % (
+                    operation,
+                    total.count,
+                    total.total,
+                    total.mean,
+                    total.percentile(50),
+                    total.percentile(99),
+                    total.max,
+                    wait.total,
+                    sign.total,
+                    sent.total,
+                    received.total,
+                )
+            )
+        return "\n".join(lines)
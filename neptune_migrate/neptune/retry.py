@@ -0,0 +1,151 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.1
+DEFAULT_MAX_DELAY = 20
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+OVERSIZED_STATUS_CODES = {413}
+OVERSIZED_ERROR_CODES = {
+    "TimeLimitExceededException",
+    "MemoryLimitExceededException",
+    "QueryTooLargeException",
+}
+THROTTLING_STATUS_CODES = {429, 503}
+THROTTLING_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException"}
+RETRYABLE_ERROR_CODES = {
+    "ConcurrentModificationException",
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ReadOnlyViolationException",
+}
+
+
+def get_error_code(response):
+    """Neptune error code (e.g. ThrottlingException) of a failed response"""
+    try:
+        return response.json().get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+def get_retry_after(response):
+    """Seconds asked by the server through the Retry-After header, if any"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+def is_oversized(error):
+    """Whether the request failed because it was too big or too slow to be
+    processed, in which case sending it again as-is would fail again"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        if error.response.status_code in OVERSIZED_STATUS_CODES:
+            return True
+        return get_error_code(error.response) in OVERSIZED_ERROR_CODES
+    return False
+
+
+def is_ambiguous(error):
+    """Whether the server may have processed a request that failed: its
+    response timed out or the connection dropped after it was sent"""
+    if isinstance(error, requests.ReadTimeout):
+        return True
+    if isinstance(error, requests.ConnectTimeout) or not isinstance(
+        error, requests.ConnectionError
+    ):
+        return False
+    reason = error.args[0] if error.args else None
+    # a connection that could not be opened never sent the request
+    return not isinstance(getattr(reason, "reason", reason), NewConnectionError)
+
+
+def is_throttling(error):
+    """Whether the server asked to slow down"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        if error.response.status_code in THROTTLING_STATUS_CODES:
+            return True
+        return get_error_code(error.response) in THROTTLING_ERROR_CODES
+    return False
+
+
+class RetryPolicy(object):
+    """Retry throttled or transient Neptune failures with capped exponential
+    backoff and full jitter"""
+
+    def __init__(
+        self,
+        max_retries=DEFAULT_MAX_RETRIES,
+        base_delay=DEFAULT_BASE_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        sleep=time.sleep,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+    @staticmethod
+    def from_config(config):
+        return RetryPolicy(
+            max_retries=int(config.get("aws_neptune_max_retries", DEFAULT_MAX_RETRIES)),
+            base_delay=float(
+                config.get("aws_neptune_retry_base_delay", DEFAULT_BASE_DELAY)
+            ),
+            max_delay=float(
+                config.get("aws_neptune_retry_max_delay", DEFAULT_MAX_DELAY)
+            ),
+        )
+
+    @staticmethod
+    def is_retryable(error):
+        if is_oversized(error):
+            return False
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            if error.response.status_code in RETRYABLE_STATUS_CODES:
+                return True
+            return get_error_code(error.response) in RETRYABLE_ERROR_CODES
+        return False
+
+    def get_delay(self, attempt, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        retry_after = get_retry_after(getattr(error, "response", None))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, function, *args, on_retry=None, idempotent=True, **kwargs):
+        """Call function retrying retryable errors. on_retry(attempt, error,
+        delay) is called before every new attempt. Requests that are not
+        idempotent are not retried when they may have been processed."""
+        attempt = 0
+        while True:
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                if not idempotent and is_ambiguous(e):
+                    raise
+                delay = self.get_delay(attempt, e)
+                attempt += 1
+                if on_retry:
+                    on_retry(attempt, e, delay)
+                self.sleep(delay)
@@ -0,0 +1,109 @@
+import threading
+import time
+
+from .estimate import count_triples, format_duration
+
+DEFAULT_REPORT_INTERVAL = 10
+
+
+class Progress(object):
+    """Statements and triples a migration has applied, with the rate of the
+    requests sent to Neptune, their errors and retries and the time left.
+    While running, it is reported once every interval seconds at most, from
+    a thread of its own, so reporting does not slow the requests down."""
+
+    def __init__(
+        self,
+        report,
+        metrics,
+        statements=None,
+        interval=DEFAULT_REPORT_INTERVAL,
+        clock=time.time,
+        applied=frozenset(),
+    ):
+        self.report = report
+        self.metrics = metrics
+        self.interval = interval
+        self.clock = clock
+        # triples of each statement, counted before they are sent to keep
+        # parsing away from the requests. Totals are unknown for statements
+        # sent while they are generated, which are counted with add.
+        self._triples = []
+        self.total_statements = None
+        self.total_triples = None
+        if statements is not None:
+            self._triples = [
+                0 if index in applied else count_triples(statement)
+                for index, statement in enumerate(statements)
+            ]
+            self.total_statements = len(statements) - len(applied)
+            self.total_triples = sum(self._triples)
+        self.statements = 0
+        self.triples = 0
+        self.reported = False
+        self._requests, self._errors, self._retries = self.metrics.get_counts()
+        self._started = clock()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add(self, statement):
+        """Count the triples of a statement generated while sending others"""
+        self._triples.append(count_triples(statement))
+
+    def record(self, indexes):
+        """Count the statements applied by a batch, given by their indexes"""
+        triples = sum(self._triples[index] for index in indexes)
+        with self._lock:
+            self.statements += len(indexes)
+            self.triples += triples
+
+    def summary(self):
+        with self._lock:
+            statements, triples = self.statements, self.triples
+        requests, errors, retries = self.metrics.get_counts()
+        elapsed = max(self.clock() - self._started, 1e-9)
+        if self.total_statements is None:
+            done = "%d statements, %d triples" % (statements, triples)
+        else:
+            done = "%d of %d statements (%.1f%%), %d of %d triples" % (
+                statements,
+                self.total_statements,
+                100.0 * statements / (self.total_statements or 1),
+                triples,
+                self.total_triples,
+            )
+        line = "Progress: %s, %.1f requests/s, %d errors, %d retries" % (
+            done,
+            (requests - self._requests) / elapsed,
+            errors - self._errors,
+            retries - self._retries,
+        )
+        if self.total_statements is not None:
+            if statements:
+                left = (self.total_statements - statements) * elapsed / statements
+                line += ", ETA %s" % format_duration(left)
+            else:
+                line += ", ETA unknown"
+        return line
+
+    def _report(self):
+        self.reported = True
+        self.report(self.summary(), "BLUE", log_level_limit=1)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._report()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop reporting, with the final figures if anything was reported"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+        if self.reported:
+            self._report()
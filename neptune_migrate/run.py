@@ -5,6 +5,7 @@ import neptune_migrate
 
 from .cli import CLI
 from .config import Config, FileConfig
+from .fanout import MultiTarget
 from .main import Main
 
 
@@ -34,6 +35,7 @@ def run(options):
         config.update("schema_version", options.get("schema_version"))
         config.update("show_sparql", options.get("show_sparql"))
         config.update("show_sparql_only", options.get("show_sparql_only"))
+        config.update("dry_run", options.get("dry_run"))
         config.update("file_migration", options.get("file_migration"))
         config.update("migration_graph", options.get("migration_graph"))
         config.update("load_ttl", options.get("load_ttl"))
@@ -48,6 +50,17 @@ def run(options):
         config.update("database_endpoint", options.get("database_endpoint"))
         config.update("database_graph", options.get("database_graph"))
         config.update("database_ontology", options.get("database_ontology"))
+        config.update("execution_batch_size", options.get("execution_batch_size"))
+        config.update("execution_batch_bytes", options.get("execution_batch_bytes"))
+        config.update("execution_concurrency", options.get("execution_concurrency"))
+        config.update("execution_mode", options.get("execution_mode"))
+        config.update("execution_adaptive", options.get("execution_adaptive"))
+        config.update("execution_resume", options.get("execution_resume"))
+        config.update("execution_rollback", options.get("execution_rollback"))
+        config.update("execution_streaming", options.get("execution_streaming"))
+        config.update("execution_coalesce", options.get("execution_coalesce"))
+        config.update("execution_echo", options.get("execution_echo"))
+        config.update("load_backend", options.get("load_backend"))
         if options.get("database_migrations_dir"):
             config.update(
                 "database_migrations_dir",
@@ -79,6 +92,7 @@ def run(options):
         is_local = config.get("database_host", "").lower() in ["localhost", "127.0.0.1"]
         if (
             config.get("load_ttl", None)
+            and config.get("load_backend", "isql") == "isql"
             and config.get("virtuoso_dirs_allowed", None) is None
             and not is_local
         ):
@@ -91,7 +105,10 @@ def run(options):
                 passwd = getpass()
                 config.update("host_password", passwd)
         # If CLI was correctly parsed, execute db-virtuoso.
-        Main(config).execute()
+        if config.get("neptune_targets", None):
+            MultiTarget(config).execute()
+        else:
+            Main(config).execute()
     except KeyboardInterrupt:
         CLI.info_and_exit("\nExecution interrupted by user...")
     except Exception as e:
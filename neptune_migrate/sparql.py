@@ -0,0 +1,30 @@
+import re
+
+PROLOGUE = re.compile(
+    r"^\s*(?:(?:prefix\s+[^\s:]*:\s*<[^>]*>|base\s+<[^>]*>)\s*)*", re.IGNORECASE
+)
+QUERY_FORMS = ("SELECT", "CONSTRUCT", "DESCRIBE", "ASK")
+GRAPH_REFERENCE = re.compile(
+    r"\b(?:FROM(?:\s+NAMED)?|USING(?:\s+NAMED)?|GRAPH|WITH|INTO)\s*<([^>]*)>",
+    re.IGNORECASE,
+)
+
+
+def get_query_form(query):
+    """SELECT, CONSTRUCT, DESCRIBE or ASK for read queries, UPDATE otherwise"""
+    body = query[PROLOGUE.match(query).end() :].lstrip().upper()
+    for form in QUERY_FORMS:
+        if body.startswith(form):
+            return form
+    return "UPDATE"
+
+
+def get_graphs(query):
+    """Named graphs explicitly read or written by the query. An empty set
+    means the query only uses the default graph, which on Neptune is the
+    union of every graph."""
+    return set(GRAPH_REFERENCE.findall(query))
+
+
+def normalize(query):
+    return " ".join(query.split())
@@ -0,0 +1,142 @@
+import json
+import math
+import os
+import threading
+
+from .execution import DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY
+
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_BATCH_STEP = 10
+DEFAULT_TARGET_LATENCY = 5.0
+DEFAULT_WINDOW = 8
+DEFAULT_TUNING_FILE = "~/.neptune-migrate-tuning.json"
+
+
+class AdaptiveController(object):
+    """Tune statements per request and requests in flight with additive
+    increase and multiplicative decrease (AIMD). Every `window` batches the
+    p99 latency is checked: while it stays under target_latency the batch
+    size grows by batch_step statements and the concurrency by one request,
+    otherwise both are halved. Throttling and failures halve them at once."""
+
+    def __init__(
+        self,
+        batch_size=DEFAULT_BATCH_SIZE,
+        concurrency=DEFAULT_CONCURRENCY,
+        max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        target_latency=DEFAULT_TARGET_LATENCY,
+        batch_step=DEFAULT_BATCH_STEP,
+        window=DEFAULT_WINDOW,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.batch_size = max(1, min(batch_size, max_batch_size))
+        self.concurrency = max(1, min(concurrency, max_concurrency))
+        self.target_latency = target_latency
+        self.batch_step = batch_step
+        self.window = window
+        self._latencies = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_config(config, state=None):
+        """Controller limited by the EXECUTION_* settings, starting from a
+        previously saved state when there is one"""
+        state = state or {}
+        return AdaptiveController(
+            batch_size=int(
+                state.get(
+                    "batch_size",
+                    config.get("execution_batch_size", DEFAULT_BATCH_SIZE),
+                )
+            ),
+            concurrency=int(
+                state.get(
+                    "concurrency",
+                    config.get("execution_concurrency", DEFAULT_CONCURRENCY),
+                )
+            ),
+            max_batch_size=int(
+                config.get("execution_max_batch_size", DEFAULT_MAX_BATCH_SIZE)
+            ),
+            max_concurrency=int(
+                config.get("execution_max_concurrency", DEFAULT_MAX_CONCURRENCY)
+            ),
+            target_latency=float(
+                config.get("execution_target_latency", DEFAULT_TARGET_LATENCY)
+            ),
+        )
+
+    def get_batch_size(self):
+        return self.batch_size
+
+    def get_concurrency(self):
+        return self.concurrency
+
+    def state(self):
+        return {"batch_size": self.batch_size, "concurrency": self.concurrency}
+
+    def record(self, latency):
+        """Record the latency of a successful batch"""
+        with self._lock:
+            self._latencies.append(latency)
+            if len(self._latencies) < self.window:
+                return
+            latencies = sorted(self._latencies)
+            self._latencies = []
+            p99 = latencies[int(math.ceil(len(latencies) * 0.99)) - 1]
+            if p99 > self.target_latency:
+                self._decrease()
+            else:
+                self.batch_size = min(
+                    self.max_batch_size, self.batch_size + self.batch_step
+                )
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+    def record_failure(self):
+        """Back off after throttling or a failed batch"""
+        with self._lock:
+            self._latencies = []
+            self._decrease()
+
+    def record_oversized(self, batch_size):
+        """Never grow again up to a batch size the server could not handle"""
+        with self._lock:
+            self.max_batch_size = max(1, min(self.max_batch_size, batch_size - 1))
+            self.batch_size = max(1, min(self.batch_size, batch_size // 2))
+
+    def _decrease(self):
+        self.batch_size = max(1, self.batch_size // 2)
+        self.concurrency = max(1, self.concurrency // 2)
+
+
+class TuningStore(object):
+    """Tuned parameters of each endpoint, saved in a JSON file so the next
+    run starts from them"""
+
+    # the targets of a fan-out run save to the same file at once
+    _file_lock = threading.Lock()
+
+    def __init__(self, filename=DEFAULT_TUNING_FILE):
+        self.filename = os.path.expanduser(filename)
+
+    def _read(self):
+        try:
+            with open(self.filename) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def load(self, endpoint):
+        return self._read().get(endpoint)
+
+    def save(self, endpoint, state):
+        with self._file_lock:
+            states = self._read()
+            states[endpoint] = state
+            temporary = "%s.tmp" % self.filename
+            with open(temporary, "w") as f:
+                json.dump(states, f, indent=2, sort_keys=True)
+            os.replace(temporary, self.filename)
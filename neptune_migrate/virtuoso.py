@@ -1,22 +1,57 @@
 # -*- coding: utf-8 -*-
 
 import datetime
+import itertools
 import logging
 import os
 import shutil
 import subprocess
+import threading
+import time
 
 import rdflib
+import requests
 from git import Git
 from rdflib.graph import ConjunctiveGraph, Graph
 from rdflib.plugins.parsers.notation3 import BadSyntax
 
 from neptune_migrate.neptune.auth import get_aws_auth
 from neptune_migrate.neptune.client import NeptuneClient
+from neptune_migrate.neptune.loader import NeptuneLoader
+from neptune_migrate.neptune.retry import is_oversized, is_throttling
 
 from . import ssh
+from .checkpoint import DEFAULT_CHECKPOINT_DIR, CheckpointJournal
+from .coalesce import DEFAULT_COALESCE_TRIPLES, coalesce
 from .core.exceptions import MigrationException
+from .estimate import DEFAULT_THROUGHPUT_FILE, MigrationEstimate, ThroughputStore
+from .execution import (
+    DEFAULT_BATCH_BYTES,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_STREAM_BUFFER,
+    EXECUTION_MODES,
+    align_rollback_statements,
+    is_delete,
+    iter_batches,
+    iter_in_background,
+    iter_stream_batches,
+    join_statements,
+    pack_lanes,
+    run_concurrently,
+    split_in_lanes,
+    split_in_phases,
+    split_rollback_in_phases,
+)
+from .graph_store import (
+    delete_data,
+    is_idempotent,
+    parse_ground_statement,
+    to_ntriples,
+)
 from .helpers import Utils
+from .progress import DEFAULT_REPORT_INTERVAL, Progress
+from .tuning import DEFAULT_TUNING_FILE, AdaptiveController, TuningStore
 
 logging.basicConfig()
 
@@ -29,6 +64,19 @@ ISQL_DOWN = "SPARQL CLEAR GRAPH <%(graph)s>;"
 ISQL_SERVER = "select server_root();"
 
 
+def is_splittable(statements, error):
+    """Whether a failed batch should be sent again in two halves: it was
+    too big or too slow to be processed. A batch of several statements
+    whose response timed out is taken as too slow, but only when all of them
+    can be sent twice, since the server may have applied it. A single
+    statement that timed out is retried as any other request."""
+    if len(statements) == 1:
+        return False
+    if isinstance(error, requests.ReadTimeout):
+        return all(is_idempotent(statement) for statement in statements)
+    return is_oversized(error)
+
+
 class Virtuoso(object):
     """Interact with Virtuoso Server"""
 
@@ -45,13 +93,65 @@ class Virtuoso(object):
         self.__virtuoso_graph = config.get("database_graph")
         self.__virtuoso_ontology = config.get("database_ontology")
         self._migrations_dir = config.get("database_migrations_dir")
+        self._batch_size = int(config.get("execution_batch_size", DEFAULT_BATCH_SIZE))
+        self._batch_bytes = int(
+            config.get("execution_batch_bytes", DEFAULT_BATCH_BYTES)
+        )
+        self._concurrency = int(
+            config.get("execution_concurrency", DEFAULT_CONCURRENCY)
+        )
+        self._adaptive_split = config.get("execution_adaptive_split", True)
+        self._execution_mode = config.get("execution_mode", "update")
+        self._resume = config.get("execution_resume", False)
+        self._rollback = config.get("execution_rollback", False)
+        self._coalesce = config.get("execution_coalesce", False)
+        self._coalesce_triples = int(
+            config.get("execution_coalesce_triples", DEFAULT_COALESCE_TRIPLES)
+        )
+        self._stream_buffer = int(
+            config.get("execution_stream_buffer", DEFAULT_STREAM_BUFFER)
+        )
+        self._progress_interval = float(
+            config.get("execution_report_interval", DEFAULT_REPORT_INTERVAL)
+        )
+        self._echo = config.get("execution_echo", False)
+        self._checkpoint_dir = config.get(
+            "execution_checkpoint_dir", DEFAULT_CHECKPOINT_DIR
+        )
+        self._throughput_store = ThroughputStore(
+            config.get("execution_throughput_file", DEFAULT_THROUGHPUT_FILE)
+        )
+        self._batch_limits_lock = threading.Lock()
+        self._controller = None
+        self._endpoint = config.get("aws_neptune_url", None)
+        if config.get("execution_adaptive", False):
+            self._tuning_store = TuningStore(
+                config.get("execution_tuning_file", DEFAULT_TUNING_FILE)
+            )
+            self._controller = AdaptiveController.from_config(
+                config, self._tuning_store.load(self._endpoint)
+            )
         self._neptune_client = NeptuneClient(get_aws_auth(config), config)
+        # set by MultiTarget to share ontologies and diffs between targets
+        self.shared_results = None
+        self.retries = {}
 
-        if self.__virtuoso_dirs_allowed:
+        self._neptune_loader = None
+        if config.get("load_backend", "isql") == "neptune":
+            self._neptune_loader = NeptuneLoader(self._neptune_client, config)
+        elif self.__virtuoso_dirs_allowed:
             self._virtuoso_dir = os.path.realpath(self.__virtuoso_dirs_allowed)
         else:
             self._virtuoso_dir = self._run_isql(ISQL_SERVER)[0].split("\n\n")[-2]
 
+    def get_request_metrics(self):
+        """Timings, sizes and status codes of the requests sent to Neptune"""
+        return self._neptune_client.metrics
+
+    def close(self):
+        """Release the pooled connections held by the Neptune client"""
+        self._neptune_client.close()
+
     def _run_isql(self, cmd, archive=False):
         conn = ISQL % (
             self.__virtuoso_user,
@@ -111,26 +211,522 @@ class Virtuoso(object):
         return out, err
 
     def upload_ttls_to_virtuoso(self, full_path_files):
+        if self._neptune_loader:
+            return self._neptune_loader.load(full_path_files)
         response_dict = {}
         for fname in full_path_files:
             response_dict[fname] = self._upload_single_ttl_to_virtuoso(fname)
         return response_dict
 
-    def execute_change(self, sparql_up, sparql_down, execution_log=None):
-        """Final Step. Execute the changes to the Database"""
+    def _batch_limits(self):
+        if self._controller:
+            return self._controller.get_batch_size(), self._batch_bytes
+        return self._batch_size, self._batch_bytes
 
-        try:
-            for index, query in enumerate(sparql_up):
-                response = self._neptune_client.update_query(query)
-                if execution_log:
-                    execution_log(f"Everythin ok. Response was: {response}", "GREEN")
-                    execution_log(
-                        f"If needed, here it goes the rollback query:\n{sparql_down[index]}",
-                        "GREEN",
+    def _concurrency_limits(self):
+        """Requests in flight and their upper bound, for run_concurrently"""
+        if self._execution_mode == "atomic":
+            # atomic chunks are sent in order, the history record last
+            return 1, None
+        if self._controller:
+            return (
+                self._controller.get_concurrency,
+                self._controller.max_concurrency,
+            )
+        return self._concurrency, None
+
+    def _start_progress(self, execution_log, statements=None, applied=frozenset()):
+        """Report the progress of a migration every
+        EXECUTION_REPORT_INTERVAL seconds, or None when it is disabled"""
+        if not execution_log or self._progress_interval <= 0:
+            return None
+        progress = Progress(
+            execution_log,
+            self.get_request_metrics(),
+            statements,
+            self._progress_interval,
+            applied=applied,
+        )
+        progress.start()
+        return progress
+
+    def _save_tuning(self):
+        """Start the next run against this endpoint from the tuned limits"""
+        if self._controller:
+            self._tuning_store.save(self._endpoint, self._controller.state())
+
+    def _plan_batches(self, sparql_up, applied=frozenset(), mode=None):
+        """Group the statements in phases of lazily built, numbered batches,
+        leaving out the already applied ones. Batches are only built when
+        about to be sent, so they follow the limits learned while splitting
+        oversized batches."""
+        mode = mode or self._execution_mode
+        batch_numbers = itertools.count(1)
+        if mode == "atomic":
+            # a multi-operation update is a single transaction on Neptune
+            pending = [index for index in range(len(sparql_up)) if index not in applied]
+            statements = [sparql_up[index] for index in pending]
+            return [
+                (
+                    (next(batch_numbers), [pending[index] for index in batch])
+                    for batch in iter_batches(
+                        statements, lambda: (len(statements), self._batch_bytes)
                     )
-        except Exception as e:
+                )
+            ]
+
+        if mode == "lanes":
+            lanes = [
+                [index for index in lane if index not in applied]
+                for lane in split_in_lanes(sparql_up)
+            ]
+            history = [index for index in [len(sparql_up) - 1] if index not in applied]
+            return [
+                (
+                    (next(batch_numbers), lane)
+                    for lane in pack_lanes(
+                        [lane for lane in lanes if lane],
+                        lambda: self._batch_limits()[0],
+                    )
+                ),
+                ((next(batch_numbers), lane) for lane in [history] if lane),
+            ]
+
+        def numbered_batches(phase):
+            # the history record is always written by update_query
+            history = phase == [len(sparql_up) - 1]
+            if mode == "graph_store" and not history:
+                for batch in self._plan_ground_batches(sparql_up, phase):
+                    yield next(batch_numbers), batch
+                phase = [
+                    index
+                    for index in phase
+                    if not parse_ground_statement(sparql_up[index])
+                ]
+            statements = [sparql_up[index] for index in phase]
+            for batch in iter_batches(statements, self._batch_limits):
+                yield next(batch_numbers), [phase[index] for index in batch]
+
+        phases = [
+            [index for index in phase if index not in applied]
+            for phase in split_in_phases(sparql_up)
+        ]
+        return [numbered_batches(phase) for phase in phases if phase]
+
+    def _plan_ground_batches(self, sparql_up, phase):
+        """Group the statements of a phase that insert or delete ground
+        triples by graph, in batches only limited by size"""
+        groups = {}
+        for index in phase:
+            ground = parse_ground_statement(sparql_up[index])
+            if ground:
+                groups.setdefault(ground[:2], []).append(index)
+        for indexes in groups.values():
+            statements = [sparql_up[index] for index in indexes]
+            for batch in iter_batches(
+                statements, lambda: (len(statements), self._batch_bytes)
+            ):
+                yield [indexes[index] for index in batch]
+
+    def _send_statements(self, statements, on_retry):
+        """Send statements in a single request: ground deletes of a graph as
+        a single DELETE DATA block and, in the graph_store execution mode,
+        ground inserts of a graph as a Graph Store Protocol POST of
+        N-Triples, otherwise as a multi statement update"""
+        graph_store = self._execution_mode == "graph_store"
+        if graph_store or len(statements) > 1:
+            ground = [parse_ground_statement(statement) for statement in statements]
+            if all(ground) and len({item[:2] for item in ground}) == 1:
+                operation, graph, _ = ground[0]
+                triples = [item[2] for item in ground]
+                if operation == "delete":
+                    return self._neptune_client.update_query(
+                        delete_data(graph, triples), on_retry=on_retry
+                    )
+                if graph_store:
+                    return self._neptune_client.post_ntriples(
+                        graph, to_ntriples(triples), on_retry=on_retry
+                    )
+        return self._neptune_client.update_query(
+            join_statements(statements), on_retry=on_retry
+        )
+
+    def _shrink_batches(self, batch, batch_bytes):
+        """Remember the smaller batch limits for the rest of the run"""
+        with self._batch_limits_lock:
+            self._batch_size = max(1, min(self._batch_size, len(batch) // 2))
+            self._batch_bytes = max(1, min(self._batch_bytes, batch_bytes // 2))
+        if self._controller:
+            self._controller.record_oversized(len(batch))
+
+    def _send_lane(
+        self, lane_number, lane, sparql_up, execution_log=None, on_applied=None
+    ):
+        """Send the statements of a lane in batches, one after the other"""
+        statements = [sparql_up[index] for index in lane]
+        return [
+            self._send_batch(
+                lane_number,
+                [lane[index] for index in batch],
+                sparql_up,
+                execution_log,
+                on_applied,
+            )
+            for batch in iter_batches(statements, self._batch_limits)
+        ]
+
+    def _send_batch(
+        self, batch_number, batch, sparql_up, execution_log=None, on_applied=None
+    ):
+        """Send a batch of statements. Batches that time out or are too big to
+        be processed are split in two halves, sent one after the other.
+        on_applied is called with the statements of every request that
+        succeeds, so the halves applied are known when the other one fails."""
+        statements = [sparql_up[index] for index in batch]
+
+        def on_retry(attempt, error, delay):
+            if self._controller and is_throttling(error):
+                self._controller.record_failure()
+            for index in batch:
+                self.retries[index] = attempt
             if execution_log:
-                execution_log(f"Some error happened. Erro was: {e}")
+                execution_log(
+                    f"Retrying batch {batch_number} (attempt {attempt}) "
+                    f"in {delay:.2f}s. Error was: {error}",
+                    "YELLOW",
+                )
+
+        started = time.time()
+        try:
+            response = self._send_statements(statements, on_retry)
+        except Exception as e:
+            if not self._adaptive_split or not is_splittable(statements, e):
+                if self._controller:
+                    self._controller.record_failure()
+                raise
+            error = e
+        else:
+            if self._controller:
+                self._controller.record(time.time() - started)
+            if on_applied:
+                on_applied(batch)
+            return response
+
+        self._shrink_batches(batch, len(join_statements(statements).encode("utf-8")))
+        if execution_log:
+            execution_log(
+                f"Batch {batch_number} was too big to be processed, "
+                f"splitting it in two. Error was: {error}",
+                "YELLOW",
+            )
+        middle = len(batch) // 2
+        return [
+            self._send_batch(batch_number, half, sparql_up, execution_log, on_applied)
+            for half in (batch[:middle], batch[middle:])
+        ]
+
+    def execute_change(self, sparql_up, sparql_down, execution_log=None, versions=None):
+        """Final Step. Execute the changes to the Database.
+
+        Given the (current, destination) versions, the statements applied are
+        written to a checkpoint journal, so a failed migration can be resumed
+        from where it stopped with EXECUTION_RESUME. With EXECUTION_ROLLBACK,
+        the statements applied by a failed migration are rolled back instead
+        and an exception is raised."""
+
+        self.retries = {}
+        sparql_down = align_rollback_statements(sparql_up, sparql_down)
+        if self._execution_mode == "atomic" and execution_log:
+            size = len(join_statements(sparql_up).encode("utf-8"))
+            if size > self._batch_bytes:
+                execution_log(
+                    f"The migration ({size} bytes) does not fit in a single "
+                    f"request of {self._batch_bytes} bytes, it will be sent in "
+                    "atomic chunks",
+                    "YELLOW",
+                )
+
+        journal = None
+        applied = set()
+        if versions is not None:
+            journal = CheckpointJournal(
+                self._checkpoint_dir,
+                self._endpoint,
+                self.__virtuoso_graph,
+                versions,
+                sparql_up,
+            )
+            applied = journal.start(resume=self._resume)
+            if applied and execution_log:
+                execution_log(
+                    f"Resuming migration: skipping {len(applied)} of "
+                    f"{len(sparql_up)} statements already applied",
+                    "YELLOW",
+                )
+
+        done = set(applied)
+        progress = self._start_progress(execution_log, sparql_up, applied)
+
+        def on_applied(batch):
+            done.update(batch)
+            if journal:
+                # sent again on resume, blank nodes would be duplicated
+                journal.record(
+                    batch,
+                    sync=not all(is_idempotent(sparql_up[i]) for i in batch),
+                )
+            if progress:
+                progress.record(batch)
+
+        started = time.time()
+        try:
+            succeeded = self._execute_phases(
+                sparql_up, sparql_down, execution_log, applied, on_applied
+            )
+            if succeeded and versions is not None:
+                self._throughput_store.record(
+                    self._endpoint,
+                    self._execution_mode,
+                    len(sparql_up) - len(applied),
+                    time.time() - started,
+                )
+        finally:
+            if progress:
+                progress.stop()
+            self._save_tuning()
+            if journal:
+                journal.close()
+        if journal and (succeeded or self._rollback):
+            # once rolled back, nothing of the migration is left to resume
+            journal.remove()
+        if not succeeded and self._rollback:
+            self._rollback_change(sparql_down, done, execution_log)
+
+    def stream_change(
+        self,
+        current_ontology,
+        destination_ontology,
+        current_version,
+        destination_version,
+        origen,
+        execution_log=None,
+    ):
+        """Send the statements taking the graph from one ontology to the
+        other while they are generated, deletes first and the history record
+        last. Generation runs at most EXECUTION_STREAM_BUFFER statements
+        ahead of the requests. Returns the (sparql_up, sparql_down) sent, as
+        get_sparql would."""
+
+        if self._execution_mode in ("atomic", "lanes"):
+            raise Exception(
+                "statements can not be streamed in the %s execution mode"
+                % self._execution_mode
+            )
+        sparql_up = []
+        sparql_down = []
+        batch_numbers = itertools.count(1)
+        statements = iter_in_background(
+            self.iter_sparql(current_ontology, destination_ontology),
+            self._stream_buffer,
+        )
+
+        def generated():
+            for up, down in statements:
+                sparql_up.append(up)
+                sparql_down.append(down)
+                if progress:
+                    progress.add(up)
+                yield len(sparql_up) - 1, up
+
+        def numbered(batches):
+            for batch in batches:
+                yield next(batch_numbers), batch
+
+        def phases():
+            for _, phase in itertools.groupby(
+                generated(), lambda item: is_delete(item[1])
+            ):
+                yield numbered(iter_stream_batches(phase, self._batch_limits))
+            if not sparql_up:
+                return
+            # the history keeps the rollback statements as get_sparql does
+            deletes = len([up for up in sparql_up if is_delete(up)])
+            history_up, history_down = self._get_history_statements(
+                sparql_up,
+                sparql_down[deletes:] + sparql_down[:deletes],
+                current_version,
+                destination_version,
+                origen,
+            )
+            sparql_up.append(history_up)
+            sparql_down.append(history_down)
+            if progress:
+                progress.add(history_up)
+            yield numbered([[len(sparql_up) - 1]])
+
+        done = set()
+        progress = self._start_progress(execution_log)
+
+        def on_applied(batch):
+            done.update(batch)
+            if progress:
+                progress.record(batch)
+
+        self.retries = {}
+        started = time.time()
+        try:
+            succeeded = self._send_phases(
+                phases(),
+                sparql_up,
+                self._send_batch,
+                execution_log,
+                on_applied,
+                sparql_down,
+            )
+            if succeeded and sparql_up:
+                self._throughput_store.record(
+                    self._endpoint,
+                    self._execution_mode,
+                    len(sparql_up),
+                    time.time() - started,
+                )
+        finally:
+            if progress:
+                progress.stop()
+            statements.close()
+            self._save_tuning()
+        if not succeeded and self._rollback:
+            self._rollback_change(sparql_down, done, execution_log)
+        return sparql_up, sparql_down
+
+    def estimate(self, sparql_up):
+        """Statements, triples, payload and, for each execution mode, the
+        requests the migration takes and its duration, projected from the
+        throughput of earlier runs against the same endpoint"""
+        requests = {}
+        for mode in EXECUTION_MODES:
+            requests[mode] = 0
+            for batches in self._plan_batches(sparql_up, mode=mode):
+                for _, batch in batches:
+                    if mode == "lanes":
+                        statements = [sparql_up[index] for index in batch]
+                        requests[mode] += len(
+                            list(iter_batches(statements, self._batch_limits))
+                        )
+                    else:
+                        requests[mode] += 1
+        return MigrationEstimate(
+            sparql_up, requests, self._throughput_store.get_rates(self._endpoint)
+        )
+
+    def _rollback_change(self, sparql_down, applied, execution_log=None):
+        """Undo the applied statements with their rollback statements, in
+        reverse order and batched like the migration, and fail"""
+        if execution_log:
+            execution_log(
+                f"Rolling back the {len(applied)} statements already applied",
+                "YELLOW",
+            )
+        batch_numbers = itertools.count(1)
+
+        def numbered_batches(phase):
+            statements = [sparql_down[index] for index in phase]
+            for batch in iter_batches(statements, self._batch_limits):
+                yield next(batch_numbers), [phase[index] for index in batch]
+
+        phases = split_rollback_in_phases(applied, sparql_down)
+        if self._send_phases(
+            [numbered_batches(phase) for phase in phases],
+            sparql_down,
+            self._send_batch,
+            execution_log,
+        ):
+            raise MigrationException(
+                "migration failed, the %d statements applied were rolled back"
+                % len(applied)
+            )
+        raise MigrationException(
+            "migration failed and so did its rollback, "
+            "the graph may be left half migrated"
+        )
+
+    def _execute_phases(
+        self,
+        sparql_up,
+        sparql_down,
+        execution_log,
+        applied=frozenset(),
+        on_applied=None,
+    ):
+        """Send the phases of the migration one after the other, stopping at
+        the first one that fails. Returns whether every statement was
+        applied."""
+
+        send_batch = self._send_batch
+        if self._execution_mode == "lanes":
+            send_batch = self._send_lane
+        return self._send_phases(
+            self._plan_batches(sparql_up, applied),
+            sparql_up,
+            send_batch,
+            execution_log,
+            on_applied,
+            sparql_down,
+        )
+
+    def _send_phases(
+        self,
+        phases,
+        statements,
+        send_batch,
+        execution_log=None,
+        on_applied=None,
+        rollback_statements=None,
+    ):
+        """Send the numbered batches of each phase concurrently, stopping at
+        the first phase that fails. Returns whether every batch was sent."""
+        applied_lock = threading.Lock()
+
+        def applied(batch):
+            with applied_lock:
+                on_applied(batch)
+
+        def send(numbered_batch):
+            batch_number, batch = numbered_batch
+            return send_batch(
+                batch_number,
+                batch,
+                statements,
+                execution_log,
+                applied if on_applied else None,
+            )
+
+        concurrency, max_concurrency = self._concurrency_limits()
+        for batches in phases:
+            failed = False
+            for (batch_number, batch), response, error in run_concurrently(
+                send, batches, concurrency, max_concurrency
+            ):
+                if error is not None:
+                    failed = True
+                    if execution_log:
+                        execution_log(
+                            f"Some error happened on batch {batch_number} "
+                            f"(statements {batch[0] + 1} to {batch[-1] + 1} "
+                            f"of {len(statements)}). Erro was: {error}"
+                        )
+                    continue
+                if execution_log and self._echo:
+                    execution_log(f"Everythin ok. Response was: {response}", "GREEN")
+                    if rollback_statements:
+                        for index in batch:
+                            execution_log(
+                                f"If needed, here it goes the rollback query:\n{rollback_statements[index]}",
+                                "GREEN",
+                            )
+            if failed:
+                return False
+        return True
 
     def get_current_version(self):
         """Get Virtuoso Database Graph Current Version"""
@@ -163,10 +759,23 @@ ORDER BY desc(?data) LIMIT 1
         )
 
     def _generate_migration_sparql_commands(self, origin_store, destination_store):
-        diff = (origin_store - destination_store) or []
-        checked = set()
         forward_migration = []
         backward_migration = []
+        # rdflib yields the diff in an order that changes with the hash seed
+        # of each process: sorted, the same ontologies always give the same
+        # plan, which a checkpoint journal can be resumed from
+        for forward, backward in sorted(
+            self._iter_migration_sparql_commands(origin_store, destination_store)
+        ):
+            forward_migration.append(forward)
+            backward_migration.append(backward)
+        return forward_migration, backward_migration
+
+    def _iter_migration_sparql_commands(self, origin_store, destination_store):
+        """Lazily generate the (forward, backward) statements adding the
+        triples of origin_store missing from destination_store"""
+        diff = (origin_store - destination_store) or []
+        checked = set()
 
         for subject, predicate, object_ in diff:
 
@@ -227,17 +836,14 @@ ORDER BY desc(?data) LIMIT 1
                 )
 
                 if not blank_node_existing_triples or blank_node_triples_changed:
-                    forward_migration.append(
-                        "INSERT DATA { GRAPH <%s> { %s[%s] } };"
-                        % (
-                            self.__virtuoso_graph,
-                            blank_node_as_an_object,
-                            blank_node_as_a_subject,
-                        )
+                    forward = "INSERT DATA { GRAPH <%s> { %s[%s] } };" % (
+                        self.__virtuoso_graph,
+                        blank_node_as_an_object,
+                        blank_node_as_a_subject,
                     )
                     blank_node_as_a_subject = blank_node_as_a_subject[:-2]
 
-                    backward_migration.append(
+                    yield forward, (
                         "WITH <%s> DELETE { %s ?s. ?s %s } WHERE "
                         "{ %s ?s. ?s %s };"
                         % (
@@ -252,7 +858,7 @@ ORDER BY desc(?data) LIMIT 1
             if isinstance(subject, rdflib.term.URIRef) and not isinstance(
                 object_, rdflib.term.BNode
             ):
-                forward_migration.append(
+                yield (
                     "INSERT DATA { GRAPH <%s> { %s %s %s . } };"
                     % (
                         self.__virtuoso_graph,
@@ -260,56 +866,80 @@ ORDER BY desc(?data) LIMIT 1
                         predicate.n3(),
                         object_.n3(),
                     )
-                )
-                backward_migration.append(
-                    "WITH <%s> DELETE { %s %s %s . } WHERE { %s %s %s . }"
+                ), (
+                    # ground triples need no pattern matching to be removed
+                    "DELETE DATA { GRAPH <%s> { %s %s %s . } };"
                     % (
                         self.__virtuoso_graph,
                         subject.n3(),
                         predicate.n3(),
                         Utils.get_normalized_n3(object_),
-                        subject.n3(),
-                        predicate.n3(),
-                        Utils.get_normalized_n3(object_),
                     )
                 )
 
-        return forward_migration, backward_migration
+    def _parse_ontologies(self, current_ontology, destination_ontology):
+        current_graph = ConjunctiveGraph()
+        destination_graph = ConjunctiveGraph()
+        try:
+            if current_ontology is not None:
+                current_graph.parse(data=current_ontology, format="turtle")
+            destination_graph.parse(data=destination_ontology, format="turtle")
+        except BadSyntax as e:
+            e._str = e._str.decode("utf-8")
+            raise MigrationException("Error parsing graph %s" % str(e))
+        return current_graph, destination_graph
 
-    def get_sparql(
+    def _diff(self, current_ontology, destination_ontology):
+        """Statements taking the graph from one ontology to the other and
+        back"""
+        current_graph, destination_graph = self._parse_ontologies(
+            current_ontology, destination_ontology
+        )
+        forward_insert, backward_delete = self._generate_migration_sparql_commands(
+            destination_graph, current_graph
+        )
+        backward_insert, forward_delete = self._generate_migration_sparql_commands(
+            current_graph, destination_graph
+        )
+        if self._coalesce:
+            deletes, inserts = coalesce(
+                list(zip(forward_delete, backward_insert)),
+                list(zip(forward_insert, backward_delete)),
+                self._coalesce_triples,
+            )
+            forward_delete = [up for up, _ in deletes]
+            backward_insert = [down for _, down in deletes]
+            forward_insert = [up for up, _ in inserts]
+            backward_delete = [down for _, down in inserts]
+        return forward_delete + forward_insert, backward_delete + backward_insert
+
+    def iter_sparql(self, current_ontology, destination_ontology):
+        """Lazily generate the (up, down) statements taking the graph from
+        one ontology to the other, deletes first, each with the statement
+        undoing it"""
+        current_graph, destination_graph = self._parse_ontologies(
+            current_ontology, destination_ontology
+        )
+        for down, up in self._iter_migration_sparql_commands(
+            current_graph, destination_graph
+        ):
+            yield up, down
+        for up, down in self._iter_migration_sparql_commands(
+            destination_graph, current_graph
+        ):
+            yield up, down
+
+    def _get_history_statements(
         self,
-        current_ontology=None,
-        destination_ontology=None,
+        query_up,
+        query_down,
         current_version=None,
         destination_version=None,
         origen=None,
         insert=None,
     ):
-        """Make sparql statements to be executed"""
-        query_up = []
-        query_down = []
-        if insert is None:
-
-            current_graph = ConjunctiveGraph()
-            destination_graph = ConjunctiveGraph()
-            # if insert is None:
-            try:
-                if current_ontology is not None:
-                    current_graph.parse(data=current_ontology, format="turtle")
-                destination_graph.parse(data=destination_ontology, format="turtle")
-            except BadSyntax as e:
-                e._str = e._str.decode("utf-8")
-                raise MigrationException("Error parsing graph %s" % str(e))
-
-            forward_insert, backward_delete = self._generate_migration_sparql_commands(
-                destination_graph, current_graph
-            )
-            backward_insert, forward_delete = self._generate_migration_sparql_commands(
-                current_graph, destination_graph
-            )
-            query_up = forward_delete + forward_insert
-            query_down = backward_delete + backward_insert
-        # Registry schema changes on migration_graph
+        """(up, down) statements writing the migration history record on
+        migration_graph, with every statement of the migration"""
         now = datetime.datetime.now()
         values = {
             "m_graph": self.migration_graph,
@@ -328,63 +958,87 @@ ORDER BY desc(?data) LIMIT 1
             .replace("\n", "\\n"),
         }
         if insert is not None:
-            query_up.append(
-                (
-                    "INSERT DATA { GRAPH <%(m_graph)s> { "
-                    '[] owl:versionInfo "%(c_version)s"; '
-                    '<%(m_graph)sendpoint> "%(endpoint)s"; '
-                    '<%(m_graph)susuario> "%(user)s"; '
-                    '<%(m_graph)sambiente> "%(host)s"; '
-                    '<%(m_graph)sproduto> "%(v_graph)s"; '
-                    '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
-                    '<%(m_graph)sorigen> "%(origen)s"; '
-                    '<%(m_graph)sinserted> "%(insert)s".} };'
-                )
-                % values
-            )
-            query_down.append(
-                (
-                    "WITH <%(m_graph)s> DELETE {?s ?p ?o} "
-                    'WHERE {?s owl:versionInfo "%(c_version)s"; '
-                    '<%(m_graph)sendpoint> "%(endpoint)s"; '
-                    '<%(m_graph)susuario> "%(user)s"; '
-                    '<%(m_graph)sambiente> "%(host)s"; '
-                    '<%(m_graph)sproduto> "%(v_graph)s"; '
-                    '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
-                    '<%(m_graph)sorigen> "%(origen)s"; '
-                    '<%(m_graph)sinserted> "%(insert)s"; ?p ?o.};'
-                )
-                % values
-            )
+            history_up = (
+                "INSERT DATA { GRAPH <%(m_graph)s> { "
+                '[] owl:versionInfo "%(c_version)s"; '
+                '<%(m_graph)sendpoint> "%(endpoint)s"; '
+                '<%(m_graph)susuario> "%(user)s"; '
+                '<%(m_graph)sambiente> "%(host)s"; '
+                '<%(m_graph)sproduto> "%(v_graph)s"; '
+                '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
+                '<%(m_graph)sorigen> "%(origen)s"; '
+                '<%(m_graph)sinserted> "%(insert)s".} };'
+            ) % values
+            history_down = (
+                "WITH <%(m_graph)s> DELETE {?s ?p ?o} "
+                'WHERE {?s owl:versionInfo "%(c_version)s"; '
+                '<%(m_graph)sendpoint> "%(endpoint)s"; '
+                '<%(m_graph)susuario> "%(user)s"; '
+                '<%(m_graph)sambiente> "%(host)s"; '
+                '<%(m_graph)sproduto> "%(v_graph)s"; '
+                '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
+                '<%(m_graph)sorigen> "%(origen)s"; '
+                '<%(m_graph)sinserted> "%(insert)s"; ?p ?o.};'
+            ) % values
         else:
-            query_up.append(
-                (
-                    "INSERT DATA { GRAPH <%(m_graph)s> { "
-                    '[] owl:versionInfo "%(d_version)s"; '
-                    '<%(m_graph)sendpoint> "%(endpoint)s"; '
-                    '<%(m_graph)susuario> "%(user)s"; '
-                    '<%(m_graph)sambiente> "%(host)s"; '
-                    '<%(m_graph)sproduto> "%(v_graph)s"; '
-                    '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
-                    '<%(m_graph)sorigen> "%(origen)s"; '
-                    '<%(m_graph)schanges> "%(query_up)s".} };'
-                )
-                % values
-            )
-            query_down.append(
+            history_up = (
+                "INSERT DATA { GRAPH <%(m_graph)s> { "
+                '[] owl:versionInfo "%(d_version)s"; '
+                '<%(m_graph)sendpoint> "%(endpoint)s"; '
+                '<%(m_graph)susuario> "%(user)s"; '
+                '<%(m_graph)sambiente> "%(host)s"; '
+                '<%(m_graph)sproduto> "%(v_graph)s"; '
+                '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
+                '<%(m_graph)sorigen> "%(origen)s"; '
+                '<%(m_graph)schanges> "%(query_up)s".} };'
+            ) % values
+            history_down = (
+                "WITH <%(m_graph)s> DELETE {?s ?p ?o} "
+                'WHERE {?s owl:versionInfo "%(d_version)s"; '
+                '<%(m_graph)sendpoint> "%(endpoint)s"; '
+                '<%(m_graph)susuario> "%(user)s"; '
+                '<%(m_graph)sambiente> "%(host)s"; '
+                '<%(m_graph)sproduto> "%(v_graph)s"; '
+                '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
+                '<%(m_graph)sorigen> "%(origen)s"; '
+                '<%(m_graph)schanges> "%(query_up)s"; ?p ?o.};'
+            ) % values
+        return history_up, history_down
+
+    def get_sparql(
+        self,
+        current_ontology=None,
+        destination_ontology=None,
+        current_version=None,
+        destination_version=None,
+        origen=None,
+        insert=None,
+    ):
+        """Make sparql statements to be executed"""
+        query_up = []
+        query_down = []
+        if insert is None:
+            query_up, query_down = self._shared(
                 (
-                    "WITH <%(m_graph)s> DELETE {?s ?p ?o} "
-                    'WHERE {?s owl:versionInfo "%(d_version)s"; '
-                    '<%(m_graph)sendpoint> "%(endpoint)s"; '
-                    '<%(m_graph)susuario> "%(user)s"; '
-                    '<%(m_graph)sambiente> "%(host)s"; '
-                    '<%(m_graph)sproduto> "%(v_graph)s"; '
-                    '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
-                    '<%(m_graph)sorigen> "%(origen)s"; '
-                    '<%(m_graph)schanges> "%(query_up)s"; ?p ?o.};'
-                )
-                % values
+                    "diff",
+                    self.__virtuoso_graph,
+                    current_ontology,
+                    destination_ontology,
+                ),
+                lambda: self._diff(current_ontology, destination_ontology),
             )
+            query_up, query_down = list(query_up), list(query_down)
+        # Registry schema changes on migration_graph
+        history_up, history_down = self._get_history_statements(
+            query_up,
+            query_down,
+            current_version,
+            destination_version,
+            origen,
+            insert,
+        )
+        query_up.append(history_up)
+        query_down.append(history_down)
         query_up = list(filter(None, query_up))
         query_down = list(filter(None, query_down))
 
@@ -394,10 +1048,18 @@ ORDER BY desc(?data) LIMIT 1
         file_name = self._migrations_dir + "/" + self.__virtuoso_ontology
         if not os.path.exists(file_name):
             raise Exception("migration file does not exist (%s)" % file_name)
-        return Git(self._migrations_dir).execute(
-            ["git", "show", version + ":" + self.__virtuoso_ontology]
+        return self._shared(
+            ("ontology", self._migrations_dir, self.__virtuoso_ontology, version),
+            lambda: Git(self._migrations_dir).execute(
+                ["git", "show", version + ":" + self.__virtuoso_ontology]
+            ),
         )
 
+    def _shared(self, key, compute):
+        if self.shared_results is None:
+            return compute()
+        return self.shared_results.get(key, compute)
+
     def get_ontology_from_file(self, filename):
         if not os.path.exists(filename):
             raise Exception("migration file does not exist (%s)" % filename)
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from neptune_migrate.checkpoint import CheckpointJournal, plan_hash
+
+SPARQL_UP = ["up0;", "up1;", "up2;", "history;"]
+
+
+class CheckpointJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def journal(self, versions=("01", "02"), sparql_up=SPARQL_UP):
+        return CheckpointJournal(self.directory, "https://a", "g", versions, sparql_up)
+
+    def test_it_should_not_hash_the_history_record(self):
+        self.assertEqual(
+            plan_hash(["up;", "history 1;"]), plan_hash(["up;", "history 2;"])
+        )
+        self.assertNotEqual(
+            plan_hash(["up;", "history;"]), plan_hash(["up2;", "history;"])
+        )
+
+    def test_it_should_keep_the_applied_statements_when_resuming(self):
+        journal = self.journal()
+        self.assertEqual(set(), journal.start())
+        journal.record([0, 1])
+        journal.close()
+
+        self.assertEqual(set(), self.journal(("01", "03")).load())
+        self.assertEqual(set(), self.journal(sparql_up=["other;", "history;"]).load())
+
+        journal = self.journal()
+        self.assertEqual({0, 1}, journal.start(resume=True))
+        journal.record([2])
+        journal.close()
+        self.assertEqual({0, 1, 2}, self.journal().load())
+
+    def test_it_should_start_over_when_not_resuming(self):
+        journal = self.journal()
+        journal.start()
+        journal.record([0])
+        journal.close()
+
+        journal = self.journal()
+        self.assertEqual(set(), journal.start())
+        journal.close()
+        self.assertEqual(set(), self.journal().load())
+
+    def test_it_should_ignore_a_line_cut_short(self):
+        journal = self.journal()
+        journal.start()
+        journal.record([0])
+        journal.close()
+        with open(journal.filename, "a") as f:
+            f.write('{"applied": [1')
+
+        self.assertEqual({0}, self.journal().load())
+
+    @patch("neptune_migrate.checkpoint.os.fsync")
+    def test_it_should_sync_the_journal_on_an_interval_or_when_asked(self, fsync_mock):
+        now = [0]
+        journal = CheckpointJournal(
+            self.directory,
+            "https://a",
+            "g",
+            ("01", "02"),
+            SPARQL_UP,
+            sync_interval=1,
+            clock=lambda: now[0],
+        )
+        journal.start()
+        self.assertEqual(1, fsync_mock.call_count)
+
+        journal.record([0])
+        self.assertEqual(1, fsync_mock.call_count)
+        journal.record([1], sync=True)
+        self.assertEqual(2, fsync_mock.call_count)
+        now[0] = 1
+        journal.record([2])
+        self.assertEqual(3, fsync_mock.call_count)
+        journal.record([3])
+        journal.close()
+        self.assertEqual(4, fsync_mock.call_count)
+        self.assertEqual({0, 1, 2, 3}, self.journal().load())
+
+    def test_it_should_remove_the_journal(self):
+        journal = self.journal()
+        journal.start()
+        journal.remove()
+        self.assertFalse(os.path.exists(journal.filename))
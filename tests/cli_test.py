@@ -236,6 +236,91 @@ class CLITest(unittest.TestCase):
             CLI.parse(["--db-migrations-dir", ".:../:/tmp"])[0].database_migrations_dir,
         )
 
+    def test_it_should_not_has_a_default_value_for_batch_size(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_batch_size)
+
+    def test_it_should_accept_batch_size_options(self):
+        self.assertEqual(50, CLI.parse(["--batch-size", "50"])[0].execution_batch_size)
+
+    def test_it_should_not_has_a_default_value_for_batch_bytes(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_batch_bytes)
+
+    def test_it_should_accept_batch_bytes_options(self):
+        self.assertEqual(
+            2048, CLI.parse(["--batch-bytes", "2048"])[0].execution_batch_bytes
+        )
+
+    def test_it_should_not_has_a_default_value_for_concurrency(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_concurrency)
+
+    def test_it_should_accept_concurrency_options(self):
+        self.assertEqual(8, CLI.parse(["--concurrency", "8"])[0].execution_concurrency)
+
+    def test_it_should_not_has_a_default_value_for_execution_mode(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_mode)
+
+    def test_it_should_accept_execution_mode_options(self):
+        self.assertEqual(
+            "graph_store",
+            CLI.parse(["--execution-mode", "graph_store"])[0].execution_mode,
+        )
+        self.assertEqual(
+            "atomic", CLI.parse(["--execution-mode", "atomic"])[0].execution_mode
+        )
+        self.assertEqual(
+            "lanes", CLI.parse(["--execution-mode", "lanes"])[0].execution_mode
+        )
+
+    def test_it_should_not_has_a_default_value_for_adaptive(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_adaptive)
+
+    def test_it_should_accept_adaptive_options(self):
+        self.assertEqual(True, CLI.parse(["--adaptive"])[0].execution_adaptive)
+
+    def test_it_should_not_has_a_default_value_for_resume(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_resume)
+
+    def test_it_should_accept_resume_options(self):
+        self.assertEqual(True, CLI.parse(["--resume"])[0].execution_resume)
+
+    def test_it_should_not_has_a_default_value_for_rollback(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_rollback)
+
+    def test_it_should_accept_rollback_options(self):
+        self.assertEqual(True, CLI.parse(["--rollback"])[0].execution_rollback)
+
+    def test_it_should_not_has_a_default_value_for_dry_run(self):
+        self.assertEqual(None, CLI.parse([])[0].dry_run)
+
+    def test_it_should_accept_dry_run_options(self):
+        self.assertEqual(True, CLI.parse(["--dry-run"])[0].dry_run)
+
+    def test_it_should_not_has_a_default_value_for_coalesce(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_coalesce)
+
+    def test_it_should_accept_coalesce_options(self):
+        self.assertEqual(True, CLI.parse(["--coalesce"])[0].execution_coalesce)
+
+    def test_it_should_not_has_a_default_value_for_stream(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_streaming)
+
+    def test_it_should_accept_stream_options(self):
+        self.assertEqual(True, CLI.parse(["--stream"])[0].execution_streaming)
+
+    def test_it_should_not_has_a_default_value_for_echo(self):
+        self.assertEqual(None, CLI.parse([])[0].execution_echo)
+
+    def test_it_should_accept_echo_options(self):
+        self.assertEqual(True, CLI.parse(["--echo"])[0].execution_echo)
+
+    def test_it_should_not_has_a_default_value_for_load_backend(self):
+        self.assertEqual(None, CLI.parse([])[0].load_backend)
+
+    def test_it_should_accept_load_backend_options(self):
+        self.assertEqual(
+            "neptune", CLI.parse(["--load-backend", "neptune"])[0].load_backend
+        )
+
     @patch("sys.stdout", new_callable=StringIO)
     def test_it_should_call_print_statment_with_the_given_message(self, stdout_mock):
         CLI.msg("message to print")
@@ -0,0 +1,91 @@
+import unittest
+
+from neptune_migrate.coalesce import coalesce
+
+
+def insert(triple, graph="http://g"):
+    return "INSERT DATA { GRAPH <%s> { %s . } };" % (graph, triple)
+
+
+def delete(triple, graph="http://g"):
+    return "WITH <%s> DELETE { %s . } WHERE { %s . }" % (graph, triple, triple)
+
+
+def pair(operation, triple, graph="http://g"):
+    if operation == "insert":
+        return insert(triple, graph), delete(triple, graph)
+    return delete(triple, graph), insert(triple, graph)
+
+
+BLANK_NODE = (
+    "INSERT DATA { GRAPH <http://g> { <http://a> <http://b> [<http://c> 1 ; ] } };",
+    "WITH <http://g> DELETE { <http://a> <http://b> ?s. ?s <http://c> 1 } "
+    "WHERE { <http://a> <http://b> ?s. ?s <http://c> 1 };",
+)
+
+
+class CoalesceTest(unittest.TestCase):
+    def test_it_should_merge_the_triples_of_a_subject_in_a_graph(self):
+        inserts = [
+            pair("insert", "<http://a> <http://p> 1"),
+            pair("insert", "<http://b> <http://p> 1"),
+            pair("insert", "<http://a> <http://q> 2"),
+            pair("insert", "<http://a> <http://p> 1", "http://h"),
+        ]
+        self.assertEqual(
+            (
+                [],
+                [
+                    (
+                        "INSERT DATA { GRAPH <http://g> { "
+                        "<http://a> <http://p> 1 ; <http://q> 2 . } };",
+                        "DELETE DATA { GRAPH <http://g> { "
+                        "<http://a> <http://p> 1 ; <http://q> 2 . } };",
+                    ),
+                    inserts[1],
+                    inserts[3],
+                ],
+            ),
+            coalesce([], inserts),
+        )
+
+    def test_it_should_merge_deletes_undone_by_a_single_insert(self):
+        deletes = [
+            pair("delete", "<http://a> <http://p> 1"),
+            pair("delete", "<http://a> <http://q> 2"),
+        ]
+        self.assertEqual(
+            [
+                (
+                    "DELETE DATA { GRAPH <http://g> { "
+                    "<http://a> <http://p> 1 ; <http://q> 2 . } };",
+                    "INSERT DATA { GRAPH <http://g> { "
+                    "<http://a> <http://p> 1 ; <http://q> 2 . } };",
+                )
+            ],
+            coalesce(deletes, [])[0],
+        )
+
+    def test_it_should_limit_the_triples_of_a_merged_statement(self):
+        inserts = [
+            pair("insert", "<http://a> <http://p> %d" % number) for number in range(5)
+        ]
+        merged = coalesce([], inserts, max_triples=2)[1]
+        self.assertEqual(3, len(merged))
+        self.assertEqual(inserts[4], merged[2])
+
+    def test_it_should_drop_repeated_statements(self):
+        inserts = [BLANK_NODE, pair("insert", "<http://a> <http://p> 1"), BLANK_NODE]
+        self.assertEqual([BLANK_NODE, inserts[1]], coalesce([], inserts)[1])
+
+    def test_it_should_drop_deletes_of_triples_inserted_again(self):
+        deletes = [
+            pair("delete", "<http://a> <http://p> 1"),
+            pair("delete", "<http://a> <http://p> 2"),
+        ]
+        inserts = [pair("insert", "<http://a> <http://p> 1")]
+        self.assertEqual(([deletes[1]], inserts), coalesce(deletes, inserts))
+
+    def test_it_should_keep_blank_node_structures_as_they_are(self):
+        inserts = [BLANK_NODE, pair("insert", "<http://a> <http://p> 1")]
+        self.assertEqual(([], inserts), coalesce([], inserts))
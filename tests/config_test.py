@@ -6,6 +6,13 @@ from tests import create_file, delete_files
 
 
 class ConfigTest(unittest.TestCase):
+    def test_it_should_copy_the_config_replacing_some_keys(self):
+        config = Config({"database_host": "a", "database_port": 1})
+        copy = config.copy({"DATABASE_HOST": "b"})
+        self.assertEqual("b", copy.get("database_host"))
+        self.assertEqual(1, copy.get("database_port"))
+        self.assertEqual("a", config.get("database_host"))
+
     def test_it_should_parse_migrations_dir_with_one_relative_dir(self):
         dirs = Config._parse_migrations_dir(".")
         self.assertEqual(1, len(dirs))
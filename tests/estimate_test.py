@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+from neptune_migrate.estimate import (
+    MigrationEstimate,
+    ThroughputStore,
+    count_triples,
+    format_duration,
+    is_blank_node_structure,
+)
+
+INSERT = "INSERT DATA { GRAPH <g> { <http://a> <http://b> <http://c> . } };"
+DELETE = (
+    "WITH <g> DELETE { <http://a> <http://b> <http://d> . } "
+    "WHERE { <http://a> <http://b> <http://d> . }"
+)
+INSERT_BLANK_NODE = (
+    "INSERT DATA { GRAPH <g> { <http://a> <http://b> "
+    '[<http://c> "1" ; <http://d> "2" ; ] } };'
+)
+DELETE_BLANK_NODE = (
+    "WITH <g> DELETE { <http://a> <http://b> ?s. "
+    '?s <http://c> "1" ; <http://d> "2" } WHERE '
+    '{ <http://a> <http://b> ?s. ?s <http://c> "1" ; <http://d> "2" };'
+)
+
+
+class EstimateTest(unittest.TestCase):
+    def test_it_should_count_the_triples_of_generated_statements(self):
+        self.assertEqual(1, count_triples(INSERT))
+        self.assertEqual(1, count_triples(DELETE))
+        self.assertEqual(3, count_triples(INSERT_BLANK_NODE))
+        self.assertEqual(3, count_triples(DELETE_BLANK_NODE))
+        self.assertEqual(
+            2,
+            count_triples(
+                "DELETE DATA { GRAPH <g> { <http://a> <http://b> 1 ; <http://c> 2 . } };"
+            ),
+        )
+
+    def test_it_should_count_unknown_statements_as_a_single_triple(self):
+        self.assertEqual(1, count_triples("CLEAR GRAPH <g>"))
+
+    def test_it_should_tell_blank_node_structures_apart(self):
+        self.assertFalse(is_blank_node_structure(INSERT))
+        self.assertFalse(is_blank_node_structure(DELETE))
+        self.assertTrue(is_blank_node_structure(INSERT_BLANK_NODE))
+        self.assertTrue(is_blank_node_structure(DELETE_BLANK_NODE))
+
+    def test_it_should_format_durations(self):
+        self.assertEqual("1:01:02", format_duration(3661.6))
+
+    def test_it_should_report_the_cost_of_a_migration(self):
+        sparql_up = [DELETE, INSERT, INSERT_BLANK_NODE, "history;"]
+        estimate = MigrationEstimate(
+            sparql_up, {"update": 4, "atomic": 1}, {"update": 2.0}
+        )
+
+        self.assertEqual(3, estimate.statements)
+        self.assertEqual(4, estimate.added_triples)
+        self.assertEqual(1, estimate.removed_triples)
+        self.assertEqual(1, estimate.blank_node_structures)
+        self.assertEqual(2.0, estimate.get_duration("update"))
+        self.assertIsNone(estimate.get_duration("atomic"))
+        self.assertEqual(
+            "Dry run: 3 statements (and the history record)\n"
+            "- triples added: 4, removed: 1, blank node structures: 1\n"
+            "- payload: %d bytes\n"
+            "- execution mode update: 4 requests, about 0:00:02 at 2.0 statements/s\n"
+            "- execution mode atomic: 1 requests, "
+            "no earlier run to project a duration from" % estimate.payload_bytes,
+            estimate.report(),
+        )
+
+
+class ThroughputStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.filename = tempfile.mktemp()
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_it_should_sum_the_throughput_of_each_endpoint_and_mode(self):
+        store = ThroughputStore(self.filename)
+        self.assertEqual({}, store.get_rates("https://a"))
+        store.record("https://a", "update", 10, 5.0)
+        store.record("https://a", "update", 30, 5.0)
+        store.record("https://a", "lanes", 10, 1.0)
+        store.record("https://b", "update", 1, 1.0)
+        self.assertEqual(
+            {"update": 4.0, "lanes": 10.0},
+            ThroughputStore(self.filename).get_rates("https://a"),
+        )
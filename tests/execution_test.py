@@ -0,0 +1,202 @@
+import threading
+import time
+import unittest
+
+from neptune_migrate.execution import (
+    align_rollback_statements,
+    get_subject,
+    iter_in_background,
+    iter_stream_batches,
+    join_statements,
+    pack_lanes,
+    run_concurrently,
+    split_in_batches,
+    split_in_lanes,
+    split_in_phases,
+    split_rollback_in_phases,
+)
+
+
+class ExecutionTest(unittest.TestCase):
+    def test_it_should_put_each_statement_in_its_own_batch_by_default(self):
+        self.assertEqual([[0], [1], [2]], split_in_batches(["a;", "b;", "c;"]))
+
+    def test_it_should_limit_batches_by_statement_count(self):
+        self.assertEqual(
+            [[0, 1], [2, 3], [4]],
+            split_in_batches(["a;", "b;", "c;", "d;", "e;"], max_statements=2),
+        )
+
+    def test_it_should_limit_batches_by_payload_size(self):
+        self.assertEqual(
+            [[0, 1], [2], [3]],
+            split_in_batches(
+                ["aa;", "bb;", "ccccc;", "dd;"], max_statements=10, max_bytes=6
+            ),
+        )
+
+    def test_it_should_batch_statements_while_they_are_generated(self):
+        statements = iter(enumerate(["aa;", "bb;", "cc;", "ddddd;", "ee;"]))
+        self.assertEqual(
+            [[0, 1], [2], [3], [4]],
+            list(iter_stream_batches(statements, lambda: (2, 6))),
+        )
+
+    def test_it_should_produce_items_in_background_in_order(self):
+        self.assertEqual(list(range(50)), list(iter_in_background(range(50), 4)))
+
+    def test_it_should_raise_the_errors_of_the_background_producer(self):
+        def items():
+            yield 1
+            raise ValueError("boom")
+
+        consumed = iter_in_background(items())
+        self.assertEqual(1, next(consumed))
+        self.assertRaises(ValueError, next, consumed)
+
+    def test_it_should_keep_the_background_producer_a_few_items_ahead(self):
+        produced = []
+
+        def items():
+            for item in range(100):
+                produced.append(item)
+                yield item
+
+        consumed = iter_in_background(items(), 2)
+        self.assertEqual(0, next(consumed))
+        time.sleep(0.1)
+        self.assertLessEqual(len(produced), 4)
+        consumed.close()
+
+    def test_it_should_join_statements_in_one_multi_statement_update(self):
+        self.assertEqual(
+            "INSERT DATA { <a> <b> <c> . };\nWITH <g> DELETE { } WHERE { }",
+            join_statements(
+                ["INSERT DATA { <a> <b> <c> . };", "WITH <g> DELETE { } WHERE { }"]
+            ),
+        )
+
+    def test_it_should_keep_a_single_statement_untouched(self):
+        self.assertEqual("INSERT DATA {};", join_statements(["INSERT DATA {};"]))
+
+    def test_it_should_split_deletes_inserts_and_history_record_in_phases(self):
+        self.assertEqual(
+            [[0, 1], [2, 3], [4]],
+            split_in_phases(
+                [
+                    "WITH <g> DELETE { <a> <b> <c> . } WHERE { <a> <b> <c> . }",
+                    "WITH <g> DELETE { <a> <b> <d> . } WHERE { <a> <b> <d> . }",
+                    "INSERT DATA { GRAPH <g> { <a> <b> <e> . } };",
+                    "INSERT DATA { GRAPH <g> { <a> <b> <f> . } };",
+                    'INSERT DATA { GRAPH <m> { [] <v> "1" . } };',
+                ]
+            ),
+        )
+
+    def test_it_should_align_each_rollback_statement_with_the_one_it_undoes(self):
+        self.assertEqual(
+            ["undo delete 1", "undo delete 2", "undo insert", "undo history"],
+            align_rollback_statements(
+                ["WITH <g> DELETE 1", "WITH <g> DELETE 2", "INSERT DATA", "history"],
+                ["undo insert", "undo delete 1", "undo delete 2", "undo history"],
+            ),
+        )
+        self.assertEqual(
+            ["down1", "down2"],
+            align_rollback_statements(["up1", "up2"], ["down1", "down2"]),
+        )
+
+    def test_it_should_split_the_rollback_of_applied_statements_in_reverse_phases(
+        self,
+    ):
+        sparql_down = [
+            "INSERT DATA { GRAPH <g> { <a> <b> <c> . } };",
+            "INSERT DATA { GRAPH <g> { <a> <b> <d> . } };",
+            "WITH <g> DELETE { <a> <b> <e> . } WHERE { <a> <b> <e> . }",
+            "WITH <g> DELETE { <a> <b> <f> . } WHERE { <a> <b> <f> . }",
+            "WITH <m> DELETE { ?s ?p ?o } WHERE { ?s ?p ?o . }",
+        ]
+        self.assertEqual(
+            [[3, 2], [1, 0]], split_rollback_in_phases({0, 1, 2, 3}, sparql_down)
+        )
+        self.assertEqual(
+            [[2], [1, 0]], split_rollback_in_phases([2, 0, 1], sparql_down)
+        )
+
+    def test_it_should_find_the_subject_of_generated_statements(self):
+        self.assertEqual(
+            "<http://a>",
+            get_subject("INSERT DATA { GRAPH <g> { <http://a> <b> [<c> <d> ; ] } };"),
+        )
+        self.assertEqual(
+            "<http://a>",
+            get_subject(
+                "WITH <g> DELETE { <http://a> <b> <c> . } WHERE { <http://a> <b> <c> . }"
+            ),
+        )
+        self.assertEqual(
+            "<http://a>",
+            get_subject(
+                "DELETE DATA { GRAPH <g> { <http://a> <b> <c> ; <d> <e> . } };"
+            ),
+        )
+        self.assertIsNone(get_subject("INSERT DATA { GRAPH <g> { [<c> <d> ; ] } };"))
+
+    def test_it_should_split_statements_in_lanes_by_subject_deletes_first(self):
+        statements = [
+            "WITH <g> DELETE { <a> <p> <o> . } WHERE { <a> <p> <o> . }",
+            "WITH <g> DELETE { <b> <p> <o> . } WHERE { <b> <p> <o> . }",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o2> . } };",
+            "INSERT DATA { GRAPH <g> { [<c> <d> ; ] } };",
+            "INSERT DATA { GRAPH <g> { <b> <p> [<c> <d> ; ] } };",
+            "INSERT DATA { GRAPH <m> { [] <v> <h> . } };",
+        ]
+        self.assertEqual([[0, 2], [1, 4], [3]], split_in_lanes(statements))
+
+    def test_it_should_pack_small_lanes_together(self):
+        self.assertEqual(
+            [[0, 1, 2], [3, 4, 5, 6], [7]],
+            list(pack_lanes([[0], [1, 2], [3, 4, 5, 6], [7]], lambda: 3)),
+        )
+
+    def test_it_should_keep_at_most_the_given_number_of_calls_in_flight(self):
+        lock = threading.Lock()
+        in_flight = []
+        max_in_flight = []
+
+        def function(item):
+            with lock:
+                in_flight.append(item)
+                max_in_flight.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.remove(item)
+            return item * 2
+
+        results = list(run_concurrently(function, range(10), 3))
+
+        self.assertEqual(3, max(max_in_flight))
+        self.assertEqual(
+            [(i, i * 2, None) for i in range(10)], sorted(results, key=lambda r: r[0])
+        )
+
+    def test_it_should_read_a_callable_concurrency_before_each_call(self):
+        limits = iter([1, 1, 2, 2, 2, 2])
+        results = list(
+            run_concurrently(lambda item: item, range(3), lambda: next(limits, 2), 2)
+        )
+
+        self.assertEqual([0, 1, 2], sorted(item for item, _, _ in results))
+
+    def test_it_should_not_start_new_calls_after_a_failure(self):
+        def function(item):
+            if item == 1:
+                raise Exception("boom")
+            return item
+
+        results = list(run_concurrently(function, range(5)))
+
+        self.assertEqual([(0, 0, None)], results[:1])
+        self.assertEqual(1, results[1][0])
+        self.assertEqual("boom", str(results[1][2]))
+        self.assertEqual(2, len(results))
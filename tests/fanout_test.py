@@ -0,0 +1,126 @@
+import threading
+import unittest
+
+from mock import Mock, patch
+
+from neptune_migrate.config import Config
+from neptune_migrate.fanout import MultiTarget, SharedResults, get_targets
+from tests import BaseTest
+
+
+class GetTargetsTest(unittest.TestCase):
+    def test_it_should_read_targets_from_a_list_of_urls(self):
+        config = Config(
+            {"aws_region": "sa-east-1", "neptune_targets": "https://a, https://b"}
+        )
+        targets = get_targets(config)
+
+        self.assertEqual(["https://a", "https://b"], [name for name, _ in targets])
+        self.assertEqual("https://b", targets[1][1].get("aws_neptune_url"))
+        self.assertEqual("sa-east-1", targets[1][1].get("aws_region"))
+        self.assertIsNone(targets[1][1].get("neptune_targets"))
+
+    def test_it_should_sign_the_host_of_each_target_url(self):
+        config = Config(
+            {
+                "aws_neptune_host": "a:8182",
+                "neptune_targets": {
+                    "a": {"AWS_NEPTUNE_URL": "https://a:8182"},
+                    "b": {"AWS_NEPTUNE_URL": "https://b:8182"},
+                    "c": {
+                        "AWS_NEPTUNE_URL": "https://c:8182",
+                        "AWS_NEPTUNE_HOST": "proxy:8182",
+                    },
+                },
+            }
+        )
+        targets = dict(get_targets(config))
+
+        self.assertIsNone(targets["a"].get("aws_neptune_host"))
+        self.assertIsNone(targets["b"].get("aws_neptune_host"))
+        self.assertEqual("proxy:8182", targets["c"].get("aws_neptune_host"))
+
+        urls = Config({"aws_neptune_host": "a:8182", "neptune_targets": "https://b"})
+        self.assertIsNone(get_targets(urls)[0][1].get("aws_neptune_host"))
+
+    def test_it_should_read_the_settings_of_each_named_target(self):
+        config = Config(
+            {
+                "aws_region": "sa-east-1",
+                "neptune_targets": {
+                    "us": {"AWS_NEPTUNE_URL": "https://us", "AWS_REGION": "us-east-1"},
+                    "staging": {"aws_neptune_url": "https://staging"},
+                },
+            }
+        )
+        targets = dict(get_targets(config))
+
+        self.assertEqual("us-east-1", targets["us"].get("aws_region"))
+        self.assertEqual("sa-east-1", targets["staging"].get("aws_region"))
+        self.assertEqual("sa-east-1", config.get("aws_region"))
+
+
+class SharedResultsTest(unittest.TestCase):
+    def test_it_should_compute_each_result_once(self):
+        compute = Mock(return_value="result")
+        shared_results = SharedResults()
+
+        self.assertEqual("result", shared_results.get("key", compute))
+        self.assertEqual("result", shared_results.get("key", compute))
+        compute.assert_called_once_with()
+
+    def test_it_should_compute_different_results_at_once(self):
+        shared_results = SharedResults()
+        computing = threading.Event()
+        computed = threading.Event()
+        results = []
+
+        def compute():
+            computing.set()
+            return computed.wait(5)
+
+        thread = threading.Thread(
+            target=lambda: results.append(shared_results.get("a", compute))
+        )
+        thread.start()
+        computing.wait(5)
+        shared_results.get("b", computed.set)
+        thread.join()
+
+        self.assertEqual([True], results)
+
+
+class MultiTargetTest(BaseTest):
+    @patch("neptune_migrate.fanout.Main")
+    def test_it_should_run_every_target_sharing_results(self, main_mock):
+        mains = [Mock(name="a"), Mock(name="b")]
+        main_mock.side_effect = mains
+        multi_target = MultiTarget(
+            Config({"neptune_targets": ["https://a", "https://b"]})
+        )
+        multi_target.execute()
+
+        self.assertEqual("https://a", main_mock.call_args_list[0][0][1])
+        for main in mains:
+            main.execute.assert_called_once_with()
+        self.assertIs(
+            mains[0].virtuoso.shared_results, mains[1].virtuoso.shared_results
+        )
+
+    @patch("neptune_migrate.fanout.Main")
+    def test_it_should_isolate_the_failure_of_a_target(self, main_mock):
+        failing = Mock(**{"execute.side_effect": SystemExit(1)})
+        failing.name = "https://a"
+        succeeding = Mock()
+        succeeding.name = "https://b"
+        main_mock.side_effect = [failing, succeeding]
+        multi_target = MultiTarget(
+            Config({"neptune_targets": ["https://a", "https://b"]})
+        )
+
+        self.assertRaisesWithMessage(
+            Exception,
+            "migration failed on 1 of 2 targets (https://a)",
+            multi_target.execute,
+        )
+        succeeding.execute.assert_called_once_with()
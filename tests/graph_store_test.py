@@ -0,0 +1,85 @@
+import unittest
+
+from neptune_migrate.graph_store import (
+    delete_data,
+    is_idempotent,
+    parse_ground_statement,
+    to_ntriples,
+)
+
+
+class GraphStoreTest(unittest.TestCase):
+    def test_it_should_parse_statements_inserting_ground_triples(self):
+        self.assertEqual(
+            ("insert", "http://g", '<http://a> <http://b> "c ?d"'),
+            parse_ground_statement(
+                'INSERT DATA { GRAPH <http://g> { <http://a> <http://b> "c ?d" . } };'
+            ),
+        )
+
+    def test_it_should_parse_statements_deleting_ground_triples(self):
+        self.assertEqual(
+            ("delete", "http://g", "<http://a> <http://b> <http://c>"),
+            parse_ground_statement(
+                "WITH <http://g> DELETE { <http://a> <http://b> <http://c> . } "
+                "WHERE { <http://a> <http://b> <http://c> . }"
+            ),
+        )
+
+    def test_it_should_parse_delete_data_statements(self):
+        self.assertEqual(
+            ("delete", "http://g", "<http://a> <http://b> <http://c> ; <http://d> 1"),
+            parse_ground_statement(
+                "DELETE DATA { GRAPH <http://g> { "
+                "<http://a> <http://b> <http://c> ; <http://d> 1 . } };"
+            ),
+        )
+
+    def test_it_should_not_parse_statements_with_blank_nodes_or_variables(self):
+        self.assertIsNone(
+            parse_ground_statement(
+                "INSERT DATA { GRAPH <http://g> { <http://a> <http://b> [<http://c> <http://d> ; ] } };"
+            )
+        )
+        self.assertIsNone(
+            parse_ground_statement("INSERT DATA { GRAPH <http://m> { [] <v> <h> . } };")
+        )
+        self.assertIsNone(
+            parse_ground_statement(
+                "WITH <http://g> DELETE { <http://a> <http://b> ?o . } "
+                "WHERE { <http://a> <http://b> ?o . }"
+            )
+        )
+        self.assertIsNone(
+            parse_ground_statement(
+                "WITH <http://g> DELETE { <http://a> <http://b> <http://c> . } "
+                "WHERE { <http://a> <http://b> <http://d> . }"
+            )
+        )
+
+    def test_it_should_tell_statements_that_can_be_sent_twice(self):
+        self.assertTrue(is_idempotent('INSERT DATA { GRAPH <g> { <s> <p> "[x]" . } };'))
+        self.assertTrue(is_idempotent("DELETE DATA { GRAPH <g> { <s> <p> <o> . } };"))
+        self.assertTrue(
+            is_idempotent(
+                "WITH <g> DELETE { <a> <b> ?s. ?s <c> 1 } WHERE { <a> <b> ?s. ?s <c> 1 };"
+            )
+        )
+        self.assertFalse(
+            is_idempotent("INSERT DATA { GRAPH <g> { <a> <b> [ <c> 1 ; ] } };")
+        )
+        self.assertFalse(
+            is_idempotent('INSERT DATA { GRAPH <m> { [] owl:versionInfo "02" .} };')
+        )
+
+    def test_it_should_serialize_turtle_triples_as_ntriples(self):
+        self.assertEqual(
+            '<http://a> <http://b> "c\\nd"@en .\n',
+            to_ntriples(['<http://a> <http://b> """c\nd"""@en']),
+        )
+
+    def test_it_should_delete_every_triple_in_a_single_delete_data(self):
+        self.assertEqual(
+            "DELETE DATA { GRAPH <http://g> { <a> <b> <c> .\n<a> <b> <d> . } }",
+            delete_data("http://g", ["<a> <b> <c>", "<a> <b> <d>"]),
+        )
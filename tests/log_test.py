@@ -1,3 +1,4 @@
+import glob
 import logging
 import os
 import unittest
@@ -56,6 +57,32 @@ class LogTest(BaseTest):
         self.assertTrue(isinstance(log.logger.handlers[0].formatter, logging.Formatter))
         self.assertEqual("%(message)s", log.logger.handlers[0].formatter._fmt)
 
+    def test_it_should_write_each_line_once(self):
+        LOG("log_dir_test/path/subpath")
+        LOG("log_dir_test/path/subpath").debug("debug message")
+        for handler in logging.getLogger("simple-db-migrate").handlers:
+            handler.flush()
+
+        lines = []
+        for filename in glob.glob("log_dir_test/path/subpath/*.log"):
+            with open(filename) as f:
+                lines.extend(f.read().splitlines())
+        self.assertEqual(["debug message"], lines)
+
+    def test_it_should_log_each_target_to_a_file_of_its_own(self):
+        logs = [LOG("log_dir_test/path/subpath", name) for name in ("a", "https://b")]
+        for log, name in zip(logs, ("a", "https://b")):
+            log.debug("message of %s" % name)
+            log.logger.handlers[0].flush()
+
+        self.assertTrue(
+            logs[1].logger.handlers[0].baseFilename.endswith("-https_b.log")
+        )
+        for log, name in zip(logs, ("a", "https://b")):
+            self.assertEqual(1, len(log.logger.handlers))
+            with open(log.logger.handlers[0].baseFilename) as f:
+                self.assertEqual("message of %s\n" % name, f.read())
+
     def test_it_should_use_logger_methods(self):
         log = LOG("log_dir_test/path/subpath")
         log.logger = Mock()
@@ -4,6 +4,7 @@ from mock import Mock, call, patch
 
 from neptune_migrate.config import Config
 from neptune_migrate.main import Main
+from neptune_migrate.neptune.metrics import RequestRecord
 from tests import BaseTest, create_file, delete_files
 
 
@@ -157,14 +158,14 @@ class MainTest(BaseTest):
     ):
         config = Config(self.initial_config)
         Main(config)
-        log_mock.assert_called_with(None)
+        log_mock.assert_called_with(None, None)
         simplevirtuosomigrate_mock.assert_called_with(config)
 
     @patch("neptune_migrate.main.LOG")
     def test_it_should_use_log_dir_from_config(self, log_mock):
         self.initial_config.update({"log_dir": ".", "database_migrations_dir": "."})
         Main(Config(self.initial_config))
-        log_mock.assert_called_with(".")
+        log_mock.assert_called_with(".", None)
 
     @patch("neptune_migrate.main.Virtuoso")
     def test_it_should_use_virtuoso_class(self, virtuoso_mock):
@@ -356,6 +357,17 @@ class MainTest(BaseTest):
 
         cli_mock.assert_called_with("message to log", "RED")
 
+    @patch("neptune_migrate.main.SimpleVirtuosoMigrate")
+    @patch("neptune_migrate.main.LOG")
+    @patch("neptune_migrate.main.CLI.msg")
+    def test_it_should_prefix_messages_with_the_target_name(
+        self, cli_mock, log_mock, simplevirtuosomigrate_mock
+    ):
+        main = Main(Config(self.initial_config), "us-east-1")
+        main._execution_log("\nmessage to log", color="RED", log_level_limit=1)
+
+        cli_mock.assert_called_with("\n[us-east-1] message to log", "RED")
+
     @patch("neptune_migrate.main.SimpleVirtuosoMigrate")
     @patch("neptune_migrate.main.LOG")
     @patch("neptune_migrate.main.CLI.msg")
@@ -379,6 +391,7 @@ class MainTest(BaseTest):
             **{
                 "get_current_version.return_value": ("current_version", "git"),
                 "get_sparql.return_value": ("sparql_up", "sparql_down"),
+                "get_request_metrics.return_value.count": 0,
             }
         ),
     )
@@ -449,6 +462,7 @@ class MainTest(BaseTest):
             **{
                 "get_current_version.return_value": ("current_version", "git"),
                 "get_sparql.return_value": ("sparql_up", "sparql_down"),
+                "get_request_metrics.return_value.count": 0,
             }
         ),
     )
@@ -536,6 +550,7 @@ class MainTest(BaseTest):
             **{
                 "get_current_version.return_value": ("current_version", "git"),
                 "get_sparql.return_value": ("sparql_up", "sparql_down"),
+                "get_request_metrics.return_value.count": 0,
             }
         ),
     )
@@ -575,6 +590,7 @@ class MainTest(BaseTest):
             **{
                 "get_current_version.return_value": (None, None),
                 "get_sparql.return_value": ("sparql_up", "sparql_down"),
+                "get_request_metrics.return_value.count": 0,
             }
         ),
     )
@@ -614,6 +630,7 @@ class MainTest(BaseTest):
             **{
                 "get_current_version.return_value": ("current_file", "file"),
                 "get_sparql.return_value": ("sparql_up", "sparql_down"),
+                "get_request_metrics.return_value.count": 0,
             }
         ),
     )
@@ -646,6 +663,52 @@ class MainTest(BaseTest):
             "sparql_up", "sparql_down", "current_file", "version"
         )
 
+    @patch("neptune_migrate.main.Main._execute_migrations")
+    @patch(
+        "neptune_migrate.main.Virtuoso",
+        return_value=Mock(
+            **{
+                "get_current_version.return_value": ("01", "git"),
+                "get_ontology_by_version.side_effect": ["ontology 01", "ontology 02"],
+                "stream_change.return_value": (["up", "history"], ["down", "h"]),
+                "get_request_metrics.return_value.count": 0,
+            }
+        ),
+    )
+    @patch(
+        "neptune_migrate.main.SimpleVirtuosoMigrate.check_if_version_exists",
+        return_value=True,
+    )
+    @patch("neptune_migrate.main.Main._execution_log")
+    def test_it_should_stream_the_migration_if_asked_to(
+        self,
+        _execution_log_mock,
+        simplevirtuosomigrate_mock,
+        virtuoso_mock,
+        execute_migrations_mock,
+    ):
+        self.initial_config.update(
+            {
+                "schema_version": "02",
+                "file_migration": None,
+                "execution_streaming": True,
+            }
+        )
+        main = Main(Config(self.initial_config))
+        main.execute()
+
+        main.virtuoso.stream_change.assert_called_with(
+            "ontology 01",
+            "ontology 02",
+            "01",
+            "02",
+            "git",
+            execution_log=_execution_log_mock,
+        )
+        self.assertEqual(0, main.virtuoso.get_sparql.call_count)
+        self.assertEqual(0, execute_migrations_mock.call_count)
+        _execution_log_mock.assert_any_call("===== executing =====", log_level_limit=1)
+
     @patch("neptune_migrate.main.Virtuoso")
     @patch("neptune_migrate.main.Main._execution_log")
     def test_it_should_use_virtuoso_class_to_get_migration_and_execute_changes(
@@ -673,6 +736,7 @@ class MainTest(BaseTest):
             "sparql_up line 1\nsparql_up line 2\nsparql_up line 3",
             "sparql_down line 1\nsparql_down line 2\nsparql_down line 3",
             execution_log=_execution_log_mock,
+            versions=("current_version", "destination_version"),
         )
 
     @patch("neptune_migrate.main.Virtuoso")
@@ -759,6 +823,45 @@ class MainTest(BaseTest):
         self.assertEqual(expected_calls, _execution_log_mock.mock_calls)
         self.assertEqual(0, main.virtuoso.execute_change.call_count)
 
+    @patch("neptune_migrate.main.Virtuoso")
+    @patch("neptune_migrate.main.Main._execution_log")
+    def test_it_should_report_the_cost_of_the_migration_on_a_dry_run(
+        self, _execution_log_mock, virtuoso_mock
+    ):
+        self.initial_config.update({"dry_run": True})
+        main = Main(Config(self.initial_config))
+        main.virtuoso.estimate.return_value.report.return_value = "the report"
+        main._execute_migrations(
+            ["sparql_up", "history"],
+            ["sparql_down", "history down"],
+            "current_version",
+            "destination_version",
+        )
+
+        _execution_log_mock.assert_any_call(
+            "\nWARNING: commands are not being executed ('--dry-run' activated)",
+            "RED",
+            log_level_limit=1,
+        )
+        _execution_log_mock.assert_called_with("\nthe report", log_level_limit=1)
+        main.virtuoso.estimate.assert_called_with(["sparql_up", "history"])
+        self.assertEqual(0, main.virtuoso.execute_change.call_count)
+
+    @patch("neptune_migrate.main.Main._migrate", return_value={})
+    @patch("neptune_migrate.main.Main._execution_log")
+    def test_it_should_log_a_summary_of_the_requests_sent_to_neptune(
+        self, _execution_log_mock, migrate_mock
+    ):
+        main = Main(Config(self.initial_config))
+        metrics = main.virtuoso.get_request_metrics()
+        metrics.record(RequestRecord("update", 200, 100, 10, 0.001, 0.02, 0.03, None))
+
+        main.execute()
+
+        _execution_log_mock.assert_any_call(
+            "\n%s" % metrics.summary(), log_level_limit=1
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,228 @@
+import datetime
+import os
+
+import requests
+from aws_requests_auth.aws_auth import AWSRequestsAuth
+from mock import Mock, patch
+
+from neptune_migrate.config import Config
+from neptune_migrate.neptune.auth import (
+    Credentials,
+    EnvironmentCredentialsProvider,
+    FileCredentialsProvider,
+    RefreshableCredentials,
+    SigV4Auth,
+    get_aws_auth,
+    get_signing_key,
+    parse_expiration,
+)
+from tests import BaseTest, create_file, delete_files
+
+NOW = datetime.datetime(2021, 10, 1, 12, 30, 0, tzinfo=datetime.timezone.utc)
+
+
+def prepared_request():
+    return requests.Request(
+        "POST",
+        "https://fake-neptune-host.com:8182/sparql",
+        data="update=INSERT+DATA+%7B%7D",
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    ).prepare()
+
+
+class AuthTest(BaseTest):
+    def setUp(self):
+        super(AuthTest, self).setUp()
+        self.config = Config(
+            {
+                "aws_access_key": "a-fake-access-key",
+                "aws_secret_access_key": "a-fake-secret-access-key",
+                "aws_neptune_host": "fake-neptune-host.com:8182",
+                "aws_region": "sa-east-1",
+            }
+        )
+
+    def tearDown(self):
+        super(AuthTest, self).tearDown()
+        delete_files("test_credentials")
+
+    @patch("aws_requests_auth.aws_auth.datetime")
+    def test_it_should_sign_requests_like_aws_requests_auth(self, datetime_mock):
+        datetime_mock.datetime.utcnow.return_value = NOW
+        expected = AWSRequestsAuth(
+            aws_access_key="a-fake-access-key",
+            aws_secret_access_key="a-fake-secret-access-key",
+            aws_host="fake-neptune-host.com:8182",
+            aws_region="sa-east-1",
+            aws_service="neptune-db",
+        ).get_aws_request_headers_handler(prepared_request())
+
+        auth = get_aws_auth(self.config)
+        auth.clock = lambda: NOW
+
+        self.assertEqual(expected, auth.get_headers(prepared_request()))
+
+    @patch("aws_requests_auth.aws_auth.datetime")
+    def test_it_should_sign_requests_to_readers_for_their_own_host(self, datetime_mock):
+        datetime_mock.datetime.utcnow.return_value = NOW
+        self.config.put("aws_neptune_url", "https://fake-neptune-host.com:8182")
+        self.config.update("aws_neptune_host", "proxy:8182")
+        auth = get_aws_auth(self.config)
+        auth.clock = lambda: NOW
+
+        for url, host in (
+            ("https://fake-neptune-host.com:8182/sparql", "proxy:8182"),
+            ("https://reader:8182/sparql", "reader:8182"),
+        ):
+            request = requests.Request("POST", url, data="query=ASK+%7B%7D").prepare()
+            expected = AWSRequestsAuth(
+                aws_access_key="a-fake-access-key",
+                aws_secret_access_key="a-fake-secret-access-key",
+                aws_host=host,
+                aws_region="sa-east-1",
+                aws_service="neptune-db",
+            ).get_aws_request_headers_handler(request)
+            self.assertEqual(expected, auth.get_headers(request))
+
+    def test_it_should_sign_with_the_session_token(self):
+        credentials = Mock(**{"get.return_value": Credentials("k", "s", "t", None)})
+        auth = SigV4Auth(credentials, "sa-east-1", clock=lambda: NOW)
+
+        headers = auth.get_headers(prepared_request())
+
+        self.assertEqual("t", headers["X-Amz-Security-Token"])
+        self.assertIn(
+            "SignedHeaders=host;x-amz-date;x-amz-security-token",
+            headers["Authorization"],
+        )
+
+    def test_it_should_derive_the_signing_key_once_per_day(self):
+        get_signing_key.cache_clear()
+        auth = get_aws_auth(self.config)
+        auth.clock = lambda: NOW
+        for _ in range(3):
+            auth.get_headers(prepared_request())
+        auth.clock = lambda: NOW + datetime.timedelta(days=1)
+        auth.get_headers(prepared_request())
+
+        self.assertEqual(2, get_signing_key.cache_info().misses)
+        self.assertEqual(2, get_signing_key.cache_info().hits)
+
+    def test_it_should_refresh_credentials_about_to_expire(self):
+        provider = Mock()
+        provider.load.side_effect = [
+            Credentials("k1", "s1", "t1", NOW + datetime.timedelta(minutes=30)),
+            Credentials("k2", "s2", "t2", NOW + datetime.timedelta(hours=2)),
+        ]
+        now = [NOW]
+        credentials = RefreshableCredentials(provider, clock=lambda: now[0])
+
+        self.assertEqual("k1", credentials.get().access_key)
+        now[0] = NOW + datetime.timedelta(minutes=20)
+        self.assertEqual("k1", credentials.get().access_key)
+        now[0] = NOW + datetime.timedelta(minutes=26)
+        self.assertEqual("k2", credentials.get().access_key)
+        self.assertEqual(2, provider.load.call_count)
+
+    def test_it_should_reload_credentials_after_the_refresh_interval(self):
+        provider = Mock(**{"load.return_value": Credentials("k", "s", None, None)})
+        now = [NOW]
+        credentials = RefreshableCredentials(provider, 60, clock=lambda: now[0])
+
+        credentials.get()
+        now[0] = NOW + datetime.timedelta(seconds=59)
+        credentials.get()
+        now[0] = NOW + datetime.timedelta(seconds=60)
+        credentials.get()
+
+        self.assertEqual(2, provider.load.call_count)
+
+    @patch.dict(
+        os.environ,
+        {
+            "AWS_ACCESS_KEY_ID": "env-key",
+            "AWS_SECRET_ACCESS_KEY": "env-secret",
+            "AWS_SESSION_TOKEN": "env-token",
+        },
+    )
+    def test_it_should_read_credentials_from_environment(self):
+        self.assertEqual(
+            Credentials("env-key", "env-secret", "env-token", None),
+            EnvironmentCredentialsProvider().load(),
+        )
+
+    @patch.dict(
+        os.environ,
+        {
+            "AWS_ACCESS_KEY_ID": "env-key",
+            "AWS_SECRET_ACCESS_KEY": "env-secret",
+            "AWS_SESSION_TOKEN": "env-token",
+            "AWS_CREDENTIAL_EXPIRATION": "2020-01-01T10:30:00Z",
+        },
+    )
+    def test_it_should_read_the_expiration_of_credentials_from_environment(self):
+        self.assertEqual(
+            datetime.datetime(2020, 1, 1, 10, 30, tzinfo=datetime.timezone.utc),
+            EnvironmentCredentialsProvider().load().expiration,
+        )
+
+    def test_it_should_reload_file_credentials_before_they_expire(self):
+        create_file(
+            "test_credentials",
+            "[default]\naws_access_key_id = k1\naws_secret_access_key = s\n"
+            "aws_session_token = t\n"
+            "aws_session_expiration = 2020-01-01T10:30:00+00:00\n",
+        )
+        now = [datetime.datetime(2020, 1, 1, 10, 0, tzinfo=datetime.timezone.utc)]
+        credentials = RefreshableCredentials(
+            FileCredentialsProvider("test_credentials"), clock=lambda: now[0]
+        )
+        self.assertEqual("k1", credentials.get().access_key)
+
+        create_file(
+            "test_credentials",
+            "[default]\naws_access_key_id = k2\naws_secret_access_key = s\n"
+            "x_security_token_expires = 2020-01-01T11:30:00\n",
+        )
+        now[0] += datetime.timedelta(minutes=20)
+        self.assertEqual("k1", credentials.get().access_key)
+        now[0] += datetime.timedelta(minutes=6)
+        self.assertEqual("k2", credentials.get().access_key)
+        self.assertEqual(
+            datetime.datetime(2020, 1, 1, 11, 30, tzinfo=datetime.timezone.utc),
+            credentials.get().expiration,
+        )
+
+    def test_it_should_raise_error_on_invalid_credentials_expiration(self):
+        self.assertRaisesWithMessage(
+            Exception,
+            "invalid credentials expiration ('tomorrow')",
+            parse_expiration,
+            "tomorrow",
+        )
+
+    def test_it_should_read_credentials_from_a_profile_of_a_credentials_file(self):
+        create_file(
+            "test_credentials",
+            "[default]\naws_access_key_id = k\naws_secret_access_key = s\n"
+            "[migration]\naws_access_key_id = mk\naws_secret_access_key = ms\n"
+            "aws_session_token = mt\n",
+        )
+        self.assertEqual(
+            Credentials("mk", "ms", "mt", None),
+            FileCredentialsProvider("test_credentials", "migration").load(),
+        )
+        self.assertRaisesWithMessage(
+            Exception,
+            "invalid credentials profile 'other' in test_credentials ('other' missing)",
+            FileCredentialsProvider("test_credentials", "other").load,
+        )
+
+    def test_it_should_raise_error_on_invalid_credentials_provider(self):
+        self.config.put("aws_credentials_provider", "other")
+        self.assertRaisesWithMessage(
+            Exception,
+            "invalid aws credentials provider ('other')",
+            get_aws_auth,
+            self.config,
+        )
@@ -0,0 +1,58 @@
+import unittest
+
+from neptune_migrate.neptune.cache import QueryCache
+
+SELECT_G1 = "SELECT ?s FROM <http://g1/> WHERE { ?s ?p ?o }"
+SELECT_G2 = "SELECT ?s FROM <http://g2/> WHERE { ?s ?p ?o }"
+SELECT_DEFAULT = "SELECT ?s WHERE { ?s ?p ?o }"
+
+
+class QueryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = QueryCache(10, max_size=2, clock=lambda: self.now)
+
+    def test_it_should_share_entries_between_queries_with_different_whitespace(
+        self,
+    ):
+        self.cache.put(QueryCache.key("url", SELECT_G1), {"a": 1})
+        self.assertEqual(
+            {"a": 1},
+            self.cache.get(QueryCache.key("url", SELECT_G1.replace(" ", "\n  "))),
+        )
+        self.assertIsNone(self.cache.get(QueryCache.key("other-url", SELECT_G1)))
+
+    def test_it_should_expire_entries_after_the_ttl(self):
+        self.cache.put(QueryCache.key("url", SELECT_G1), {"a": 1})
+        self.now = 9.9
+        self.assertIsNotNone(self.cache.get(QueryCache.key("url", SELECT_G1)))
+        self.now = 10
+        self.assertIsNone(self.cache.get(QueryCache.key("url", SELECT_G1)))
+
+    def test_it_should_evict_the_least_recently_used_entry(self):
+        self.cache.put(QueryCache.key("url", SELECT_G1), 1)
+        self.cache.put(QueryCache.key("url", SELECT_G2), 2)
+        self.cache.get(QueryCache.key("url", SELECT_G1))
+        self.cache.put(QueryCache.key("url", SELECT_DEFAULT), 3)
+
+        self.assertEqual(1, self.cache.get(QueryCache.key("url", SELECT_G1)))
+        self.assertIsNone(self.cache.get(QueryCache.key("url", SELECT_G2)))
+
+    def test_it_should_not_return_the_cached_object_itself(self):
+        self.cache.put(QueryCache.key("url", SELECT_G1), {"a": [1]})
+        self.cache.get(QueryCache.key("url", SELECT_G1))["a"].append(2)
+        self.assertEqual({"a": [1]}, self.cache.get(QueryCache.key("url", SELECT_G1)))
+
+    def test_it_should_invalidate_entries_reading_the_updated_graph(self):
+        self.cache.max_size = 10
+        for query in (SELECT_G1, SELECT_G2, SELECT_DEFAULT):
+            self.cache.put(QueryCache.key("url", query), query)
+
+        self.cache.invalidate("INSERT DATA { GRAPH <http://g1/> { <a> <b> <c> . } }")
+
+        self.assertIsNone(self.cache.get(QueryCache.key("url", SELECT_G1)))
+        self.assertIsNone(self.cache.get(QueryCache.key("url", SELECT_DEFAULT)))
+        self.assertEqual(SELECT_G2, self.cache.get(QueryCache.key("url", SELECT_G2)))
+
+        self.cache.invalidate("INSERT DATA { <a> <b> <c> . }")
+        self.assertEqual(0, len(self.cache))
@@ -0,0 +1,373 @@
+import datetime
+import gzip
+import threading
+import time
+from urllib.parse import quote_plus
+
+import requests
+from mock import MagicMock, Mock, patch
+
+from neptune_migrate.config import Config
+from neptune_migrate.neptune.client import NeptuneClient
+from tests import BaseTest
+
+
+def fake_response(content=b'{"results": {"bindings": []}}', status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.elapsed = datetime.timedelta(milliseconds=5)
+    return response
+
+
+def fake_stream(lines):
+    return MagicMock(
+        status_code=200,
+        elapsed=datetime.timedelta(milliseconds=5),
+        **{"iter_lines.return_value": iter(lines)},
+    )
+
+
+class NeptuneClientTest(BaseTest):
+    def setUp(self):
+        super(NeptuneClientTest, self).setUp()
+        self.config = Config()
+        self.config.put("aws_neptune_url", "https://fake-neptune-host.com:8182")
+        self.auth = Mock()
+
+    def test_it_should_reuse_the_same_session_between_requests(self):
+        client = NeptuneClient(self.auth, self.config)
+        self.assertIs(client.session, client.session)
+        self.assertEqual(client._sign, client.session.auth)
+
+    def test_it_should_build_a_single_session_for_concurrent_requests(self):
+        client = NeptuneClient(self.auth, self.config)
+        build_session = client._build_session
+
+        def slow_build_session():
+            time.sleep(0.01)
+            return build_session()
+
+        with patch.object(
+            client, "_build_session", side_effect=slow_build_session
+        ) as build_mock:
+            threads = [
+                threading.Thread(target=lambda: client.session) for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(1, build_mock.call_count)
+
+    def test_it_should_use_the_configured_pool_size(self):
+        self.config.put("aws_neptune_pool_size", 3)
+        client = NeptuneClient(self.auth, self.config)
+        adapter = client.session.get_adapter("https://fake-neptune-host.com:8182")
+        self.assertEqual(3, adapter._pool_maxsize)
+
+    def test_it_should_close_the_session_and_open_a_new_one_when_needed(self):
+        client = NeptuneClient(self.auth, self.config)
+        session = client.session
+        with patch.object(session, "close") as close_mock:
+            client.close()
+            close_mock.assert_called_once_with()
+        self.assertIsNot(session, client.session)
+
+    def test_it_should_send_queries_through_the_keep_alive_session(self):
+        client = NeptuneClient(self.auth, self.config)
+        response = fake_response()
+        with patch.object(client.session, "request", return_value=response) as req:
+            result = client.update_query("INSERT DATA {}")
+
+        self.assertEqual({"results": {"bindings": []}}, result)
+        kwargs = req.call_args[1]
+        self.assertEqual("https://fake-neptune-host.com:8182/sparql", kwargs["url"])
+        self.assertEqual("update=INSERT+DATA+%7B%7D", kwargs["data"])
+        self.assertNotIn("Connection", kwargs["headers"])
+
+    def test_it_should_stream_select_bindings_from_tsv_results(self):
+        client = NeptuneClient(self.auth, self.config)
+        response = fake_stream([b"?s\t?label", b'<http://a>\t"A"', b"<http://b>\t"])
+        with patch.object(client.session, "request", return_value=response) as req:
+            bindings = client.stream_query("SELECT ?s ?label WHERE { ?s ?p ?label }")
+            self.assertEqual(
+                {
+                    "s": {"type": "uri", "value": "http://a"},
+                    "label": {"type": "literal", "value": "A"},
+                },
+                next(bindings),
+            )
+            self.assertEqual(
+                [{"s": {"type": "uri", "value": "http://b"}}], list(bindings)
+            )
+
+        kwargs = req.call_args[1]
+        self.assertEqual("text/tab-separated-values", kwargs["headers"]["Accept"])
+        self.assertTrue(kwargs["stream"])
+
+    def test_it_should_stream_construct_triples_from_ntriples_results(self):
+        client = NeptuneClient(self.auth, self.config)
+        response = fake_stream([b"<http://a> <http://b> _:c ."])
+        with patch.object(client.session, "request", return_value=response) as req:
+            triples = list(
+                client.stream_query("CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }")
+            )
+
+        self.assertEqual(
+            [
+                (
+                    {"type": "uri", "value": "http://a"},
+                    {"type": "uri", "value": "http://b"},
+                    {"type": "bnode", "value": "c"},
+                )
+            ],
+            triples,
+        )
+        self.assertEqual("application/n-triples", req.call_args[1]["headers"]["Accept"])
+
+    def test_it_should_not_compress_request_bodies_by_default(self):
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session, "request", return_value=fake_response()
+        ) as req:
+            client.update_query("INSERT DATA {}")
+
+        kwargs = req.call_args[1]
+        self.assertNotIn("Content-Encoding", kwargs["headers"])
+        self.assertEqual("gzip, deflate", kwargs["headers"]["Accept-Encoding"])
+
+    def test_it_should_gzip_request_bodies_above_the_configured_threshold(self):
+        self.config.put("aws_neptune_gzip_threshold", 30)
+        client = NeptuneClient(self.auth, self.config)
+        query = "INSERT DATA { GRAPH <http://example.com/> { <a> <b> <c> . } }"
+        with patch.object(
+            client.session, "request", return_value=fake_response()
+        ) as req:
+            client.update_query("INSERT DATA {}")
+            self.assertNotIn("Content-Encoding", req.call_args[1]["headers"])
+
+            client.update_query(query)
+
+        kwargs = req.call_args[1]
+        self.assertEqual("gzip", kwargs["headers"]["Content-Encoding"])
+        self.assertEqual(
+            "update=" + quote_plus(query), gzip.decompress(kwargs["data"]).decode()
+        )
+
+    def test_it_should_use_the_timeout_configured_for_each_kind_of_operation(self):
+        self.config.put("aws_neptune_connect_timeout", 5)
+        self.config.put("aws_neptune_query_timeout", 30)
+        self.config.put("aws_neptune_update_timeout", 600)
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session, "request", return_value=fake_response()
+        ) as req:
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+            self.assertEqual((5, 30), req.call_args[1]["timeout"])
+            client.update_query("INSERT DATA {}")
+            self.assertEqual((5, 600), req.call_args[1]["timeout"])
+
+    def test_it_should_not_cache_read_results_by_default(self):
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session, "request", return_value=fake_response()
+        ) as req:
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+
+        self.assertEqual(2, req.call_count)
+
+    def test_it_should_cache_read_results_until_an_update_on_the_same_graph(self):
+        self.config.put("aws_neptune_cache_ttl", 60)
+        client = NeptuneClient(self.auth, self.config)
+        query = "SELECT * FROM <http://g/> WHERE { ?s ?p ?o }"
+        response = fake_response()
+        with patch.object(client.session, "request", return_value=response) as req:
+            client.execute_query(query)
+            self.assertEqual({"results": {"bindings": []}}, client.execute_query(query))
+            self.assertEqual(1, req.call_count)
+
+            client.update_query("INSERT DATA { GRAPH <http://other/> { <a> <b> <c> } }")
+            client.execute_query(query)
+            self.assertEqual(2, req.call_count)
+
+            client.update_query("INSERT DATA { GRAPH <http://g/> { <a> <b> <c> } }")
+            client.execute_query(query)
+            self.assertEqual(4, req.call_count)
+
+    def test_it_should_record_metrics_of_every_request(self):
+        hook = Mock()
+        self.config.put("aws_neptune_metrics_hook", hook)
+        self.config.put("aws_neptune_retry_base_delay", 0)
+        client = NeptuneClient(self.auth, self.config)
+        responses = [fake_response(b"{}", 503), fake_response(b"{}")]
+        with patch.object(client.session, "request", side_effect=responses):
+            client.update_query("INSERT DATA {}")
+
+        self.assertEqual(2, client.metrics.count)
+        self.assertEqual(1, client.metrics.retries)
+        self.assertEqual({503: 1, 200: 1}, dict(client.metrics.statuses))
+        record = hook.call_args[0][0]
+        self.assertEqual("update", record.operation)
+        self.assertEqual(200, record.status)
+        self.assertEqual(len("update=INSERT+DATA+%7B%7D"), record.request_bytes)
+        self.assertEqual(2, record.response_bytes)
+        self.assertEqual(0.005, record.wait_time)
+
+    def test_it_should_measure_how_long_signing_takes(self):
+        client = NeptuneClient(self.auth, self.config)
+        request = Mock()
+        self.assertEqual(self.auth.return_value, client._sign(request))
+        self.auth.assert_called_once_with(request)
+        self.assertGreaterEqual(client._local.sign_time, 0)
+
+    def test_it_should_ask_and_decode_the_configured_result_format(self):
+        self.config.put("aws_neptune_result_format", "tsv")
+        client = NeptuneClient(self.auth, self.config)
+        response = fake_response(b"?s\n<http://a>\n")
+        with patch.object(client.session, "request", return_value=response) as req:
+            result = client.execute_query("SELECT ?s WHERE { ?s ?p ?o }")
+
+        self.assertEqual(
+            {
+                "head": {"vars": ["s"]},
+                "results": {"bindings": [{"s": {"type": "uri", "value": "http://a"}}]},
+            },
+            result,
+        )
+        self.assertEqual(
+            "text/tab-separated-values", req.call_args[1]["headers"]["Accept"]
+        )
+
+    def test_it_should_ask_construct_results_as_ntriples_and_ask_results_as_json(self):
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session,
+            "request",
+            side_effect=[fake_response(b""), fake_response(b'{"boolean": true}')],
+        ) as req:
+            client.execute_query(
+                "CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }", result_format="csv"
+            )
+            self.assertEqual(
+                "application/n-triples", req.call_args[1]["headers"]["Accept"]
+            )
+            self.assertEqual(
+                {"boolean": True},
+                client.execute_query("ASK { ?s ?p ?o }", result_format="csv"),
+            )
+            self.assertNotIn("Accept", req.call_args[1]["headers"])
+
+    def test_it_should_not_accept_unknown_result_formats(self):
+        self.config.put("aws_neptune_result_format", "xml")
+        self.assertRaises(Exception, NeptuneClient, self.auth, self.config)
+
+    def test_it_should_post_ntriples_to_the_graph_store_endpoint(self):
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session, "request", return_value=fake_response(b"")
+        ) as req:
+            client.post_ntriples("http://g", "<http://a> <http://b> <http://c> .\n")
+
+        kwargs = req.call_args[1]
+        self.assertEqual(
+            "https://fake-neptune-host.com:8182/sparql/gsp/", kwargs["url"]
+        )
+        self.assertEqual({"graph": "http://g"}, kwargs["params"])
+        self.assertEqual("application/n-triples", kwargs["headers"]["Content-Type"])
+        self.assertEqual("<http://a> <http://b> <http://c> .\n", kwargs["data"])
+        self.assertEqual(1, client.metrics.histograms[("gsp", "total_time")].count)
+
+    def test_it_should_send_reads_to_the_readers_and_writes_to_the_writer(self):
+        self.config.put("aws_neptune_reader_urls", "https://r1:8182,https://r2:8182")
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session, "request", return_value=fake_response()
+        ) as req:
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+            client.update_query("INSERT DATA {}")
+
+        self.assertEqual(
+            [
+                "https://r1:8182/sparql",
+                "https://r2:8182/sparql",
+                "https://fake-neptune-host.com:8182/sparql",
+            ],
+            [c[1]["url"] for c in req.call_args_list],
+        )
+
+    def test_it_should_retry_reads_on_another_reader_when_one_is_down(self):
+        self.config.put(
+            "aws_neptune_reader_urls", ["https://r1:8182", "https://r2:8182"]
+        )
+        self.config.put("aws_neptune_retry_base_delay", 0)
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session,
+            "request",
+            side_effect=[requests.ConnectionError(), fake_response(), fake_response()],
+        ) as req:
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+
+        self.assertEqual(
+            [
+                "https://r1:8182/sparql",
+                "https://r2:8182/sparql",
+                "https://r2:8182/sparql",
+            ],
+            [c[1]["url"] for c in req.call_args_list],
+        )
+        self.assertTrue(client.readers.is_down("https://r1:8182"))
+
+    def test_it_should_not_retry_an_insert_of_blank_nodes_that_timed_out(self):
+        self.config.put("aws_neptune_retry_base_delay", 0)
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session,
+            "request",
+            side_effect=[
+                requests.ReadTimeout(),
+                requests.ReadTimeout(),
+                fake_response(b"{}"),
+            ],
+        ) as req:
+            self.assertRaises(
+                requests.ReadTimeout,
+                client.update_query,
+                "INSERT DATA { GRAPH <g> { <a> <b> [ <c> 1 ] } }",
+            )
+            client.update_query("INSERT DATA { GRAPH <g> { <a> <b> <c> } }")
+
+        self.assertEqual(3, req.call_count)
+
+    def test_it_should_retry_reads_whose_response_timed_out(self):
+        self.config.put("aws_neptune_retry_base_delay", 0)
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(
+            client.session,
+            "request",
+            side_effect=[requests.ReadTimeout(), fake_response()],
+        ) as req:
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+
+        self.assertEqual(2, req.call_count)
+        self.assertEqual(1, client.metrics.retries)
+
+    @patch("neptune_migrate.neptune.client.time.sleep")
+    def test_it_should_wait_for_replication_before_reading_its_writes(self, sleep_mock):
+        self.config.put("aws_neptune_reader_urls", "https://r1:8182")
+        self.config.put("aws_neptune_read_your_writes_wait", 0.5)
+        client = NeptuneClient(self.auth, self.config)
+        with patch.object(client.session, "request", return_value=fake_response()):
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+            sleep_mock.assert_not_called()
+
+            client.update_query("INSERT DATA {}")
+            client.execute_query("SELECT * WHERE { ?s ?p ?o }")
+
+        wait = sleep_mock.call_args[0][0]
+        self.assertTrue(0 < wait <= 0.5)
@@ -0,0 +1,52 @@
+import unittest
+
+from mock import Mock
+
+from neptune_migrate.neptune.endpoints import ReaderPool, parse_urls
+
+
+class ReaderPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.health_check = Mock(return_value=True)
+        self.pool = ReaderPool(
+            ["https://r1", "https://r2"],
+            self.health_check,
+            health_check_interval=30,
+            clock=lambda: self.now,
+        )
+
+    def test_it_should_parse_comma_separated_urls(self):
+        self.assertEqual(
+            ["https://r1", "https://r2"], parse_urls("https://r1/, https://r2")
+        )
+        self.assertEqual(["https://r1"], parse_urls(["https://r1"]))
+        self.assertEqual([], parse_urls(None))
+
+    def test_it_should_round_robin_between_readers(self):
+        self.assertEqual(
+            ["https://r1", "https://r2", "https://r1"],
+            [self.pool.get() for _ in range(3)],
+        )
+
+    def test_it_should_skip_readers_marked_down_until_a_health_check_passes(self):
+        self.pool.mark_down("https://r1")
+        self.assertEqual(
+            ["https://r2", "https://r2"], [self.pool.get() for _ in range(2)]
+        )
+        self.health_check.assert_not_called()
+
+        self.now = 31
+        self.assertEqual("https://r1", self.pool.get())
+        self.health_check.assert_called_once_with("https://r1")
+        self.assertFalse(self.pool.is_down("https://r1"))
+
+    def test_it_should_return_none_when_every_reader_is_down(self):
+        self.health_check.return_value = False
+        self.pool.mark_down("https://r1")
+        self.pool.mark_down("https://r2")
+        self.now = 31
+        self.assertIsNone(self.pool.get())
+        self.assertEqual(2, self.health_check.call_count)
+        self.assertIsNone(self.pool.get())
+        self.assertEqual(2, self.health_check.call_count)
@@ -0,0 +1,118 @@
+import unittest
+
+from neptune_migrate.neptune.formats import (
+    decode_csv,
+    decode_ntriples,
+    decode_tsv,
+    parse_ntriples_line,
+    parse_term,
+    parse_tsv_header,
+    parse_tsv_row,
+)
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+
+class FormatsTest(unittest.TestCase):
+    def test_it_should_parse_rdf_terms_in_sparql_json_structure(self):
+        self.assertEqual(
+            {"type": "uri", "value": "http://example.com/a"},
+            parse_term("<http://example.com/a>"),
+        )
+        self.assertEqual({"type": "bnode", "value": "b0"}, parse_term("_:b0"))
+        self.assertEqual(
+            {"type": "literal", "value": 'say "hi"\n', "xml:lang": "en"},
+            parse_term('"say \\"hi\\"\\n"@en'),
+        )
+        self.assertEqual(
+            {"type": "literal", "value": "2012", "datatype": XSD + "gYear"},
+            parse_term('"2012"^^<%sgYear>' % XSD),
+        )
+        self.assertEqual(
+            {"type": "literal", "value": "café"}, parse_term('"caf\\u00E9"')
+        )
+
+    def test_it_should_parse_abbreviated_tsv_numbers_and_booleans(self):
+        self.assertEqual(XSD + "integer", parse_term("42")["datatype"])
+        self.assertEqual(XSD + "decimal", parse_term("4.2")["datatype"])
+        self.assertEqual(XSD + "double", parse_term("4.2e1")["datatype"])
+        self.assertEqual(XSD + "boolean", parse_term("true")["datatype"])
+
+    def test_it_should_parse_tsv_rows_skipping_unbound_variables(self):
+        variables = parse_tsv_header("?version\t?origen")
+        self.assertEqual(["version", "origen"], variables)
+        self.assertEqual(
+            {"version": {"type": "literal", "value": "1.0"}},
+            parse_tsv_row('"1.0"\t', variables),
+        )
+
+    def test_it_should_parse_ntriples_lines(self):
+        self.assertEqual(
+            (
+                {"type": "uri", "value": "http://a"},
+                {"type": "uri", "value": "http://b"},
+                {"type": "literal", "value": "c d", "xml:lang": "pt-BR"},
+            ),
+            parse_ntriples_line('<http://a> <http://b> "c d"@pt-BR .'),
+        )
+        self.assertIsNone(parse_ntriples_line("# comment"))
+        self.assertIsNone(parse_ntriples_line(""))
+        self.assertRaises(ValueError, parse_ntriples_line, "<http://a> .")
+
+    def test_it_should_decode_tsv_results_in_sparql_json_structure(self):
+        self.assertEqual(
+            {
+                "head": {"vars": ["s", "n"]},
+                "results": {
+                    "bindings": [
+                        {
+                            "s": {"type": "uri", "value": "http://a"},
+                            "n": {
+                                "type": "literal",
+                                "value": "1",
+                                "datatype": XSD + "integer",
+                            },
+                        },
+                        {"s": {"type": "bnode", "value": "b"}},
+                    ]
+                },
+            },
+            decode_tsv("?s\t?n\n<http://a>\t1\n_:b\t\n"),
+        )
+        self.assertEqual(
+            {"head": {"vars": []}, "results": {"bindings": []}}, decode_tsv("")
+        )
+
+    def test_it_should_decode_csv_results_guessing_term_types(self):
+        self.assertEqual(
+            {
+                "head": {"vars": ["s", "label"]},
+                "results": {
+                    "bindings": [
+                        {
+                            "s": {"type": "uri", "value": "http://a"},
+                            "label": {"type": "literal", "value": 'a, "b"\nc'},
+                        },
+                        {"s": {"type": "bnode", "value": "b"}},
+                    ]
+                },
+            },
+            decode_csv('s,label\r\nhttp://a,"a, ""b""\nc"\r\n_:b,\r\n'),
+        )
+
+    def test_it_should_decode_ntriples_results_as_triple_bindings(self):
+        self.assertEqual(
+            {
+                "head": {"vars": ["subject", "predicate", "object"]},
+                "results": {
+                    "bindings": [
+                        {
+                            "subject": {"type": "uri", "value": "http://a"},
+                            "predicate": {"type": "uri", "value": "http://b"},
+                            "object": {"type": "literal", "value": "c"},
+                        }
+                    ]
+                },
+            },
+            decode_ntriples('# comment\n<http://a> <http://b> "c" .\n'),
+        )
@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse
+
+from mock import Mock
+
+from neptune_migrate.config import Config
+from neptune_migrate.neptune.auth import get_aws_auth
+from neptune_migrate.neptune.client import NeptuneClient
+from neptune_migrate.neptune.loader import LocalDirectoryStaging, NeptuneLoader
+from tests import BaseTest, create_file, delete_files
+
+
+class LoaderStandIn(BaseHTTPRequestHandler):
+    """Minimal local stand-in of the Neptune bulk loader API. Jobs are
+    reported in progress on the first status check and then completed, or
+    failed when the staged file contains 'invalid'."""
+
+    jobs = {}
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, body):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append((self.path, body, self.headers.get("Authorization")))
+        load_id = "load-%d" % len(self.jobs)
+        with open(urlparse(body["source"]).path) as f:
+            content = f.read()
+        self.jobs[load_id] = {"checks": 0, "content": content}
+        self._reply({"status": "200 OK", "payload": {"loadId": load_id}})
+
+    def do_GET(self):
+        job = self.jobs[urlparse(self.path).path.split("/")[-1]]
+        job["checks"] += 1
+        records = len(job["content"].strip().splitlines())
+        payload = {"overallStatus": {"status": "LOAD_IN_PROGRESS"}}
+        if job["checks"] > 1 and "invalid" in job["content"]:
+            payload = {
+                "overallStatus": {"status": "LOAD_FAILED", "parsingErrors": 1},
+                "errors": {
+                    "errorLogs": [
+                        {"errorCode": "PARSING_ERROR", "errorMessage": "bad line"}
+                    ]
+                },
+            }
+        elif job["checks"] > 1:
+            payload = {
+                "overallStatus": {"status": "LOAD_COMPLETED", "totalRecords": records}
+            }
+        self._reply({"status": "200 OK", "payload": payload})
+
+
+class NeptuneLoaderTest(BaseTest):
+    def setUp(self):
+        super(NeptuneLoaderTest, self).setUp()
+        LoaderStandIn.jobs = {}
+        LoaderStandIn.requests = []
+        self.server = HTTPServer(("127.0.0.1", 0), LoaderStandIn)
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        os.makedirs("loader_staging", exist_ok=True)
+        self.config = Config(
+            {
+                "aws_access_key": "a-fake-access-key",
+                "aws_secret_access_key": "a-fake-secret-access-key",
+                "aws_region": "sa-east-1",
+                "aws_neptune_url": "http://127.0.0.1:%d" % self.server.server_port,
+                "aws_neptune_loader_staging": "loader_staging",
+                "database_graph": "http://example.com/graph",
+            }
+        )
+        create_file("data_1.ttl", "<http://a> <http://b> <http://c> .\n")
+        create_file("data_2.ttl", "invalid\n")
+
+    def tearDown(self):
+        super(NeptuneLoaderTest, self).tearDown()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree("loader_staging")
+        delete_files("data_*.ttl")
+
+    def test_it_should_load_files_through_the_loader_api_and_report_results(self):
+        client = NeptuneClient(get_aws_auth(self.config), self.config)
+        sleep = Mock()
+        loader = NeptuneLoader(client, self.config, sleep=sleep)
+
+        results = loader.load(["data_1.ttl", "data_2.ttl"])
+
+        self.assertEqual(
+            {
+                "data_1.ttl": (
+                    "Load load-0: LOAD_COMPLETED (1 records, 0 parsing errors, "
+                    "0 insert errors)",
+                    "",
+                ),
+                "data_2.ttl": (
+                    "",
+                    "Load load-1: LOAD_FAILED (0 records, 1 parsing errors, "
+                    "0 insert errors) PARSING_ERROR: bad line",
+                ),
+            },
+            results,
+        )
+        sleep.assert_called_once_with(5)
+        path, body, authorization = LoaderStandIn.requests[0]
+        self.assertEqual("/loader", path)
+        self.assertEqual("turtle", body["format"])
+        self.assertEqual(
+            {"namedGraphUri": "http://example.com/graph"}, body["parserConfiguration"]
+        )
+        self.assertTrue(authorization.startswith("AWS4-HMAC-SHA256"))
+        self.assertEqual([], os.listdir("loader_staging"))
+        self.assertTrue(os.path.exists("data_1.ttl"))
+
+    def test_it_should_stage_files_with_the_configured_base_uri(self):
+        staging = LocalDirectoryStaging("loader_staging", "http://127.0.0.1/files/")
+
+        source = staging.stage("data_1.ttl")
+
+        self.assertEqual("http://127.0.0.1/files/data_1.ttl", source)
+        self.assertEqual(["data_1.ttl"], os.listdir("loader_staging"))
+        staging.unstage(source)
+        self.assertEqual([], os.listdir("loader_staging"))
+
+    def test_it_should_report_files_whose_load_could_not_start(self):
+        client = Mock(**{"request.side_effect": Exception("forbidden")})
+        loader = NeptuneLoader(client, self.config, sleep=Mock())
+
+        self.assertEqual(
+            {"data_1.ttl": ("", "could not start load: forbidden")},
+            loader.load(["data_1.ttl"]),
+        )
+        self.assertEqual([], os.listdir("loader_staging"))
@@ -0,0 +1,64 @@
+import unittest
+
+from mock import Mock
+
+from neptune_migrate.neptune.metrics import (
+    TIME_BUCKETS,
+    Histogram,
+    RequestMetrics,
+    RequestRecord,
+)
+
+
+def record(operation="update", status=200, total_time=0.03, error=None):
+    return RequestRecord(operation, status, 100, 20, 0.001, 0.02, total_time, error)
+
+
+class MetricsTest(unittest.TestCase):
+    def test_it_should_estimate_percentiles_from_histogram_buckets(self):
+        histogram = Histogram(TIME_BUCKETS)
+        for value in [0.0015] * 98 + [0.3, 0.5]:
+            histogram.add(value)
+
+        self.assertEqual(100, histogram.count)
+        self.assertEqual(0.002, histogram.percentile(50))
+        self.assertEqual(0.5, histogram.percentile(100))
+        self.assertEqual(0.5, histogram.max)
+        self.assertAlmostEqual(0.00947, histogram.mean)
+
+    def test_it_should_count_statuses_errors_and_retries(self):
+        metrics = RequestMetrics()
+        metrics.record(record())
+        metrics.record(record(status=500))
+        metrics.record(record(status=None, error="ConnectionError"))
+        metrics.record_retry()
+
+        self.assertEqual(3, metrics.count)
+        self.assertEqual(1, metrics.retries)
+        self.assertEqual({200: 1, 500: 1, "ConnectionError": 1}, dict(metrics.statuses))
+        self.assertEqual((3, 2, 1), metrics.get_counts())
+
+    def test_it_should_pass_every_record_to_the_hooks(self):
+        hook = Mock()
+        metrics = RequestMetrics()
+        metrics.add_hook(hook)
+
+        metrics.record(record())
+
+        hook.assert_called_once_with(record())
+
+    def test_it_should_summarize_requests_per_operation(self):
+        metrics = RequestMetrics()
+        metrics.record(record())
+        metrics.record(record(operation="query", total_time=0.01))
+
+        self.assertEqual(
+            "Neptune requests: 2 (200: 2), 0 retries\n"
+            "- query: 1 requests in 0.01s; latency mean 0.010s p50 <0.010s "
+            "p99 <0.010s max 0.010s; waiting 0.02s, signing 0.00s; "
+            "100 bytes sent, 20 bytes received\n"
+            "- update: 1 requests in 0.03s; latency mean 0.030s p50 <0.030s "
+            "p99 <0.030s max 0.030s; waiting 0.02s, signing 0.00s; "
+            "100 bytes sent, 20 bytes received",
+            metrics.summary(),
+        )
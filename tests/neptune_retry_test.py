@@ -0,0 +1,152 @@
+import unittest
+
+import requests
+from mock import Mock, call, patch
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from neptune_migrate.config import Config
+from neptune_migrate.neptune.retry import (
+    RetryPolicy,
+    get_retry_after,
+    is_ambiguous,
+    is_oversized,
+    is_throttling,
+)
+
+
+def http_error(status_code, body=None, headers=None):
+    response = Mock(status_code=status_code, headers=headers or {})
+    response.json.return_value = body or {}
+    return requests.HTTPError("%s error" % status_code, response=response)
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.sleep = Mock()
+        self.policy = RetryPolicy(max_retries=3, base_delay=1, sleep=self.sleep)
+
+    def test_it_should_classify_throttling_and_transient_errors_as_retryable(self):
+        self.assertTrue(RetryPolicy.is_retryable(http_error(429)))
+        self.assertTrue(RetryPolicy.is_retryable(http_error(503)))
+        self.assertTrue(
+            RetryPolicy.is_retryable(
+                http_error(500, {"code": "ConcurrentModificationException"})
+            )
+        )
+        self.assertTrue(
+            RetryPolicy.is_retryable(http_error(500, {"code": "ThrottlingException"}))
+        )
+        self.assertTrue(RetryPolicy.is_retryable(requests.ConnectionError()))
+        self.assertTrue(RetryPolicy.is_retryable(requests.ConnectTimeout()))
+
+    def test_it_should_detect_requests_too_big_or_too_slow_to_be_processed(self):
+        self.assertTrue(is_oversized(http_error(413)))
+        self.assertTrue(
+            is_oversized(http_error(500, {"code": "TimeLimitExceededException"}))
+        )
+        self.assertFalse(is_oversized(requests.ReadTimeout()))
+        self.assertFalse(is_oversized(requests.ConnectTimeout()))
+        self.assertFalse(is_oversized(http_error(429)))
+        self.assertTrue(RetryPolicy.is_retryable(requests.ReadTimeout()))
+
+    def test_it_should_detect_requests_the_server_may_have_processed(self):
+        self.assertTrue(is_ambiguous(requests.ReadTimeout()))
+        self.assertTrue(
+            is_ambiguous(
+                requests.ConnectionError(
+                    ProtocolError("aborted", ConnectionResetError())
+                )
+            )
+        )
+        self.assertFalse(is_ambiguous(requests.ConnectTimeout()))
+        self.assertFalse(
+            is_ambiguous(
+                requests.ConnectionError(
+                    MaxRetryError(None, "/", NewConnectionError(None, "refused"))
+                )
+            )
+        )
+        self.assertFalse(is_ambiguous(http_error(503)))
+
+    def test_it_should_not_retry_requests_that_may_have_been_processed_twice(self):
+        function = Mock(side_effect=[requests.ReadTimeout(), "ok"])
+        self.assertRaises(
+            requests.ReadTimeout, self.policy.call, function, idempotent=False
+        )
+        self.assertEqual(1, function.call_count)
+
+        function = Mock(side_effect=[http_error(503), "ok"])
+        self.assertEqual("ok", self.policy.call(function, idempotent=False))
+
+        function = Mock(side_effect=[requests.ReadTimeout(), "ok"])
+        self.assertEqual("ok", self.policy.call(function))
+
+    def test_it_should_detect_throttling(self):
+        self.assertTrue(is_throttling(http_error(429)))
+        self.assertTrue(is_throttling(http_error(400, {"code": "ThrottlingException"})))
+        self.assertFalse(is_throttling(http_error(500)))
+        self.assertFalse(is_throttling(requests.ConnectionError()))
+
+    def test_it_should_classify_other_errors_as_fatal(self):
+        self.assertFalse(
+            RetryPolicy.is_retryable(
+                http_error(400, {"code": "MalformedQueryException"})
+            )
+        )
+        self.assertFalse(RetryPolicy.is_retryable(http_error(403)))
+        self.assertFalse(RetryPolicy.is_retryable(Exception("boom")))
+
+    @patch("neptune_migrate.neptune.retry.random.uniform", side_effect=lambda a, b: b)
+    def test_it_should_retry_with_capped_exponential_backoff(self, uniform_mock):
+        self.policy.max_delay = 3
+        function = Mock(side_effect=[http_error(429)] * 3 + ["ok"])
+        on_retry = Mock()
+
+        self.assertEqual("ok", self.policy.call(function, "query", on_retry=on_retry))
+        self.assertEqual([call(1), call(2), call(3)], self.sleep.call_args_list)
+        self.assertEqual(3, on_retry.call_count)
+        attempt, error, delay = on_retry.call_args[0]
+        self.assertEqual((3, 429, 3), (attempt, error.response.status_code, delay))
+
+    def test_it_should_give_up_after_the_maximum_number_of_retries(self):
+        error = http_error(503)
+        function = Mock(side_effect=error)
+
+        with self.assertRaises(requests.HTTPError) as e:
+            self.policy.call(function)
+
+        self.assertIs(error, e.exception)
+        self.assertEqual(4, function.call_count)
+
+    def test_it_should_not_retry_fatal_errors(self):
+        function = Mock(side_effect=http_error(400))
+
+        self.assertRaises(requests.HTTPError, self.policy.call, function)
+        self.assertEqual(1, function.call_count)
+        self.sleep.assert_not_called()
+
+    def test_it_should_respect_retry_after_header(self):
+        function = Mock(side_effect=[http_error(429, headers={"Retry-After": "7"}), 1])
+
+        self.policy.call(function)
+
+        self.sleep.assert_called_once_with(7.0)
+
+    def test_it_should_parse_retry_after_http_dates(self):
+        response = Mock(headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        self.assertEqual(0, get_retry_after(response))
+        self.assertIsNone(get_retry_after(Mock(headers={})))
+
+    def test_it_should_read_settings_from_config(self):
+        policy = RetryPolicy.from_config(
+            Config(
+                {
+                    "aws_neptune_max_retries": 7,
+                    "aws_neptune_retry_base_delay": 0.5,
+                    "aws_neptune_retry_max_delay": 10,
+                }
+            )
+        )
+        self.assertEqual(7, policy.max_retries)
+        self.assertEqual(0.5, policy.base_delay)
+        self.assertEqual(10, policy.max_delay)
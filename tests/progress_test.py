@@ -0,0 +1,98 @@
+import time
+import unittest
+
+from mock import Mock, patch
+
+from neptune_migrate.estimate import count_triples
+from neptune_migrate.neptune.metrics import RequestMetrics, RequestRecord
+from neptune_migrate.progress import Progress
+
+INSERT = "INSERT DATA { GRAPH <g> { <http://a> <http://b> <http://c> . } };"
+INSERT_TWO = "INSERT DATA { GRAPH <g> { <http://a> <http://b> 1 ; <http://c> 2 . } };"
+
+
+def record(metrics, status):
+    metrics.record(RequestRecord("update", status, 0, 0, 0, 0, 0, None))
+
+
+class ProgressTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.metrics = RequestMetrics()
+        # requests sent before the migration are not reported
+        record(self.metrics, 200)
+
+    def clock(self):
+        return self.now
+
+    def test_it_should_report_statements_triples_requests_and_eta(self):
+        progress = Progress(
+            Mock(), self.metrics, [INSERT, INSERT_TWO, INSERT, INSERT], clock=self.clock
+        )
+        progress.record([0, 1])
+        record(self.metrics, 200)
+        record(self.metrics, 500)
+        self.metrics.record_retry()
+        self.now += 4
+
+        self.assertEqual(
+            "Progress: 2 of 4 statements (50.0%), 3 of 5 triples, 0.5 requests/s, "
+            "1 errors, 1 retries, ETA 0:00:04",
+            progress.summary(),
+        )
+
+    def test_it_should_not_estimate_the_time_left_before_any_statement(self):
+        progress = Progress(Mock(), self.metrics, [INSERT], clock=self.clock)
+        self.now += 1
+        self.assertTrue(progress.summary().endswith(", ETA unknown"))
+
+    def test_it_should_report_without_totals_when_they_are_unknown(self):
+        progress = Progress(Mock(), self.metrics, clock=self.clock)
+        progress.add(INSERT_TWO)
+        progress.record([0])
+        self.now += 2
+
+        self.assertEqual(
+            "Progress: 1 statements, 2 triples, 0.0 requests/s, 0 errors, 0 retries",
+            progress.summary(),
+        )
+
+    @patch("neptune_migrate.progress.count_triples", side_effect=count_triples)
+    def test_it_should_count_triples_before_statements_are_applied(
+        self, count_triples_mock
+    ):
+        progress = Progress(
+            Mock(),
+            self.metrics,
+            [INSERT, INSERT_TWO, INSERT_TWO],
+            clock=self.clock,
+            applied={1},
+        )
+        self.assertEqual(2, count_triples_mock.call_count)
+        self.assertEqual((2, 3), (progress.total_statements, progress.total_triples))
+
+        progress.record([0, 2])
+        self.assertEqual(2, count_triples_mock.call_count)
+        self.assertEqual((2, 3), (progress.statements, progress.triples))
+
+    def test_it_should_report_every_interval_and_the_final_figures(self):
+        report = Mock()
+        progress = Progress(report, self.metrics, [INSERT], interval=0.01)
+        progress.start()
+        time.sleep(0.05)
+        progress.record([0])
+        progress.stop()
+
+        self.assertTrue(report.call_count >= 2)
+        report.assert_called_with(progress.summary(), "BLUE", log_level_limit=1)
+        self.assertTrue(report.call_args[0][0].startswith("Progress: 1 of 1"))
+
+    def test_it_should_not_report_the_final_figures_when_nothing_was_reported(
+        self,
+    ):
+        report = Mock()
+        progress = Progress(report, self.metrics, [INSERT], interval=60)
+        progress.start()
+        progress.stop()
+
+        self.assertFalse(report.called)
@@ -0,0 +1,41 @@
+import unittest
+
+from neptune_migrate.sparql import get_graphs, get_query_form
+
+
+class SparqlTest(unittest.TestCase):
+    def test_it_should_detect_the_form_of_read_queries(self):
+        self.assertEqual("SELECT", get_query_form("select ?s where { ?s ?p ?o }"))
+        self.assertEqual(
+            "CONSTRUCT",
+            get_query_form(
+                "prefix owl: <http://www.w3.org/2002/07/owl#>\n"
+                "PREFIX : <http://example.com/>\n"
+                "CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }"
+            ),
+        )
+        self.assertEqual("ASK", get_query_form("BASE <http://a/> ASK { ?s ?p ?o }"))
+        self.assertEqual("DESCRIBE", get_query_form("DESCRIBE <http://a/>"))
+
+    def test_it_should_consider_anything_else_an_update(self):
+        self.assertEqual("UPDATE", get_query_form("INSERT DATA { <a> <b> <c> . }"))
+        self.assertEqual(
+            "UPDATE", get_query_form("WITH <g> DELETE { ?s ?p ?o } WHERE { ?s ?p ?o }")
+        )
+
+    def test_it_should_find_the_graphs_used_by_a_query(self):
+        self.assertEqual(
+            {"http://m/", "http://n/"},
+            get_graphs(
+                "SELECT * FROM <http://m/> FROM NAMED <http://n/> WHERE { ?s ?p ?o }"
+            ),
+        )
+        self.assertEqual(
+            {"http://g/"},
+            get_graphs("INSERT DATA { GRAPH <http://g/> { <a> <b> <c> } }"),
+        )
+        self.assertEqual(
+            {"http://g/"},
+            get_graphs("WITH <http://g/> DELETE { <a> <b> <c> } WHERE { <a> <b> <c> }"),
+        )
+        self.assertEqual(set(), get_graphs("SELECT * WHERE { ?s ?p ?o }"))
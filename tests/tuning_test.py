@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from neptune_migrate.config import Config
+from neptune_migrate.tuning import AdaptiveController, TuningStore
+
+
+class AdaptiveControllerTest(unittest.TestCase):
+    def setUp(self):
+        self.controller = AdaptiveController(
+            batch_size=4,
+            concurrency=2,
+            max_batch_size=30,
+            max_concurrency=3,
+            target_latency=1.0,
+            window=2,
+        )
+
+    def test_it_should_grow_additively_while_latency_is_healthy(self):
+        self.controller.record(0.5)
+        self.assertEqual(
+            (4, 2), (self.controller.batch_size, self.controller.concurrency)
+        )
+        self.controller.record(0.5)
+        self.assertEqual(
+            (14, 3), (self.controller.batch_size, self.controller.concurrency)
+        )
+        for _ in range(4):
+            self.controller.record(0.5)
+        self.assertEqual(
+            (30, 3), (self.controller.batch_size, self.controller.concurrency)
+        )
+
+    def test_it_should_halve_when_p99_latency_is_above_target(self):
+        self.controller.record(0.5)
+        self.controller.record(2.0)
+        self.assertEqual(
+            (2, 1), (self.controller.batch_size, self.controller.concurrency)
+        )
+
+    def test_it_should_halve_at_once_on_failures(self):
+        self.controller.record(0.5)
+        self.controller.record_failure()
+        self.assertEqual(
+            (2, 1), (self.controller.batch_size, self.controller.concurrency)
+        )
+        self.controller.record(0.5)
+        self.assertEqual(
+            (2, 1), (self.controller.batch_size, self.controller.concurrency)
+        )
+
+    def test_it_should_not_grow_again_up_to_an_oversized_batch(self):
+        self.controller.record_oversized(20)
+        self.assertEqual(4, self.controller.batch_size)
+        self.assertEqual(19, self.controller.max_batch_size)
+
+    def test_it_should_start_from_a_saved_state(self):
+        config = Config()
+        config.put("execution_batch_size", 5)
+        config.put("execution_max_concurrency", 8)
+        self.assertEqual(
+            {"batch_size": 5, "concurrency": 1},
+            AdaptiveController.from_config(config).state(),
+        )
+        controller = AdaptiveController.from_config(
+            config, {"batch_size": 50, "concurrency": 12}
+        )
+        self.assertEqual({"batch_size": 50, "concurrency": 8}, controller.state())
+
+
+class TuningStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.filename = tempfile.mktemp()
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_it_should_save_the_state_of_each_endpoint(self):
+        store = TuningStore(self.filename)
+        self.assertIsNone(store.load("https://a"))
+        store.save("https://a", {"batch_size": 10, "concurrency": 2})
+        store.save("https://b", {"batch_size": 1, "concurrency": 1})
+        self.assertEqual(
+            {"batch_size": 10, "concurrency": 2},
+            TuningStore(self.filename).load("https://a"),
+        )
+
+    def test_it_should_keep_the_state_of_endpoints_saved_at_once(self):
+        threads = [
+            threading.Thread(
+                target=TuningStore(self.filename).save,
+                args=("https://%d" % i, {"batch_size": i, "concurrency": 1}),
+            )
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        store = TuningStore(self.filename)
+        for i in range(8):
+            self.assertEqual(i, store.load("https://%d" % i)["batch_size"])
+
+    def test_it_should_ignore_an_unreadable_file(self):
+        with open(self.filename, "w") as f:
+            f.write("not json")
+        self.assertIsNone(TuningStore(self.filename).load("https://a"))
@@ -2,17 +2,53 @@
 import datetime
 import os
 import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
 
-from mock import MagicMock, Mock, call, patch
+import requests
+from mock import ANY, MagicMock, Mock, call, patch
 from rdflib.graph import ConjunctiveGraph
 
 from neptune_migrate.config import Config
 from neptune_migrate.core.exceptions import MigrationException
+from neptune_migrate.execution import align_rollback_statements
+from neptune_migrate.fanout import SharedResults
 from neptune_migrate.main import Virtuoso
 from neptune_migrate.neptune.client import NeptuneClient
+from neptune_migrate.neptune.loader import NeptuneLoader
+from neptune_migrate.tuning import TuningStore
 from tests import BaseTest, create_file, delete_files
 
+# prints the hash of the plan of a migration, run in processes with
+# different hash seeds
+PLAN_HASH_SCRIPT = """
+from neptune_migrate.checkpoint import plan_hash
+from neptune_migrate.config import Config
+from neptune_migrate.virtuoso import Virtuoso
+
+config = Config()
+for key in ("database_host", "database_user", "database_password",
+            "database_port", "database_endpoint", "database_ontology",
+            "database_migrations_dir", "aws_access_key",
+            "aws_secret_access_key", "aws_region"):
+    config.put(key, "x")
+config.put("database_graph", "http://example.com/graph")
+config.put("migration_graph", "http://example.com/migration/")
+config.put("virtuoso_dirs_allowed", "/tmp")
+config.put("aws_neptune_url", "https://fake-neptune-host.com:8182")
+current = "".join(
+    "<http://a/%d> <http://p> <http://o/%d> .\\n" % (i, i) for i in range(20)
+)
+destination = "".join(
+    '<http://b/%d> <http://p> "%d" .\\n' % (i, i) for i in range(20)
+) + "<http://b/x> <http://p> [ <http://q> 1 ; <http://r> 2 ] ."
+print(plan_hash(Virtuoso(config).get_sparql(current, destination)[0]))
+"""
+
 
 class VirtuosoTest(BaseTest):
     def setUp(self):
@@ -35,6 +71,8 @@ class VirtuosoTest(BaseTest):
         self.config.put("aws_neptune_url", "https://fake-neptune-host.com:8182")
         self.config.put("aws_neptune_host", "fake-neptune-host.com:8182")
         self.config.put("aws_region", "sa-east-1")
+        self.config.put("aws_neptune_max_retries", 0)
+        self.config.put("execution_throughput_file", "throughput.json")
         create_file("test.ttl", "")
 
         self.data_ttl_content = """
@@ -138,6 +176,7 @@ class VirtuosoTest(BaseTest):
     def tearDown(self):
         super(VirtuosoTest, self).tearDown()
         delete_files("*.ttl")
+        delete_files("throughput.json")
 
     #    @patch('subprocess.Popen', return_value=Mock(**{"communicate.return_value": ("out", "err")}))
     #    def test_it_should_use_popen_to_run_a_command(self, popen_mock):
@@ -207,6 +246,588 @@ class VirtuosoTest(BaseTest):
         virtuoso.execute_change("sparql_up", "sparql_down", execution_log)
         execution_log.assert_called
 
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_send_statements_in_batches_when_batch_size_is_configured(
+        self, update_query_mock
+    ):
+        self.config.put("execution_batch_size", 2)
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(["up1;", "up2;", "up3;"], ["down1", "down2", "down3"])
+
+        self.assertEqual(
+            [call("up1;\nup2", on_retry=ANY), call("up3;", on_retry=ANY)],
+            update_query_mock.call_args_list,
+        )
+
+    @patch.object(NeptuneClient, "update_query", side_effect=[{}, Exception("boom")])
+    def test_it_should_report_which_batch_failed(self, update_query_mock):
+        self.config.put("execution_batch_size", 2)
+        self.config.put("execution_echo", True)
+        execution_log = Mock()
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(
+            ["up1;", "up2;", "up3;"], ["down1", "down2", "down3"], execution_log
+        )
+
+        execution_log.assert_any_call(
+            "If needed, here it goes the rollback query:\ndown2", "GREEN"
+        )
+        execution_log.assert_called_with(
+            "Some error happened on batch 2 (statements 3 to 3 of 3). Erro was: boom"
+        )
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_not_echo_each_batch_by_default(self, update_query_mock):
+        execution_log = Mock()
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(["up1;"], ["down1"], execution_log)
+
+        self.assertNotIn(
+            call("Everythin ok. Response was: {}", "GREEN"),
+            execution_log.call_args_list,
+        )
+
+    @patch.object(NeptuneClient, "update_query")
+    def test_it_should_report_the_progress_while_executing_change(
+        self, update_query_mock
+    ):
+        update_query_mock.side_effect = lambda query, on_retry: time.sleep(0.05)
+        self.config.put("execution_batch_size", 1)
+        self.config.put("execution_report_interval", 0.01)
+        execution_log = Mock()
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(["up1;", "up2;"], ["down1", "down2"], execution_log)
+
+        reports = [
+            args[0]
+            for args, kwargs in execution_log.call_args_list
+            if args[0].startswith("Progress: ")
+        ]
+        self.assertTrue(reports)
+        self.assertTrue(
+            reports[-1].startswith(
+                "Progress: 2 of 2 statements (100.0%), 2 of 2 triples, "
+            )
+        )
+        execution_log.assert_called_with(reports[-1], "BLUE", log_level_limit=1)
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_not_report_the_progress_when_its_interval_is_zero(
+        self, update_query_mock
+    ):
+        self.config.put("execution_report_interval", 0)
+        virtuoso = Virtuoso(self.config)
+        self.assertIsNone(virtuoso._start_progress(Mock()))
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_send_a_batch_of_ground_deletes_as_a_delete_data_block(
+        self, update_query_mock
+    ):
+        self.config.put("execution_batch_size", 3)
+        sparql_up = [
+            "DELETE DATA { GRAPH <g> { <a> <p> <o> . } };",
+            "DELETE DATA { GRAPH <g> { <b> <p> <o> . } };",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o2> . } };",
+            "INSERT DATA { GRAPH <g> { <b> <p> <o2> . } };",
+            "history;",
+        ]
+        Virtuoso(self.config).execute_change(sparql_up, ["down"] * 5)
+
+        self.assertEqual(
+            [
+                call(
+                    "DELETE DATA { GRAPH <g> { <a> <p> <o> .\n<b> <p> <o> . } }",
+                    on_retry=ANY,
+                ),
+                call(
+                    "INSERT DATA { GRAPH <g> { <a> <p> <o2> . } };\n"
+                    "INSERT DATA { GRAPH <g> { <b> <p> <o2> . } }",
+                    on_retry=ANY,
+                ),
+                call("history;", on_retry=ANY),
+            ],
+            update_query_mock.call_args_list,
+        )
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_write_the_history_record_after_concurrent_changes(
+        self, update_query_mock
+    ):
+        self.config.put("execution_concurrency", 4)
+        sparql_up = ["WITH <g> DELETE {} WHERE {}"] + [
+            "INSERT DATA { GRAPH <g> { <s%d> <p> <o> . } };" % i for i in range(10)
+        ]
+        sparql_up.append("INSERT DATA { GRAPH <m> { [] <v> <h> . } };")
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(sparql_up, ["down"] * len(sparql_up))
+
+        calls = update_query_mock.call_args_list
+        self.assertEqual(12, len(calls))
+        self.assertEqual(call(sparql_up[0], on_retry=ANY), calls[0])
+        self.assertEqual(call(sparql_up[-1], on_retry=ANY), calls[-1])
+        self.assertEqual(sorted(sparql_up[1:-1]), sorted(c[0][0] for c in calls[1:-1]))
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_run_lanes_of_statements_by_subject_concurrently(
+        self, update_query_mock
+    ):
+        self.config.put("execution_mode", "lanes")
+        self.config.put("execution_concurrency", 2)
+        self.config.put("execution_batch_size", 2)
+        sparql_up = [
+            "WITH <g> DELETE { <a> <p> <o> . } WHERE { <a> <p> <o> . }",
+            "WITH <g> DELETE { <b> <p> <o> . } WHERE { <b> <p> <o> . }",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o2> . } };",
+            "INSERT DATA { GRAPH <g> { <b> <p> <o2> . } };",
+            "INSERT DATA { GRAPH <m> { [] <v> <h> . } };",
+        ]
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(sparql_up, ["down"] * 5)
+
+        sent = [c[0][0] for c in update_query_mock.call_args_list]
+        self.assertEqual(
+            sorted(
+                [
+                    "WITH <g> DELETE { <a> <p> <o> . } WHERE { <a> <p> <o> . };\n"
+                    "INSERT DATA { GRAPH <g> { <a> <p> <o2> . } }",
+                    "WITH <g> DELETE { <b> <p> <o> . } WHERE { <b> <p> <o> . };\n"
+                    "INSERT DATA { GRAPH <g> { <b> <p> <o2> . } }",
+                ]
+            ),
+            sorted(sent[:2]),
+        )
+        self.assertEqual([sparql_up[-1]], sent[2:])
+
+    def test_it_should_estimate_the_requests_of_each_execution_mode(self):
+        self.config.put("execution_batch_size", 2)
+        sparql_up = [
+            "WITH <g> DELETE { <a> <p> <o> . } WHERE { <a> <p> <o> . }",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o2> . } };",
+            "INSERT DATA { GRAPH <g> { <b> <p> <o2> . } };",
+            "INSERT DATA { GRAPH <g> { <c> <p> <o2> . } };",
+            "INSERT DATA { GRAPH <m> { [] <v> <h> . } };",
+        ]
+        estimate = Virtuoso(self.config).estimate(sparql_up)
+
+        self.assertEqual(
+            {"update": 4, "graph_store": 3, "atomic": 1, "lanes": 3},
+            estimate.requests,
+        )
+        self.assertEqual({}, estimate.rates)
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_record_the_throughput_of_a_migration_that_succeeded(
+        self, update_query_mock
+    ):
+        checkpoint_dir = tempfile.mkdtemp()
+        self.config.put("execution_checkpoint_dir", checkpoint_dir)
+        try:
+            Virtuoso(self.config).execute_change(
+                ["up0;", "up1;", "history;"], ["down"] * 3, versions=("01", "02")
+            )
+        finally:
+            shutil.rmtree(checkpoint_dir)
+
+        rates = Virtuoso(self.config).estimate(["up0;", "history;"]).rates
+        self.assertEqual(["update"], list(rates))
+
+    @patch.object(NeptuneClient, "update_query")
+    def test_it_should_roll_back_the_applied_statements_of_a_failed_migration(
+        self, update_query_mock
+    ):
+        update_query_mock.side_effect = [{}, {}, Exception("boom"), {}, {}]
+        self.config.put("execution_rollback", True)
+        execution_log = Mock()
+        sparql_up = [
+            "WITH <g> DELETE { <a> <p> <o> . } WHERE { <a> <p> <o> . }",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o2> . } };",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o3> . } };",
+            "history;",
+        ]
+        # as given by get_sparql, undoing the inserts before the deletes
+        sparql_down = [
+            "WITH <g> DELETE { <a> <p> <o2> . } WHERE { <a> <p> <o2> . }",
+            "WITH <g> DELETE { <a> <p> <o3> . } WHERE { <a> <p> <o3> . }",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o> . } };",
+            "history down",
+        ]
+        virtuoso = Virtuoso(self.config)
+
+        self.assertRaisesWithMessage(
+            MigrationException,
+            "migration failed, the 2 statements applied were rolled back",
+            virtuoso.execute_change,
+            sparql_up,
+            sparql_down,
+            execution_log,
+        )
+        self.assertEqual(
+            [call(statement, on_retry=ANY) for statement in sparql_up[:3]]
+            + [
+                call(sparql_down[0], on_retry=ANY),
+                call(sparql_down[2], on_retry=ANY),
+            ],
+            update_query_mock.call_args_list,
+        )
+        execution_log.assert_any_call(
+            "Rolling back the 2 statements already applied", "YELLOW"
+        )
+
+    @patch.object(NeptuneClient, "update_query")
+    def test_it_should_roll_back_the_half_applied_of_a_split_batch(
+        self, update_query_mock
+    ):
+        too_large = requests.Response()
+        too_large.status_code = 413
+        update_query_mock.side_effect = [
+            requests.HTTPError(response=too_large),
+            {},
+            Exception("boom"),
+            {},
+        ]
+        self.config.put("execution_batch_size", 2)
+        self.config.put("execution_rollback", True)
+        virtuoso = Virtuoso(self.config)
+
+        self.assertRaisesWithMessage(
+            MigrationException,
+            "migration failed, the 1 statements applied were rolled back",
+            virtuoso.execute_change,
+            ["up0;", "up1;", "history;"],
+            ["down0", "down1", "history down"],
+        )
+        self.assertEqual(
+            call("down0", on_retry=ANY), update_query_mock.call_args_list[-1]
+        )
+
+    @patch.object(NeptuneClient, "update_query")
+    def test_it_should_roll_back_the_batches_applied_by_a_lane_that_failed(
+        self, update_query_mock
+    ):
+        update_query_mock.side_effect = [{}, Exception("boom"), {}]
+        self.config.put("execution_mode", "lanes")
+        self.config.put("execution_rollback", True)
+        sparql_up = [
+            "WITH <g> DELETE { <a> <p> <o> . } WHERE { <a> <p> <o> . }",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o2> . } };",
+            "history;",
+        ]
+        sparql_down = [
+            "WITH <g> DELETE { <a> <p> <o2> . } WHERE { <a> <p> <o2> . }",
+            "INSERT DATA { GRAPH <g> { <a> <p> <o> . } };",
+            "history down",
+        ]
+        virtuoso = Virtuoso(self.config)
+
+        self.assertRaisesWithMessage(
+            MigrationException,
+            "migration failed, the 1 statements applied were rolled back",
+            virtuoso.execute_change,
+            sparql_up,
+            sparql_down,
+        )
+        self.assertEqual(
+            [
+                call(sparql_up[0], on_retry=ANY),
+                call(sparql_up[1], on_retry=ANY),
+                call(sparql_down[1], on_retry=ANY),
+            ],
+            update_query_mock.call_args_list,
+        )
+
+    @patch.object(NeptuneClient, "update_query")
+    def test_it_should_tell_when_the_rollback_of_a_failed_migration_fails(
+        self, update_query_mock
+    ):
+        update_query_mock.side_effect = [{}, Exception("boom"), Exception("boom")]
+        self.config.put("execution_rollback", True)
+        virtuoso = Virtuoso(self.config)
+
+        self.assertRaisesWithMessage(
+            MigrationException,
+            "migration failed and so did its rollback, "
+            "the graph may be left half migrated",
+            virtuoso.execute_change,
+            ["up0;", "up1;", "history;"],
+            ["down0", "down1", "history down"],
+        )
+
+    def test_it_should_plan_the_same_migration_in_every_process(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        hashes = set()
+        for seed in ("1", "2", "3"):
+            env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=root)
+            hashes.add(
+                subprocess.check_output(
+                    [sys.executable, "-c", PLAN_HASH_SCRIPT], env=env, cwd=root
+                )
+            )
+
+        self.assertEqual(1, len(hashes))
+
+    @patch.object(NeptuneClient, "update_query")
+    def test_it_should_resume_a_failed_migration_from_its_checkpoint(
+        self, update_query_mock
+    ):
+        checkpoint_dir = tempfile.mkdtemp()
+        self.config.put("execution_checkpoint_dir", checkpoint_dir)
+        sparql_up = ["up0;", "up1;", "up2;", "history;"]
+        try:
+            update_query_mock.side_effect = [{}, Exception("boom")]
+            Virtuoso(self.config).execute_change(
+                sparql_up, ["down"] * 4, versions=("01", "02")
+            )
+            self.assertEqual(1, len(os.listdir(checkpoint_dir)))
+
+            self.config.put("execution_resume", True)
+            update_query_mock.reset_mock(side_effect=True)
+            update_query_mock.return_value = {}
+            execution_log = Mock()
+            Virtuoso(self.config).execute_change(
+                sparql_up,
+                ["down"] * 4,
+                execution_log=execution_log,
+                versions=("01", "02"),
+            )
+
+            self.assertEqual(
+                [
+                    call("up1;", on_retry=ANY),
+                    call("up2;", on_retry=ANY),
+                    call("history;", on_retry=ANY),
+                ],
+                update_query_mock.call_args_list,
+            )
+            execution_log.assert_any_call(
+                "Resuming migration: skipping 1 of 4 statements already applied",
+                "YELLOW",
+            )
+            self.assertEqual([], os.listdir(checkpoint_dir))
+        finally:
+            shutil.rmtree(checkpoint_dir)
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_send_every_change_and_the_history_in_one_request_when_atomic(
+        self, update_query_mock
+    ):
+        self.config.put("execution_mode", "atomic")
+        sparql_up = ["WITH <g> DELETE {} WHERE {};", "up1;", "up2;", "history;"]
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(sparql_up, ["down"] * 4)
+
+        update_query_mock.assert_called_once_with(
+            "WITH <g> DELETE {} WHERE {};\nup1;\nup2;\nhistory", on_retry=ANY
+        )
+
+    @patch.object(NeptuneClient, "update_query", side_effect=[{}, Exception("boom")])
+    def test_it_should_send_atomic_chunks_in_order_when_the_migration_is_too_big(
+        self, update_query_mock
+    ):
+        self.config.put("execution_mode", "atomic")
+        self.config.put("execution_batch_bytes", 10)
+        execution_log = Mock()
+        sparql_up = ["up01;", "up02;", "up03;", "up04;", "history;"]
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(sparql_up, ["down"] * 5, execution_log=execution_log)
+
+        self.assertEqual(
+            [call("up01;\nup02", on_retry=ANY), call("up03;\nup04", on_retry=ANY)],
+            update_query_mock.call_args_list,
+        )
+        execution_log.assert_any_call(
+            "The migration (31 bytes) does not fit in a single request of 10 "
+            "bytes, it will be sent in atomic chunks",
+            "YELLOW",
+        )
+
+    @patch.object(NeptuneClient, "post_ntriples", return_value="")
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_send_ground_triples_through_the_graph_store_protocol(
+        self, update_query_mock, post_ntriples_mock
+    ):
+        self.config.put("execution_mode", "graph_store")
+        sparql_up = [
+            "WITH <g> DELETE { <http://a> <http://b> <http://c> . } "
+            "WHERE { <http://a> <http://b> <http://c> . }",
+            "WITH <g> DELETE { <http://a> <http://b> <http://d> . } "
+            "WHERE { <http://a> <http://b> <http://d> . }",
+            "INSERT DATA { GRAPH <g> { <http://a> <http://b> <http://e> . } };",
+            "INSERT DATA { GRAPH <g> { <http://a> <http://b> [<http://c> <http://d> ; ] } };",
+            'INSERT DATA { GRAPH <g> { <http://a> <http://b> "f" . } };',
+            "INSERT DATA { GRAPH <m> { [] <v> <h> . } };",
+        ]
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(sparql_up, ["down"] * len(sparql_up))
+
+        self.assertEqual(
+            [
+                call(
+                    "DELETE DATA { GRAPH <g> { <http://a> <http://b> <http://c> .\n"
+                    "<http://a> <http://b> <http://d> . } }",
+                    on_retry=ANY,
+                ),
+                call(sparql_up[3], on_retry=ANY),
+                call(sparql_up[5], on_retry=ANY),
+            ],
+            update_query_mock.call_args_list,
+        )
+        graph, ntriples = post_ntriples_mock.call_args[0]
+        self.assertEqual("g", graph)
+        self.assertEqual(
+            [
+                '<http://a> <http://b> "f" .',
+                "<http://a> <http://b> <http://e> .",
+            ],
+            sorted(ntriples.splitlines()),
+        )
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_tune_batches_and_save_them_for_the_next_run(
+        self, update_query_mock
+    ):
+        tuning_file = tempfile.mktemp()
+        self.config.put("execution_adaptive", True)
+        self.config.put("execution_tuning_file", tuning_file)
+        try:
+            virtuoso = Virtuoso(self.config)
+            virtuoso.execute_change(["up%d;" % i for i in range(20)], ["down"] * 20)
+
+            sent = [c[0][0] for c in update_query_mock.call_args_list]
+            self.assertEqual(["up%d;" % i for i in range(8)], sent[:8])
+            self.assertEqual(
+                ["\n".join("up%d;" % i for i in range(8, 18)) + "\nup18", "up19;"],
+                sent[8:],
+            )
+            self.assertEqual(
+                {"batch_size": 11, "concurrency": 2},
+                TuningStore(tuning_file).load("https://fake-neptune-host.com:8182"),
+            )
+            self.assertEqual(11, Virtuoso(self.config)._batch_limits()[0])
+        finally:
+            os.remove(tuning_file)
+
+    @patch.object(NeptuneClient, "update_query", side_effect=Exception("boom"))
+    def test_it_should_not_write_the_history_record_when_a_change_fails(
+        self, update_query_mock
+    ):
+        self.config.put("execution_concurrency", 4)
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(
+            ["INSERT DATA { GRAPH <g> { <s> <p> <o> . } };", "history;"],
+            ["down", "down history"],
+        )
+
+        update_query_mock.assert_called_once_with(
+            "INSERT DATA { GRAPH <g> { <s> <p> <o> . } };", on_retry=ANY
+        )
+
+    @patch.object(NeptuneClient, "update_query")
+    def test_it_should_record_and_log_retries_of_each_statement(
+        self, update_query_mock
+    ):
+        def update_query(query, on_retry):
+            on_retry(1, Exception("throttled"), 0.5)
+            return {}
+
+        update_query_mock.side_effect = update_query
+        execution_log = Mock()
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(["up1;", "up2;"], ["down1", "down2"], execution_log)
+
+        self.assertEqual({0: 1, 1: 1}, virtuoso.retries)
+        execution_log.assert_any_call(
+            "Retrying batch 1 (attempt 1) in 0.50s. Error was: throttled",
+            "YELLOW",
+        )
+
+    @patch.object(NeptuneClient, "update_query")
+    def test_it_should_split_batches_that_time_out_and_remember_the_size(
+        self, update_query_mock
+    ):
+        def update_query(query, on_retry):
+            if query.count("up") > 2:
+                raise requests.ReadTimeout("timed out")
+            return {}
+
+        update_query_mock.side_effect = update_query
+        self.config.put("execution_batch_size", 8)
+        sparql_up = ["up%d;" % i for i in range(12)]
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(sparql_up, ["down"] * 12)
+
+        sent = [c[0][0] for c in update_query_mock.call_args_list]
+        self.assertEqual(
+            [
+                "up0;\nup1;\nup2;\nup3;\nup4;\nup5;\nup6;\nup7",
+                "up0;\nup1;\nup2;\nup3",
+                "up0;\nup1",
+                "up2;\nup3",
+                "up4;\nup5;\nup6;\nup7",
+                "up4;\nup5",
+                "up6;\nup7",
+                "up8;\nup9",
+                "up10;",
+                "up11;",
+            ],
+            sent,
+        )
+        self.assertEqual(2, virtuoso._batch_size)
+
+    @patch.object(
+        NeptuneClient, "update_query", side_effect=requests.ReadTimeout("timed out")
+    )
+    def test_it_should_not_split_a_batch_of_blank_nodes_that_timed_out(
+        self, update_query_mock
+    ):
+        self.config.put("execution_batch_size", 2)
+        execution_log = Mock()
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(
+            [
+                "INSERT DATA { GRAPH <g> { <a> <p> <o> . } };",
+                "INSERT DATA { GRAPH <g> { <b> <p> [ <c> 1 ; ] } };",
+                "history;",
+            ],
+            ["d1", "d2", "d3"],
+            execution_log,
+        )
+
+        self.assertEqual(1, update_query_mock.call_count)
+        execution_log.assert_called_with(
+            "Some error happened on batch 1 (statements 1 to 2 of 3). "
+            "Erro was: timed out"
+        )
+
+    @patch.object(
+        NeptuneClient, "update_query", side_effect=requests.ReadTimeout("timed out")
+    )
+    def test_it_should_fail_when_a_single_statement_times_out(self, update_query_mock):
+        self.config.put("execution_batch_size", 2)
+        execution_log = Mock()
+        virtuoso = Virtuoso(self.config)
+        virtuoso.execute_change(
+            ["up1;", "up2;", "up3;"], ["d1", "d2", "d3"], execution_log
+        )
+
+        self.assertEqual(2, update_query_mock.call_count)
+        execution_log.assert_called_with(
+            "Some error happened on batch 1 (statements 1 to 2 of 3). "
+            "Erro was: timed out"
+        )
+
+    @patch.object(NeptuneLoader, "load", return_value={"data.ttl": ("ok", "")})
+    def test_it_should_upload_ttls_with_the_neptune_bulk_loader_when_configured(
+        self, load_mock
+    ):
+        self.config.put("load_backend", "neptune")
+        self.config.put("aws_neptune_loader_staging", "/tmp")
+        virtuoso = Virtuoso(self.config)
+
+        self.assertEqual(
+            {"data.ttl": ("ok", "")}, virtuoso.upload_ttls_to_virtuoso(["data.ttl"])
+        )
+        load_mock.assert_called_with(["data.ttl"])
+
     @patch.object(NeptuneClient, "execute_query")
     def test_it_should_get_current_version_none_when_database_is_empty(
         self, mock_execute_query
@@ -244,6 +865,114 @@ class VirtuosoTest(BaseTest):
         self.assertEqual("2", current)
         self.assertEqual("git", source)
 
+    def test_it_should_share_the_diff_between_targets(self):
+        shared_results = SharedResults()
+        virtuosos = [Virtuoso(self.config), Virtuoso(self.config)]
+        for virtuoso in virtuosos:
+            virtuoso.shared_results = shared_results
+
+        with patch.object(
+            Virtuoso,
+            "_generate_migration_sparql_commands",
+            return_value=(["up"], ["down"]),
+        ) as generate_mock:
+            results = [
+                virtuoso.get_sparql(None, self.data_ttl_content, None, "01", "git")
+                for virtuoso in virtuosos
+            ]
+
+        self.assertEqual(2, generate_mock.call_count)
+        self.assertEqual(["down", "up"], results[1][0][:2])
+        self.assertEqual(3, len(results[0][0]))
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_stream_the_statements_of_a_migration(self, update_query_mock):
+        virtuoso = Virtuoso(self.config)
+        query_up, query_down = virtuoso.get_sparql(
+            self.structure_02_ttl_content, self.structure_03_ttl_content, "02", "03"
+        )
+
+        sparql_up, sparql_down = virtuoso.stream_change(
+            self.structure_02_ttl_content,
+            self.structure_03_ttl_content,
+            "02",
+            "03",
+            "git",
+        )
+
+        # the diff of two parses of the same ontologies may come in any order
+        query_down_aligned = align_rollback_statements(query_up, query_down)
+        self.assertEqual(
+            sorted(zip(query_up[:-1], query_down_aligned[:-1])),
+            sorted(zip(sparql_up[:-1], sparql_down[:-1])),
+        )
+        self.assertEqual(
+            ["WITH", "INSERT", "INSERT", "INSERT"],
+            [statement.split()[0] for statement in sparql_up],
+        )
+        self.assertEqual(
+            [call(statement, on_retry=ANY) for statement in sparql_up],
+            update_query_mock.call_args_list,
+        )
+        self.assertTrue(
+            sparql_up[-1].startswith("INSERT DATA { GRAPH <http://example.com/>")
+        )
+
+    @patch.object(NeptuneClient, "update_query", return_value={})
+    def test_it_should_not_write_history_when_streaming_nothing(
+        self, update_query_mock
+    ):
+        self.assertEqual(
+            ([], []),
+            Virtuoso(self.config).stream_change(
+                self.structure_02_ttl_content,
+                self.structure_02_ttl_content,
+                "02",
+                "02",
+                "git",
+            ),
+        )
+        self.assertEqual(0, update_query_mock.call_count)
+
+    def test_it_should_not_stream_atomic_migrations(self):
+        self.config.put("execution_mode", "atomic")
+        self.assertRaisesWithMessage(
+            Exception,
+            "statements can not be streamed in the atomic execution mode",
+            Virtuoso(self.config).stream_change,
+            None,
+            self.data_ttl_content,
+            None,
+            "01",
+            "git",
+        )
+
+    def test_it_should_coalesce_the_statements_of_a_subject_if_asked_to(self):
+        self.config.put("execution_coalesce", True)
+        query_up, query_down = Virtuoso(self.config).get_sparql(
+            None,
+            """
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+<http://example.com/A> a owl:Class ; owl:versionInfo "1" .
+""",
+            None,
+            "01",
+            "git",
+        )
+
+        self.assertEqual(2, len(query_up))
+        self.assertTrue(
+            query_up[0].startswith(
+                "INSERT DATA { GRAPH <test> { <http://example.com/A> "
+            )
+        )
+        self.assertTrue(
+            query_down[0].startswith(
+                "DELETE DATA { GRAPH <test> { <http://example.com/A> "
+            )
+        )
+        self.assertEqual(2, query_up[0].count("<http://www.w3.org/2002/07/owl#"))
+
     def test_it_should_get_sparql_statments_from_given_ontology(self):
 
         query_up, query_down = Virtuoso(self.config).get_sparql(
@@ -338,8 +1067,8 @@ class VirtuosoTest(BaseTest):
         )
 
         expected_lines_down = [
-            "WITH <test> DELETE { <http://example.com/role> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . } WHERE { <http://example.com/role> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . }",
-            "WITH <test> DELETE { <http://example.com/RoleOnSoapOpera> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . } WHERE { <http://example.com/RoleOnSoapOpera> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . }",
+            "DELETE DATA { GRAPH <test> { <http://example.com/role> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . } };",
+            "DELETE DATA { GRAPH <test> { <http://example.com/RoleOnSoapOpera> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . } };",
         ]
 
         expected_log_migration_down = """WITH <http://example.com/> DELETE {?s ?p ?o} WHERE {?s owl:versionInfo "02"; <http://example.com/endpoint> "endpoint"; <http://example.com/usuario> "user"; <http://example.com/ambiente> "localhost"; <http://example.com/produto> "test"; <http://example.com/commited> "%s"^^xsd:dateTime; <http://example.com/origen> "file"; <http://example.com/changes> "<log>"; ?p ?o.};""" % datetime.datetime.now().strftime(
@@ -418,8 +1147,8 @@ class VirtuosoTest(BaseTest):
         )
 
         expected_lines_up = [
-            "WITH <test> DELETE { <http://example.com/role> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . } WHERE { <http://example.com/role> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . }",
-            "WITH <test> DELETE { <http://example.com/RoleOnSoapOpera> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . } WHERE { <http://example.com/RoleOnSoapOpera> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . }",
+            "DELETE DATA { GRAPH <test> { <http://example.com/role> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . } };",
+            "DELETE DATA { GRAPH <test> { <http://example.com/RoleOnSoapOpera> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Class> . } };",
         ]
 
         expected_log_migration_up = """INSERT DATA { GRAPH <http://example.com/> { [] owl:versionInfo "01"; <http://example.com/endpoint> "endpoint"; <http://example.com/usuario> "user"; <http://example.com/ambiente> "localhost"; <http://example.com/produto> "test"; <http://example.com/commited> "%s"^^xsd:dateTime; <http://example.com/origen> "file"; <http://example.com/changes> "<log>".} };""" % datetime.datetime.now().strftime(